@@ -15,7 +15,8 @@ if not OPENAI_API_KEY:
 chat_model = ChatOpenAI(model='gpt-5-nano',
                         api_key=OPENAI_API_KEY,
                         temperature=0.7,
-                        streaming=False)
+                        streaming=True,     # token 串流（見 application_chain.stream_application_turn）
+                        stream_usage=True)  # 串流最後一個片段附上 usage（含 cached tokens）
 
 # 功能: 建立代理
 def build_agent_executor():
@@ -0,0 +1,25 @@
+# ===== Agent token 串流 =====
+# agent.stream(stream_mode="messages") 會送出每個節點的訊息片段（模型 token、工具結果…）
+# → 這裡只留下模型輸出的文字片段
+
+def chunk_text(chunk) -> str:
+    """AIMessageChunk.content 可能是字串或 content blocks（list）"""
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return "".join(
+        block.get("text", "") if isinstance(block, dict) else str(block)
+        for block in content
+        if not isinstance(block, dict) or block.get("type") == "text"
+    )
+
+
+def iter_model_chunks(agent_executor, messages):
+    """
+    逐一產生模型輸出的 AIMessageChunk
+    - 同一次模型呼叫的片段共用同一個 chunk.id
+    - agent 使用工具時會有多次模型呼叫 → 最後一次的文字才是回答
+    """
+    for chunk, _metadata in agent_executor.stream({"messages": messages}, stream_mode="messages"):
+        if chunk.type == "AIMessageChunk":
+            yield chunk
@@ -0,0 +1,44 @@
+# ===== 模型用量 / prompt cache 命中統計 =====
+# 從 agent 回傳的 AIMessage.usage_metadata 取出 input / cached / output token 數
+# → 驗證 prefix cache 是否真的有命中
+
+import threading
+
+
+def collect_usage(messages):
+    """
+    messages: 本回合模型產生的 AIMessage（agent 可能呼叫模型多次，例如使用工具）
+    回傳: {"input_tokens", "cached_tokens", "output_tokens", "cache_hit_rate"}
+    """
+    usage = {"input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+    for m in messages:
+        meta = getattr(m, "usage_metadata", None) or {}
+        usage["input_tokens"] += meta.get("input_tokens", 0) or 0
+        usage["output_tokens"] += meta.get("output_tokens", 0) or 0
+        usage["cached_tokens"] += (meta.get("input_token_details") or {}).get("cache_read", 0) or 0
+
+    usage["cache_hit_rate"] = round(usage["cached_tokens"] / usage["input_tokens"], 3) if usage["input_tokens"] else 0.0
+    return usage
+
+
+class UsageTotals:
+    """程序累計（所有回合）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {"turns": 0, "input_tokens": 0, "cached_tokens": 0, "output_tokens": 0}
+
+    def add(self, usage):
+        with self._lock:
+            self._totals["turns"] += 1
+            for k in ("input_tokens", "cached_tokens", "output_tokens"):
+                self._totals[k] += usage.get(k, 0)
+
+    def stats(self):
+        with self._lock:
+            totals = dict(self._totals)
+        totals["cache_hit_rate"] = round(totals["cached_tokens"] / totals["input_tokens"], 3) if totals["input_tokens"] else 0.0
+        return totals
+
+
+usage_totals = UsageTotals()
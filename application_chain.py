@@ -4,17 +4,34 @@ Application Layer:
 - UI-agnostic
 """
 
-from chat_history.chat_history import build_chat_history
-from task_type_select import task_type_select_chain
+from chat_history.chat_history import build_chat_history, build_classifier_history, build_turn_input
+from task_classifier.classifier import classify_task_type
 #from rag.teaching_rag import teaching_example_function
 from prompts.prompt_builder import build_full_prompt
 from agent.agent_executor import build_agent_executor
-from utils.latex_postprocess import format_latex
-from db.safe_crud import save_message
+from agent.streaming import chunk_text, iter_model_chunks
+from agent.usage import collect_usage, usage_totals
+from utils.latex_stream import StreamingLatexFormatter
+from utils.latex_postprocess import FORMAT_VERSION
+from db.journal import message_journal
 from utils.error_handler import safe_call, format_error_msg
+from utils.timing import StageTimer
+from utils.attachments import split_reference
 from langchain_core.messages import SystemMessage, HumanMessage
 
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
+import traceback
+import logging
+import time
+
+
+# 回合內可並行的階段（歷史組裝 / 任務分類）共用的 thread pool
+turn_stage_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="turn-stage")
+
+# 串流在第一個 token 之前失敗 → 重試（同 safe_call 預設）；已輸出文字後失敗就不重試
+STREAM_RETRIES = 2
+STREAM_RETRY_DELAY = 0.5
 
 
 # streamlit 每一次 UI 互動 = 整個 script 從上到下重新跑 每次 rerun，整支 Python 檔案都會重新執行一次
@@ -25,27 +42,61 @@ def st_cache_agent_executor():
     return build_agent_executor()
 
 
-def run_application_turn(username: str, user_input: str, mode: str) -> dict:
+def classify_task(username: str, user_input: str, prompt_input: str) -> str:
     """
-    One complete AI teaching turn.
-    一次 AI 教學回合
+    任務分類：只用輸入 + 少量最近對話，不等完整 chat_history
+    - 本地分類器有把握時不呼叫 LLM（見 task_classifier/classifier.py）
+    - 規則 / 本地模型只看學生的提問；附件段落（prompt_input）只給 LLM 參考
+    """
+    _, question = split_reference(user_input)
+    task_type, source = classify_task_type(
+        username,
+        question,
+        lambda: build_classifier_history(username),
+        llm_input=prompt_input,
+    )
+    print(f"任務分類來源: {source}")
+    return task_type
+
 
+def prepare_turn(username: str, user_input: str, mode: str, timer: StageTimer):
     """
+    階段 1~5：歷史 / 分類 / system prompt → 最終輸入 llm 的 messages
 
-    # 1. 取得完整 chat_history（含摘要）
-    input_chat_history, err = safe_call(build_chat_history, username)
-    if err:
-        return {"answer": format_error_msg(err)}
+    階段相依關係：
+        history ───────────────────────────┐
+        attachment ─→ classify ─→ prompt ──┴─→ messages
+    history 與 attachment 同時開始，classify 等 attachment，prompt 只等 classify
 
-    # 2. 任務分類
-    task_type, err = safe_call(
-        task_type_select_chain.invoke,
-        {"input": user_input, "chat_history": input_chat_history}
-    )
+    user_input 可能含附件參照（見 utils/attachments.py）→ 送模型用展開後的內容，分類只看提問
+    沒有附件但提到先前的附件時，沿用最近一次上傳的附件
+
+    回傳: (messages, task_type, input_chat_history, context_report), err
+    """
+    # 1. 取得完整 chat_history（含摘要，依 mode 的 token 預算裁剪）
+    history_future = turn_stage_pool.submit(timer.run, "history", safe_call, build_chat_history, username, mode)
+
+    # 附件展開（與 1 並行；需要時讀最近訊息 / 附件 / 建索引）
+    attachment_future = turn_stage_pool.submit(timer.run, "attachment", safe_call, build_turn_input, username, user_input)
+
+    # 2. 任務分類（與 1 並行，等附件展開完成；attachment 先送出 → pool 依序執行，不會互等卡住）
+    def classify_stage():
+        prompt_input, err = attachment_future.result()
+        if err:
+            return None, err
+        return timer.run("classify", safe_call, classify_task, username, user_input, prompt_input)
+
+    classify_future = turn_stage_pool.submit(classify_stage)
+
+    task_type, err = classify_future.result()
     if err:
-        return {"answer": format_error_msg(err)}
+        return None, err
     print(f"任務類型: {task_type}")
 
+    prompt_input, err = attachment_future.result()
+    if err:
+        return None, err
+
     # 3. 教學範例 RAG
     #teaching_example, err = safe_call(
     #    teaching_example_function,
@@ -53,23 +104,30 @@ def run_application_turn(username: str, user_input: str, mode: str) -> dict:
     #    task_type
     #)
     #if err:
-    #    return {"answer": format_error_msg(err)}
+    #    return None, err
 
-    # 4. 組合成完整 System_Prompt
-    system_prompt, err = safe_call(
+    # 4. 組合成完整 System_Prompt（history 可能仍在執行）
+    system_prompt, err = timer.run(
+        "prompt",
+        safe_call,
         build_full_prompt,
         mode,
         task_type,
         #teaching_example
     )
     if err:
-        return {"answer": format_error_msg(err)}
+        return None, err
+
+    history, err = history_future.result()
+    if err:
+        return None, err
+    input_chat_history, context_report = history
 
     # 5. 建立最終輸入llm的 messages
     messages = []
     messages.append(SystemMessage(content=system_prompt))
     messages.extend(input_chat_history)
-    messages.append(HumanMessage(content=user_input))
+    messages.append(HumanMessage(content=prompt_input))
 
     # 檢查輸入llm的 messages 和教學模式
     print(f"\n🧠 [MODE] {mode}")
@@ -81,30 +139,106 @@ def run_application_turn(username: str, user_input: str, mode: str) -> dict:
     #    elif m.type == "ai":
     #        print(f"\n🟢 [AI]\n{m.content}")
 
-    # 6. 呼叫 Agent
+    return (messages, task_type, input_chat_history, context_report), None
+
+
+def stream_application_turn(username: str, user_input: str, mode: str):
+    """
+    One complete AI teaching turn, streamed.
+    一次 AI 教學回合（串流版 generator）
+
+    產生的事件：
+    - {"type": "token", "text": ..., "pending": ...}
+        text：新確定的 Latex 後製文字（串流版後製，見 utils/latex_stream.py）
+        pending：尚未後製的原始文字（未結束的數學區塊 / 最後一行）
+    - {"type": "reset"}：agent 開始新一次模型呼叫，先前顯示的文字作廢（工具呼叫前的中間輸出）
+    - {"type": "done", "result": {...}}：最後一個事件，result 同 run_application_turn
+
+    串流結束後才存 DB（user_input 原樣保存，附件只存參照）；timing["marks"]["first_token"] = time-to-first-token
+    """
+    timer = StageTimer()
+
+    prepared, err = prepare_turn(username, user_input, mode, timer)
+    if err:
+        yield {"type": "done", "result": {"answer": format_error_msg(err)}}
+        return
+    messages, task_type, input_chat_history, context_report = prepared
+
+    # 6. 呼叫 Agent（串流）
     agent_executor = st_cache_agent_executor()  # 建立 Agent（初始化一次）
-    result, err = safe_call(
-        agent_executor.invoke,
-        {
-            "messages": messages
-        }
-    )
+    with timer.stage("agent"):
+        for attempt in range(STREAM_RETRIES + 1):
+            chunks, texts, current_id = [], {}, None
+            formatter, formatted = StreamingLatexFormatter(), []
+            try:
+                for chunk in iter_model_chunks(agent_executor, messages):
+                    chunks.append(chunk)
+                    text = chunk_text(chunk)
+
+                    # 新的模型呼叫：前一次若有輸出文字，UI 要清掉
+                    if chunk.id != current_id:
+                        if current_id is not None and texts.get(current_id):
+                            formatter, formatted = StreamingLatexFormatter(), []
+                            yield {"type": "reset"}
+                        current_id = chunk.id
+
+                    if text:
+                        timer.mark("first_token")
+                        texts[current_id] = texts.get(current_id, "") + text
+                        piece = formatter.feed(text)
+                        formatted.append(piece)
+                        yield {"type": "token", "text": piece, "pending": formatter.pending}
+                err = None
+                break
+            except Exception as e:
+                logging.error(traceback.format_exc())
+                err = str(e)
+                # 已經輸出過文字 → 重試會重複內容，直接回報錯誤
+                if texts or attempt == STREAM_RETRIES:
+                    break
+                time.sleep(STREAM_RETRY_DELAY)
+
     if err:
-        return {"answer": format_error_msg(err)}
+        yield {"type": "done", "result": {"answer": format_error_msg(err)}}
+        return
+
+    raw_answer = texts.get(current_id, "")
+    print(raw_answer)
+
+    # prompt cache 命中統計（usage 附在每次模型呼叫的最後一個片段）
+    usage = collect_usage(chunks)
+    usage_totals.add(usage)
+    print(f"💾 [USAGE] {usage} | 累計: {usage_totals.stats()}")
 
-    answer = result["messages"][-1].content
-    print(answer)
+    # 7. Latex 後製處理（串流中已處理完的部分 + 剩餘部分；結果同 format_latex(raw_answer)）
+    formatted.append(timer.run("latex", formatter.finish))
+    answer = "".join(formatted)
 
-    # 7. Latex 後製處理
-    answer = format_latex(answer)
+    # 8. 存入 DB（write-behind：交給背景 thread 批次寫入，不等磁碟）
+    # 同時保存模型原文 + 後製版本 → 之後修正後製可以重新產生（見 db/reformat.py）
+    message_journal.submit(username, [("user", user_input), ("assistant", answer, raw_answer, FORMAT_VERSION)])
 
-    # 8. 存入 DB
-    save_message(username, "user", user_input)
-    save_message(username, "assistant", answer)
+    timing = timer.report()
+    print(f"⏱️ [TIMING] 首個 token: {timing['marks'].get('first_token')} ms | 總計: {timing['wall_ms']} ms | {timing}")
 
-    return {
+    yield {"type": "done", "result": {
         "answer": answer,
         "task_type": task_type,
         #"teaching_example": teaching_example,
-        "history_used": input_chat_history
-    }
\ No newline at end of file
+        "history_used": input_chat_history,
+        "context_report": context_report,
+        "usage": usage,
+        "timing": timing
+    }}
+
+
+def run_application_turn(username: str, user_input: str, mode: str) -> dict:
+    """
+    One complete AI teaching turn.
+    一次 AI 教學回合（非串流：跑完整個串流後回傳結果）
+    """
+    result = None
+    for event in stream_application_turn(username, user_input, mode):
+        if event["type"] == "done":
+            result = event["result"]
+    return result
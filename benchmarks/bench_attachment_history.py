@@ -0,0 +1,92 @@
+# ===== Benchmark：歷史訊息中的附件（全文 / 相關段落 / 摘要）=====
+# 模擬學生把一份多頁題目卷一直掛在側邊欄、連續問 N 題，每回合比較 history 的 token 數：
+# - inline：舊做法，訊息內嵌整份附件文字（單則超過 message_tokens 會被截斷）
+# - excerpt：ATTACHMENT_HISTORY=full，歷史訊息展開成當時的相關段落
+# - stub：ATTACHMENT_HISTORY=stub（預設），附件在提出的回合之後只留摘要
+# 以 epoch_layout 組 history（與線上相同），使用 in-memory backend，不寫入 chat.db
+#
+# 用法：python -m benchmarks.bench_attachment_history [--pages 40] [--turns 20] [--mode guided]
+
+import argparse
+import random
+from io import BytesIO
+
+from benchmarks.pdf_samples import make_problem_set
+from chat_history.epoch_layout import EpochLayout
+from db.backend import set_backend
+from db.memory_backend import InMemoryBackend
+from utils import attachments
+from utils.attachments import expand_content, history_messages, tokens_saved
+from utils.input_builder import build_user_input
+
+ANSWER = "我們先把題目條件整理一下，再一步一步計算。" * 8
+
+
+class Upload(BytesIO):
+    """模擬 Streamlit UploadedFile"""
+    type = "application/pdf"
+    name = "practice.pdf"
+
+
+def run(layout, backend, username, mode):
+    _, report = layout.build(username, mode, None, backend, 20)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--mode", default="guided")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    data, page_texts = make_problem_set(args.pages, seed=args.seed)
+    document = "\n".join(page_texts)
+    backend = InMemoryBackend()
+    set_backend(backend)
+
+    layouts = {name: EpochLayout() for name in ("inline", "excerpt", "stub")}
+
+    print(f"pages: {args.pages}  mode: {args.mode}")
+    print(f"{'turn':>4s} {'inline tok':>11s} {'excerpt tok':>12s} {'stub tok':>9s} {'saved':>7s} {'msgs (i/e/s)':>14s}")
+    totals = dict.fromkeys(layouts, 0)
+    for turn in range(1, args.turns + 1):
+        question = f"第 {rng.randint(1, args.pages * 4)} 題怎麼做？"
+        stored = build_user_input(question, Upload(data))
+
+        # 上一回合以前的訊息已存入：三種做法各自一位使用者
+        reports = {}
+        for name, layout in layouts.items():
+            attachments.ATTACHMENT_HISTORY = "full" if name == "excerpt" else "stub"
+            reports[name] = run(layout, backend, name, args.mode)
+            totals[name] += reports[name]["history_tokens"]
+        attachments.ATTACHMENT_HISTORY = "stub"
+
+        saved = reports["excerpt"]["history_tokens"] - reports["stub"]["history_tokens"]
+        used = "/".join(str(reports[n]["messages_used"]) for n in layouts)
+        print(f"{turn:4d} {reports['inline']['history_tokens']:11d} {reports['excerpt']['history_tokens']:12d} "
+              f"{reports['stub']['history_tokens']:9d} {saved:7d} {used:>14s}  "
+              f"(report: stubbed {reports['stub']['attachments_stubbed']}, saved {reports['stub']['attachment_tokens_saved']})")
+
+        # 本回合的訊息寫入（inline 存舊格式全文）
+        inline = f"【題目／參考資料（學生上傳）】\n{document}\n\n【學生的提問／說明】\n{question}"
+        backend.save_messages([
+            ("inline", "user", inline), ("inline", "assistant", ANSWER),
+            ("excerpt", "user", stored), ("excerpt", "assistant", ANSWER),
+            ("stub", "user", stored), ("stub", "assistant", ANSWER),
+        ])
+
+    print(f"\ntotal history tokens over {args.turns} turns: "
+          + "  ".join(f"{name} {tokens}" for name, tokens in totals.items()))
+
+    # 本回合提問仍帶相關段落；歷史訊息的摘要長相
+    msgs = history_messages(backend.load_recent_messages("stub", 2))
+    print(f"\ncurrent turn input:\n{expand_content(stored)}")
+    print(f"\nhistory stub:\n{msgs[0]['content']}")
+    print(f"saved in last 2 messages: {tokens_saved(msgs)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# ===== Benchmark：一回合對話的 DB 負載 =====
+# 比較「每次 connect/close」(舊) 與「連線管理器」(新) 的 turns/sec
+#
+# 用法：python -m benchmarks.bench_db_turn [--threads 8] [--turns 200]
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from db.connection import ConnectionManager
+from db.migrations import run_migrations
+
+
+# 一回合 ≈ 摘要檢查 3 次讀取 + 最近訊息 1 次讀取 + 2 次寫入
+READ_SQL = [
+    ("SELECT summary_text FROM summary WHERE username=?", lambda u: (u,)),
+    ("SELECT last_summarized_id FROM summary_pointer WHERE username=?", lambda u: (u,)),
+    ("SELECT id, role, content FROM messages WHERE username=? AND id > ? ORDER BY id", lambda u: (u, 0)),
+    ("SELECT role, content FROM messages WHERE username=? ORDER BY id DESC LIMIT ?", lambda u: (u, 20)),
+]
+WRITE_SQL = "INSERT INTO messages (username, role, content) VALUES (?, ?, ?)"
+
+
+def _legacy_turn(db_path, username):
+    # 舊寫法：每個動作都 connect → execute → close
+    for sql, params in READ_SQL:
+        conn = sqlite3.connect(db_path)
+        conn.execute(sql, params(username)).fetchall()
+        conn.close()
+    for role in ("user", "assistant"):
+        conn = sqlite3.connect(db_path)
+        conn.execute(WRITE_SQL, (username, role, "x" * 400))
+        conn.commit()
+        conn.close()
+
+
+def _pooled_turn(manager, username):
+    conn = manager.get()
+    for sql, params in READ_SQL:
+        conn.execute(sql, params(username)).fetchall()
+    for role in ("user", "assistant"):
+        with conn:
+            conn.execute(WRITE_SQL, (username, role, "x" * 400))
+
+
+def _retry(func, *args):
+    # 與 safe_sqlite_call 相同策略：locked 時重試
+    while True:
+        try:
+            return func(*args)
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e).lower():
+                raise
+            time.sleep(0.01)
+
+
+def _run(turn_func, make_arg, threads, turns):
+    def worker(idx):
+        arg = make_arg()
+        for _ in range(turns):
+            _retry(turn_func, arg, f"user{idx}")
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return threads * turns / elapsed
+
+
+def _fresh_db(tmpdir, name):
+    path = os.path.join(tmpdir, name)
+    manager = ConnectionManager(path)
+    run_migrations(manager.get())
+    manager.close_all()
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        legacy_path = _fresh_db(tmpdir, "legacy.db")
+        legacy = _run(_legacy_turn, lambda: legacy_path, args.threads, args.turns)
+
+        pooled_path = _fresh_db(tmpdir, "pooled.db")
+        manager = ConnectionManager(pooled_path)
+        pooled = _run(_pooled_turn, lambda: manager, args.threads, args.turns)
+        manager.close_all()
+
+    print(f"threads={args.threads} turns/thread={args.turns}")
+    print(f"connect-per-call : {legacy:8.1f} turns/sec")
+    print(f"connection pool  : {pooled:8.1f} turns/sec  (x{pooled / legacy:.2f})")
+
+
+if __name__ == "__main__":
+    main()
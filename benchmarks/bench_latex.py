@@ -0,0 +1,242 @@
+# ===== Benchmark：LaTeX 後製（分階段計時 + golden 輸出 + 跨次比較）=====
+# 語料：chat.db 全部 assistant 訊息 + 提示詞範例 + 固定 seed 的合成片段（見 latex_corpus.py）
+#
+# 每次執行：
+# 1. 兩種實作（legacy / lexer）逐階段計時，換算成 µs / KB
+# 2. 目前 format_latex 的輸出與 golden 比對（以輸入的 sha256 對應，新語料略過）
+# 3. 指定 --baseline 時與先前的結果比較，變慢超過 --threshold 視為退步
+#
+# 用法：
+#   python -m benchmarks.bench_latex --record-golden          # 以目前輸出建立 golden
+#   python -m benchmarks.bench_latex --save run.json          # 計時 + 比對 golden，存結果
+#   python -m benchmarks.bench_latex --baseline run.json      # 與先前結果比較
+# 輸出改變或效能退步時 exit code = 1
+#
+# golden 分兩份：
+# - benchmarks/golden/latex_golden.jsonl：提示詞範例 + 合成片段（不含對話內容，進版控 → clone 下來就能比對）
+# - benchmarks/results/latex_golden_db.jsonl：chat.db 的訊息（含對話內容，只留在本機）
+# 計時結果檔同樣放在 benchmarks/results/（不進版控）
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.latex_corpus import DB_PATH, load_corpus
+from utils import latex_lexer
+from utils import latex_postprocess as legacy
+from utils.latex_postprocess import LATEX_POSTPROCESS, format_latex
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+GOLDEN_PATH = os.path.join("benchmarks", "golden", "latex_golden.jsonl")
+DB_GOLDEN_PATH = os.path.join(RESULTS_DIR, "latex_golden_db.jsonl")
+
+# (實作, [(階段名稱, 函式)])：依 format_latex 的順序
+STAGES = {
+    "legacy": [
+        ("convert_display_math", legacy.convert_display_math),
+        ("convert_inline_math", legacy.convert_inline_math),
+        ("replace_unicode_symbols", legacy.replace_unicode_symbols),
+        ("fix_math_functions", legacy.fix_math_functions),
+        ("fix_simple_fractions", legacy.fix_simple_fractions),
+        ("wrap_latex_math", legacy.wrap_latex_math),
+        ("fix_unbalanced_dollars", legacy.fix_unbalanced_dollars),
+        ("normalize_block_math", legacy.normalize_block_math),
+        ("strip", str.strip),
+    ],
+    "lexer": [
+        ("convert_math_delimiters", latex_lexer.convert_math_delimiters),
+        ("rewrite_symbols", latex_lexer.rewrite_symbols),
+        ("wrap_math", latex_lexer.wrap_math),
+        ("finalize_dollars", latex_lexer.finalize_dollars),
+        ("strip", str.strip),
+    ],
+}
+
+
+def sha256(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# -------- 計時 -------- #
+def time_stages(stages, texts, repeat):
+    """每個階段跑 repeat 次取最小值（µs，整份語料）"""
+    best = {name: float("inf") for name, _ in stages}
+    for _ in range(repeat):
+        spent = dict.fromkeys(best, 0.0)
+        for text in texts:
+            for name, func in stages:
+                start = time.perf_counter()
+                text = func(text)
+                spent[name] += time.perf_counter() - start
+        for name, sec in spent.items():
+            best[name] = min(best[name], sec * 1e6)
+    return best
+
+
+def run_benchmark(texts, repeat):
+    size_kb = sum(len(t.encode()) for t in texts) / 1024
+    results = {}
+    for impl, stages in STAGES.items():
+        best = time_stages(stages, texts, repeat)
+        per_kb = {name: round(us / size_kb, 2) for name, us in best.items()}
+        per_kb["total"] = round(sum(per_kb.values()), 2)
+        results[impl] = per_kb
+    return size_kb, results
+
+
+# -------- golden -------- #
+def load_golden(*paths):
+    golden = {}
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    golden[row["input_sha256"]] = row
+    return golden
+
+
+def record_golden(path, corpus):
+    if not corpus:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for source, text in corpus:
+            # 輸入以 sha256 對應（比對時由語料重建），不重複存
+            row = {"source": source, "input_sha256": sha256(text), "output": format_latex(text)}
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    print(f"golden: {len(corpus)} samples → {path}")
+
+
+def check_golden(golden, corpus):
+    """回傳 (比對數, 新語料數, [不一致])"""
+    compared = new = 0
+    changed = []
+    for source, text in corpus:
+        row = golden.get(sha256(text))
+        if row is None:
+            new += 1
+            continue
+        compared += 1
+        output = format_latex(text)
+        if output != row["output"]:
+            changed.append((source, text, row["output"], output))
+    return compared, new, changed
+
+
+# -------- 報表 -------- #
+def compare_runs(baseline, current, threshold):
+    """列出各階段與 baseline 的差異，回傳退步的 (實作, 階段) list"""
+    regressions = []
+    print(f"\ncompare with baseline {baseline.get('commit')} ({baseline.get('created_at')})")
+    print(f"  {'impl':7s} {'stage':26s} {'base µs/KB':>11s} {'now µs/KB':>11s} {'delta':>8s}")
+    for impl, stages in current["stages"].items():
+        base_stages = baseline["stages"].get(impl, {})
+        for name, now in stages.items():
+            base = base_stages.get(name)
+            if base is None:
+                print(f"  {impl:7s} {name:26s} {'-':>11s} {now:11.2f} {'new':>8s}")
+                continue
+            delta = (now - base) / base if base else 0.0
+            # 太小的階段（< 1 µs/KB）誤差大，不判定退步
+            flag = ""
+            if delta > threshold and now - base > 1.0:
+                flag = "  ← regression"
+                regressions.append((impl, name))
+            print(f"  {impl:7s} {name:26s} {base:11.2f} {now:11.2f} {delta:+7.1%}{flag}")
+
+    if baseline.get("outputs_sha256") != current["outputs_sha256"]:
+        print("  outputs digest changed (語料或輸出不同)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--synthetic", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--golden", default=GOLDEN_PATH, help="範例 + 合成語料的 golden（進版控）")
+    parser.add_argument("--db-golden", default=DB_GOLDEN_PATH, help="chat.db 語料的 golden（只留在本機）")
+    parser.add_argument("--record-golden", action="store_true", help="以目前 format_latex 的輸出建立 golden")
+    parser.add_argument("--save", help="本次結果存成 JSON")
+    parser.add_argument("--baseline", help="先前 --save 的結果，用來比較")
+    parser.add_argument("--threshold", type=float, default=0.15, help="變慢超過此比例視為退步")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.db, args.synthetic, args.seed)
+    texts = [t for _, t in corpus]
+
+    if args.record_golden:
+        record_golden(args.golden, [(s, t) for s, t in corpus if s != "db"])
+        record_golden(args.db_golden, [(s, t) for s, t in corpus if s == "db"])
+        return
+
+    counts = {}
+    for source, _ in corpus:
+        counts[source] = counts.get(source, 0) + 1
+    size_kb, stages = run_benchmark(texts, args.repeat)
+
+    current = {
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "commit": git_commit(),
+        "format_latex": LATEX_POSTPROCESS,
+        "corpus": counts,
+        "corpus_kb": round(size_kb, 1),
+        "stages": stages,
+        "outputs_sha256": sha256("\0".join(format_latex(t) for t in texts)),
+    }
+
+    print(f"corpus: {counts}  {size_kb:.1f} KB  format_latex={LATEX_POSTPROCESS}")
+    for impl, per_kb in stages.items():
+        print(f"\n{impl}")
+        for name, us in per_kb.items():
+            print(f"  {name:26s} {us:10.2f} µs/KB")
+
+    failed = False
+
+    # golden 比對
+    golden = load_golden(args.golden, args.db_golden)
+    if golden:
+        compared, new, changed = check_golden(golden, corpus)
+        print(f"\ngolden: compared {compared}  new {new}  changed {len(changed)}")
+        for source, text, expected, actual in changed[:5]:
+            print(f"\n[{source}] input   : {text!r}")
+            print(f"        expected: {expected!r}")
+            print(f"        actual  : {actual!r}")
+        failed |= bool(changed)
+    else:
+        print(f"\ngolden: {args.golden} 不存在（先執行 --record-golden）")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        failed |= bool(compare_runs(baseline, current, args.threshold))
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"\nsaved → {args.save}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
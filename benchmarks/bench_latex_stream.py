@@ -0,0 +1,101 @@
+# ===== Benchmark：串流 LaTeX 後製的每塊成本 =====
+# 把語料串成一份長回答，以 4 字元為一塊餵入
+# 比較：
+# - 串流格式化器（只處理尚未輸出的部分）
+# - 每塊都對「目前全文」重跑 format_latex（成本隨長度成長）
+# 依位置分段列出每塊平均成本，串流版應維持常數
+# 另外量測開頭有落單 $（「價格是 $5 元」）的同一份回答：之後的切點都不安全，串流版總成本仍應接近線性
+#
+# 用法：python -m benchmarks.bench_latex_stream [--kb 32] [--chunk 4]
+
+import argparse
+import time
+
+from benchmarks.latex_corpus import example_samples, synthetic_samples
+from utils.latex_postprocess import format_latex
+from utils.latex_stream import StreamingLatexFormatter
+
+BUCKETS = 8
+
+STRAY_DOLLAR = "價格是 $5 元\n"
+
+
+def build_answer(kb):
+    parts = example_samples() + synthetic_samples(50)
+    text = ""
+    i = 0
+    while len(text.encode()) < kb * 1024:
+        text += parts[i % len(parts)] + "\n\n"
+        i += 1
+    return text
+
+
+def per_chunk_costs(chunks, step):
+    costs = []
+    for chunk in chunks:
+        start = time.perf_counter()
+        step(chunk)
+        costs.append((time.perf_counter() - start) * 1e6)
+    return costs
+
+
+def bucket_means(costs):
+    size = max(len(costs) // BUCKETS, 1)
+    return [sum(costs[i:i + size]) / len(costs[i:i + size]) for i in range(0, size * BUCKETS, size) if costs[i:i + size]]
+
+
+def stream_total_ms(text, chunk_size):
+    """整份回答以串流格式化器處理的總時間（並確認結果與 format_latex 相同）"""
+    chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+    formatter = StreamingLatexFormatter()
+    start = time.perf_counter()
+    out = [formatter.feed(c) for c in chunks]
+    out.append(formatter.finish())
+    elapsed = (time.perf_counter() - start) * 1000
+    assert "".join(out) == format_latex(text)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--kb", type=int, default=32)
+    parser.add_argument("--chunk", type=int, default=4)
+    args = parser.parse_args()
+
+    text = build_answer(args.kb)
+    chunks = [text[i:i + args.chunk] for i in range(0, len(text), args.chunk)]
+
+    # 串流版
+    formatter = StreamingLatexFormatter()
+    out = []
+    stream_costs = per_chunk_costs(chunks, lambda c: out.append(formatter.feed(c)))
+    out.append(formatter.finish())
+    assert "".join(out) == format_latex(text)
+
+    # 每塊重跑全文
+    seen = []
+
+    def rerun(chunk):
+        seen.append(chunk)
+        format_latex("".join(seen))
+
+    rerun_costs = per_chunk_costs(chunks, rerun)
+
+    print(f"answer: {len(text.encode()) / 1024:.1f} KB  chunks: {len(chunks)}  chunk size: {args.chunk}")
+    print(f"{'position':>10s} {'stream µs/chunk':>16s} {'rerun µs/chunk':>16s}")
+    for i, (s, r) in enumerate(zip(bucket_means(stream_costs), bucket_means(rerun_costs))):
+        print(f"{(i + 1) * 100 // BUCKETS:>9d}% {s:16.2f} {r:16.2f}")
+    print(f"stream total: {sum(stream_costs) / 1000:.1f} ms  rerun total: {sum(rerun_costs) / 1000:.1f} ms")
+    print(f"stream max chunk: {max(stream_costs):.1f} µs")
+
+    start = time.perf_counter()
+    format_latex(text)
+    once_ms = (time.perf_counter() - start) * 1000
+    stray = STRAY_DOLLAR + text
+    print(f"\nformat_latex once: {once_ms:.1f} ms")
+    print(f"stream total: {stream_total_ms(text, args.chunk):.1f} ms  "
+          f"with stray $ at start: {stream_total_ms(stray, args.chunk):.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# ===== Benchmark：PDF 抽字（逐頁 vs 平行 vs 快取）=====
+# 以 pdf_samples 產生不同頁數的題目卷，比較：
+# - serial：本 thread 逐頁（workers=1，等同原本的 extract_text_from_pdf）
+# - parallel：process pool 分頁平行（頁面完成就回傳；pool 程序共用，第一次會包含啟動 worker 的時間）
+# - cached：同一份檔案第二次（PdfTextCache 記憶體命中）
+# 並列出第一頁完成時間、每頁耗時分佈，以及時間預算很小時的部分結果
+#
+# 用法：python -m benchmarks.bench_pdf_extract [--pages 4 16 40 120] [--workers 4]
+# 平行與逐頁的文字不一致時 exit code = 1
+
+import argparse
+import statistics
+import sys
+import time
+
+from benchmarks.pdf_samples import make_problem_set
+from utils.pdf_cache import PdfTextCache
+from utils.pdf_extract import PDF_WORKERS, extract_pdf
+
+
+def timed_extract(data, **kwargs):
+    """回傳 (extraction, 總秒數, 第一頁完成秒數)"""
+    start = time.perf_counter()
+    first = []
+
+    def on_page(result, done, total):
+        if not first:
+            first.append(time.perf_counter() - start)
+
+    extraction = extract_pdf(data, on_page, **kwargs)
+    return extraction, time.perf_counter() - start, first[0] if first else None
+
+
+def page_ms(report):
+    ms = [p["ms"] for p in report["per_page"] if p["status"] == "ok"]
+    return (statistics.median(ms), max(ms)) if ms else (0.0, 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[4, 16, 40, 120])
+    parser.add_argument("--problems", type=int, default=4, help="每頁題數")
+    parser.add_argument("--workers", type=int, default=PDF_WORKERS)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"workers: {args.workers}")
+    print(f"{'pages':>6s} {'KB':>7s} {'serial s':>9s} {'parallel s':>11s} {'first page s':>13s} "
+          f"{'cached ms':>10s} {'page p50 ms':>12s} {'page max ms':>12s}")
+
+    for pages in args.pages:
+        data, _ = make_problem_set(pages, args.problems)
+
+        serial, serial_s, _ = timed_extract(data, workers=1)
+        parallel, parallel_s, first_s = timed_extract(data, workers=args.workers)
+        if serial.pages != parallel.pages:
+            print(f"  ✗ {pages} pages: parallel text differs from serial")
+            failed = True
+
+        cache = PdfTextCache(cache_dir="")
+        cache.get(data, lambda d: parallel)
+        start = time.perf_counter()
+        cache.get(data, lambda d: extract_pdf(d, workers=args.workers))
+        cached_ms = (time.perf_counter() - start) * 1000
+
+        p50, worst = page_ms(parallel.report)
+        print(f"{pages:6d} {len(data) / 1024:7.1f} {serial_s:9.3f} {parallel_s:11.3f} {first_s:13.3f} "
+              f"{cached_ms:10.3f} {p50:12.2f} {worst:12.2f}")
+
+    # 預算用完：只回傳已完成的頁面
+    pages = max(args.pages)
+    data, _ = make_problem_set(pages, args.problems)
+    for label, kwargs in [
+        ("total_timeout=0.05s", {"total_timeout": 0.05}),
+        ("max_total_chars=5000", {"max_total_chars": 5000}),
+        ("max_pages=10", {"max_pages": 10}),
+    ]:
+        extraction, seconds, _ = timed_extract(data, workers=args.workers, **kwargs)
+        report = extraction.report
+        print(f"\nbudget {label}: {report['extracted']}/{report['pages']} pages in {seconds:.3f}s "
+              f"{report['chars']} chars complete={report['complete']} {report['status_counts']}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
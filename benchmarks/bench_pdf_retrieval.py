@@ -0,0 +1,121 @@
+# ===== Benchmark：上傳 PDF 全文貼入 vs 段落檢索 =====
+# 以 pdf_samples 產生不同頁數的題目卷，對同一組提問比較：
+# - full：原本的做法，整份文字貼進提問
+# - retrieval：PdfIndex 只放相關段落（utils/pdf_index.py）
+#
+# 指標：
+# - 提問 token 數（離線估算）：直接決定模型的輸入成本與首字延遲
+# - 組裝提問耗時：第一次（抽字 + 建索引）與之後每回合（快取命中 + 檢索）
+# - 命中率：指定題號的提問有沒有選到該題；主題提問有沒有選到該主題的題目
+# - 每則訊息存進 DB 的大小：全文內嵌 vs 附件參照（utils/attachments.py）
+#
+# 使用 in-memory backend，不寫入 chat.db
+#
+# 用法：python -m benchmarks.bench_pdf_retrieval [--pages 4 16 40 120] [--queries 50]
+
+import argparse
+import random
+import statistics
+import time
+from io import BytesIO
+
+from benchmarks.pdf_samples import TOPIC_QUERIES, make_problem_set
+from db.backend import set_backend
+from db.memory_backend import InMemoryBackend
+from utils import pdf_index
+from utils.attachments import attachment_store, expand_content, split_reference
+from utils.input_builder import build_user_input
+from utils.pdf_cache import pdf_text_cache
+from utils.pdf_index import PdfIndex, get_index
+from utils.token_estimator import estimate_tokens
+
+
+class Upload(BytesIO):
+    """模擬 Streamlit UploadedFile"""
+    type = "application/pdf"
+
+
+def full_input(pages, question):
+    text = "\n".join(p for p in pages if p).strip()
+    return f"【題目／參考資料（學生上傳）】\n{text}\n\n【學生的提問／說明】\n{question}"
+
+
+def make_queries(page_texts, problems_per_page, count, seed):
+    """[(提問, 命中判斷)]：一半指定題號、一半問主題（只問文件中有的主題）"""
+    rng = random.Random(seed)
+    total = len(page_texts) * problems_per_page
+    document = "\n".join(page_texts)
+    topics = [t for t, (_, keyword) in TOPIC_QUERIES.items() if keyword in document]
+    queries = []
+    for i in range(count):
+        if i % 2 == 0:
+            number = rng.randint(1, total)
+            question = rng.choice([f"第 {number} 題怎麼做？", f"Problem {number} 我卡住了", f"第{number}題的第一步是什麼"])
+            queries.append((question, lambda chunks, n=number: any(c.problem == n for c in chunks)))
+        else:
+            question, keyword = TOPIC_QUERIES[rng.choice(topics)]
+            queries.append((question, lambda chunks, k=keyword: any(k in c.text for c in chunks)))
+    return queries
+
+
+def turn(question, data):
+    """一回合的提問組裝：存進 DB 的形式 + 送給模型的形式"""
+    stored = build_user_input(question, Upload(data))
+    return stored, expand_content(stored)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[4, 16, 40, 120])
+    parser.add_argument("--problems", type=int, default=4, help="每頁題數")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    set_backend(InMemoryBackend())
+    print(f"{'pages':>6s} {'full tok':>9s} {'retr tok':>9s} {'saved':>7s} "
+          f"{'first turn ms':>14s} {'next turn ms':>13s} {'index ms':>9s} {'hit rate':>9s} "
+          f"{'full B/msg':>11s} {'ref B/msg':>10s}")
+
+    for pages in args.pages:
+        data, page_texts = make_problem_set(pages, args.problems, args.seed)
+        queries = make_queries(page_texts, args.problems, args.queries, args.seed)
+
+        # 第一回合：抽字 + 存附件 + 建索引
+        pdf_text_cache.clear()
+        pdf_index._indexes.clear()
+        start = time.perf_counter()
+        stored, _ = turn(queries[0][0], data)
+        first_ms = (time.perf_counter() - start) * 1000
+
+        key, _ = split_reference(stored)
+        pages_text = attachment_store.load(key).pages
+        index = get_index(key, pages_text)
+        start = time.perf_counter()
+        PdfIndex(pages_text)
+        index_ms = (time.perf_counter() - start) * 1000
+
+        full_tokens, retrieval_tokens, turn_ms, full_bytes, ref_bytes = [], [], [], [], []
+        hits = 0
+        for question, hit in queries:
+            legacy = full_input(page_texts, question)
+            full_tokens.append(estimate_tokens(legacy))
+            full_bytes.append(len(legacy.encode()))
+
+            start = time.perf_counter()
+            stored, prompt = turn(question, data)
+            turn_ms.append((time.perf_counter() - start) * 1000)
+            retrieval_tokens.append(estimate_tokens(prompt))
+            ref_bytes.append(len(stored.encode()))
+
+            hits += hit(index.select(question))
+
+        full = statistics.mean(full_tokens)
+        retrieval = statistics.mean(retrieval_tokens)
+        print(f"{pages:6d} {full:9.0f} {retrieval:9.0f} {1 - retrieval / full:7.1%} "
+              f"{first_ms:14.1f} {statistics.median(turn_ms):13.2f} {index_ms:9.1f} {hits / len(queries):9.1%} "
+              f"{statistics.mean(full_bytes):11.0f} {statistics.mean(ref_bytes):10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# ===== Benchmark：System Prompt 組裝 =====
+# 比較「每回合重新組裝」與「查預先編譯的表」
+#
+# 用法：python -m benchmarks.bench_prompt_build [--repeat 20000]
+
+import argparse
+import time
+
+from prompts.prompt_table import PROMPT_TABLE, assemble_prompt, get_prompt_variant
+
+
+def _time(func, repeat):
+    keys = list(PROMPT_TABLE)
+    start = time.perf_counter()
+    for i in range(repeat):
+        func(*keys[i % len(keys)])
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    # 兩種方式結果必須相同
+    for (mode, task_type), variant in PROMPT_TABLE.items():
+        assert assemble_prompt(mode, task_type) == variant.text
+
+    rebuild = _time(assemble_prompt, args.repeat)
+    lookup = _time(lambda m, t: get_prompt_variant(m, t).text, args.repeat)
+
+    print(f"variants: {len(PROMPT_TABLE)}")
+    for (mode, task_type), variant in PROMPT_TABLE.items():
+        print(f"  {mode:8s} {task_type}  ~{variant.tokens:5d} tokens  {variant.sha256[:12]}")
+    print(f"rebuild per turn : {rebuild:8.2f} µs")
+    print(f"table lookup     : {lookup:8.2f} µs  (x{rebuild / lookup:.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# ===== Benchmark：每回合「是否需要摘要」的 DB 時間 =====
+# 舊：load_summary + load_summary_pointer + load_messages_after_id（讀全部內容再 len）
+# 新：load_summary_status（一次 JOIN + COUNT）
+#
+# 用法：python -m benchmarks.bench_summary_check [--pending 19] [--size 3000] [--repeat 2000]
+
+import argparse
+import os
+import tempfile
+import time
+
+from db.connection import ConnectionManager
+from db.sqlite_backend import SQLiteBackend
+
+
+def _legacy_check(backend, username):
+    summary_text = backend.load_summary(username)
+    last_ptr = backend.load_summary_pointer(username)
+    older_msgs = backend.load_messages_after_id(username, last_ptr)
+    return summary_text, last_ptr, len(older_msgs)
+
+
+def _status_check(backend, username):
+    return backend.load_summary_status(username)
+
+
+def _time(func, backend, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(backend, "student")
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pending", type=int, default=19, help="尚未摘要的訊息數（<20 代表不會觸發摘要）")
+    parser.add_argument("--size", type=int, default=3000, help="每則訊息字元數")
+    parser.add_argument("--history", type=int, default=2000, help="已摘要的舊訊息數")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        manager = ConnectionManager(os.path.join(tmpdir, "bench.db"))
+        backend = SQLiteBackend(manager)
+        backend.init_schema()
+
+        body = "解" * args.size
+        backend.save_messages([("student", "user", body)] * args.history)
+        backend.save_summary_state("student", "舊摘要" * 200, args.history)
+        backend.save_messages([("student", "assistant", body)] * args.pending)
+
+        assert _legacy_check(backend, "student") == _status_check(backend, "student")
+
+        legacy = _time(_legacy_check, backend, args.repeat)
+        status = _time(_status_check, backend, args.repeat)
+        manager.close_all()
+
+    print(f"pending={args.pending} size={args.size} chars history={args.history}")
+    print(f"3 queries + load bodies : {legacy:7.3f} ms/turn")
+    print(f"single status query     : {status:7.3f} ms/turn  (x{legacy / status:.1f})")
+
+
+if __name__ == "__main__":
+    main()
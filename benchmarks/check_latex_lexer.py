@@ -0,0 +1,62 @@
+# ===== Golden 比對：lexer 版 vs 舊版 format_latex =====
+# 舊版（format_latex_legacy）的輸出就是 golden：lexer 版對每份語料必須完全相同
+# 同時列出兩者的處理速度（µs / KB）
+#
+# 用法：python -m benchmarks.check_latex_lexer [--db chat.db] [--synthetic 5000]
+# 有任何不一致時 exit code = 1
+
+import argparse
+import sys
+import time
+
+from benchmarks.latex_corpus import DB_PATH, load_corpus
+from utils.latex_lexer import format_latex_lexer
+from utils.latex_postprocess import format_latex_legacy
+
+
+def _time_per_kb(func, texts, repeat):
+    size_kb = sum(len(t.encode()) for t in texts) / 1024
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for t in texts:
+            func(t)
+    return (time.perf_counter() - start) / repeat / size_kb * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--synthetic", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.db, args.synthetic, args.seed)
+
+    failures = []
+    for source, text in corpus:
+        golden = format_latex_legacy(text)
+        actual = format_latex_lexer(text)
+        if actual != golden:
+            failures.append((source, text, golden, actual))
+
+    by_source = {}
+    for source, _ in corpus:
+        by_source[source] = by_source.get(source, 0) + 1
+    print(f"corpus: {by_source}  failures: {len(failures)}")
+    for source, text, golden, actual in failures[:5]:
+        print(f"\n[{source}] input : {text!r}")
+        print(f"        golden: {golden!r}")
+        print(f"        lexer : {actual!r}")
+
+    texts = [t for _, t in corpus]
+    legacy = _time_per_kb(format_latex_legacy, texts, args.repeat)
+    lexer = _time_per_kb(format_latex_lexer, texts, args.repeat)
+    print(f"legacy: {legacy:8.1f} µs/KB")
+    print(f"lexer : {lexer:8.1f} µs/KB  (x{legacy / lexer:.1f})")
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
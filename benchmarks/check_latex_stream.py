@@ -0,0 +1,88 @@
+# ===== 差異測試：串流 LaTeX 後製 vs format_latex =====
+# 每份語料以多種隨機切法分塊餵入 StreamingLatexFormatter，
+# 串起來的輸出必須與 format_latex(完整文字) 完全相同
+# 另外把範例串成長回答並在開頭放一個落單的 $：結果要相同，且串流總成本不能隨長度平方成長
+#
+# 用法：python -m benchmarks.check_latex_stream [--db chat.db] [--splits 20] [--synthetic 2000]
+# 有任何不一致時 exit code = 1
+
+import argparse
+import random
+import sys
+import time
+
+from benchmarks.latex_corpus import DB_PATH, example_samples, load_corpus, random_chunks
+from utils.latex_postprocess import format_latex
+from utils.latex_stream import format_latex_chunks
+
+STRAY_DOLLAR = "價格是 $5 元\n"
+
+# 落單 $ 的長回答：串流總時間 / format_latex 一次的時間，超過此倍數視為退步
+STRAY_MAX_RATIO = 20
+
+
+def check_stray_dollar(rng, kb=24):
+    """回傳 (不一致的 (text, chunks, expected, actual) or None, 串流 ms, format_latex ms)"""
+    text = STRAY_DOLLAR
+    parts = example_samples()
+    while len(text.encode()) < kb * 1024:
+        text += rng.choice(parts) + "\n\n"
+    chunks = random_chunks(text, rng, 4)
+
+    start = time.perf_counter()
+    expected = format_latex(text)
+    once_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    actual = format_latex_chunks(chunks)
+    stream_ms = (time.perf_counter() - start) * 1000
+    failure = (text, chunks, expected, actual) if actual != expected else None
+    return failure, stream_ms, once_ms
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--splits", type=int, default=20, help="每份語料的隨機切法數")
+    parser.add_argument("--synthetic", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.db, args.synthetic, args.seed)
+    rng = random.Random(args.seed)
+
+    checked = 0
+    failures = []
+    for source, text in corpus:
+        expected = format_latex(text)
+
+        # 整段一次、逐字、隨機大小
+        splits = [[text], list(text)]
+        splits += [random_chunks(text, rng, rng.choice((2, 4, 8, 32))) for _ in range(args.splits)]
+
+        for chunks in splits:
+            checked += 1
+            actual = format_latex_chunks(chunks)
+            if actual != expected:
+                failures.append((source, text, chunks, expected, actual))
+                break
+
+    failure, stream_ms, once_ms = check_stray_dollar(rng)
+    if failure is not None:
+        failures.append(("stray-dollar", *failure))
+    slow = stream_ms > STRAY_MAX_RATIO * max(once_ms, 1.0)
+    print(f"stray $ answer: stream {stream_ms:.1f} ms  format_latex once {once_ms:.1f} ms"
+          f"{'  ← too slow' if slow else ''}")
+
+    print(f"corpus: {len(corpus)}  checked splits: {checked}  failures: {len(failures)}")
+    for source, text, chunks, expected, actual in failures[:5]:
+        print(f"\n[{source}] input   : {text!r}")
+        print(f"        chunks  : {chunks!r}")
+        print(f"        expected: {expected!r}")
+        print(f"        actual  : {actual!r}")
+
+    sys.exit(1 if failures or slow else 0)
+
+
+if __name__ == "__main__":
+    main()
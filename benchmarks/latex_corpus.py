@@ -0,0 +1,77 @@
+# ===== LaTeX 後製測試語料 =====
+# 來源（依序合併）：
+# 1. chat.db 內的 assistant 訊息
+# 2. 提示詞內的教學範例（含 $ / $$ / \frac 等實際輸出格式）
+# 3. 隨機合成的片段（刻意混入 \[ \( 落單 $ 分數 Unicode 符號等邊界情況）
+
+import os
+import random
+import sqlite3
+
+from db.connection import DB_PATH
+from prompts.general_teaching_example import get_general_teaching_example
+
+# 合成片段用的詞彙（模型常見輸出 + 容易出錯的組合）
+SYNTHETIC_TOKENS = [
+    "所以", "我們可以得到", "因此", "，", "。", "：", "\n", "\n\n", " ", "  ",
+    "x", "y", "2", "10", "a/b", "dy/dx", "y/x", "1/2", "(x+1)/y",
+    "sin x", "cos(x)", "ln x", "log 2", "sqrt(x)", "arctan x", "max",
+    "∑", "∞", "∫", "π", "≤", "≥", "≠", "→", "×", "÷", "·",
+    "= ", "^2", "_n", "+", "-",
+    "$x^2$", "$", "$$", "$$\\frac{1}{2}$$", "\\frac{dy}{dx}", "\\sqrt{x}",
+    "\\[ x^2 + 1 \\]", "\\[", "\\]", "\\( x \\)", "\\(", "\\)",
+    "\\left(", "\\right)", "\\lim_{x \\to 0}", "{", "}",
+]
+
+
+def db_samples(db_path=DB_PATH):
+    """chat.db 內所有 assistant 訊息（唯讀開啟；檔案或資料表不存在時回傳空 list）"""
+    if not os.path.exists(db_path):
+        return []
+    try:
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            rows = conn.execute("SELECT content FROM messages WHERE role = 'assistant' ORDER BY id").fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return []
+    return [r[0] for r in rows if r[0]]
+
+
+def example_samples():
+    """提示詞內的教學範例（guided / socratic × 情境 1~5）"""
+    samples = []
+    for mode in ("guided", "socratic"):
+        for context_type in ("1", "2", "3", "4", "5"):
+            text = get_general_teaching_example(mode, context_type)
+            if text and text.strip():
+                samples.append(text)
+    return samples
+
+
+def synthetic_samples(n=200, seed=0, max_tokens=120):
+    rng = random.Random(seed)
+    return [
+        "".join(rng.choice(SYNTHETIC_TOKENS) for _ in range(rng.randint(1, max_tokens)))
+        for _ in range(n)
+    ]
+
+
+def load_corpus(db_path=DB_PATH, synthetic=200, seed=0):
+    """回傳 [(來源, 文字)]，來源為 'db' / 'example' / 'synthetic'"""
+    corpus = [("db", t) for t in db_samples(db_path)]
+    corpus += [("example", t) for t in example_samples()]
+    corpus += [("synthetic", t) for t in synthetic_samples(synthetic, seed)]
+    return corpus
+
+
+def random_chunks(text, rng, max_size=8):
+    """模擬模型 token：切成 1~max_size 字元的片段"""
+    chunks = []
+    i = 0
+    while i < len(text):
+        size = rng.randint(1, max_size)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
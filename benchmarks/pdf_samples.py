@@ -0,0 +1,89 @@
+# ===== 合成多頁 PDF（benchmark 用）=====
+# 以 pypdf 直接產生文字頁面（Helvetica，只有 ASCII），不需要其他套件
+# 每頁是一組編號的練習題，題目內容固定 seed 隨機產生
+#
+# make_problem_set(pages, problems_per_page, seed) → (pdf bytes, [每頁題目文字])
+
+import random
+from io import BytesIO
+
+from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+TOPICS = [
+    ("quadratic", "Solve x^2 {s} {b}x {s2} {c} = 0 and check the discriminant."),
+    ("derivative", "Find the derivative of f(x) = {a}x^3 {s} {b}sin(x) at x = {c}."),
+    ("integral", "Evaluate the integral of {a}x^2 {s} {b} from 0 to {c}."),
+    ("probability", "A bag has {a} red and {b} blue balls. Draw {c} without replacement; find P(all red)."),
+    ("sequence", "The arithmetic sequence starts at {a} with difference {b}. Find the sum of the first {c} terms."),
+    ("triangle", "A right triangle has legs {a} and {b}. Find the hypotenuse and the angle opposite {c}."),
+    ("logarithm", "Solve log_{a}(x {s} {b}) = {c} for x."),
+    ("matrix", "Compute the determinant of [[{a}, {b}], [{c}, {a}]] and its inverse."),
+    ("vector", "Vectors u = ({a}, {b}) and v = ({c}, {a}); find the angle between u and v."),
+    ("limit", "Find the limit of ({a}x^2 {s} {b}) / ({c}x^2 + 1) as x goes to infinity."),
+]
+
+# 主題 → (學生可能的問法, 命中判斷用的關鍵字)
+TOPIC_QUERIES = {
+    "quadratic": ("這題一元二次方程式的判別式要怎麼看？discriminant", "discriminant"),
+    "derivative": ("sin(x) 那題的導數 derivative 怎麼算", "derivative"),
+    "integral": ("定積分 integral 從 0 到多少那題不會", "integral"),
+    "probability": ("抽紅球 red balls 的機率題怎麼想", "red"),
+    "sequence": ("等差數列 arithmetic sequence 前幾項和", "arithmetic"),
+    "triangle": ("直角三角形 hypotenuse 斜邊怎麼求", "hypotenuse"),
+    "logarithm": ("log 方程式 solve log 那題", "log_"),
+    "matrix": ("行列式 determinant 跟反矩陣 inverse", "determinant"),
+    "vector": ("兩個向量 vectors 的夾角 angle", "vectors"),
+    "limit": ("x 趨近無限大 infinity 的極限 limit", "limit"),
+}
+
+FILLER = (
+    "Show every step and explain why each step is valid. "
+    "Hint: rewrite the expression first, then compare with the worked example in the chapter."
+)
+
+
+def _problem(rng, number):
+    topic, template = rng.choice(TOPICS)
+    text = template.format(
+        a=rng.randint(1, 9), b=rng.randint(1, 9), c=rng.randint(1, 9),
+        s=rng.choice("+-"), s2=rng.choice("+-"),
+    )
+    return topic, f"{number}. {text}"
+
+
+def _escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_problem_set(pages, problems_per_page=4, seed=0):
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica"),
+    }))
+
+    page_texts = []
+    number = 1
+    for page_no in range(1, pages + 1):
+        lines = [f"Chapter practice - page {page_no}"]
+        for _ in range(problems_per_page):
+            _, problem = _problem(rng, number)
+            lines += [problem, FILLER, ""]
+            number += 1
+        page_texts.append("\n".join(lines))
+
+        page = writer.add_blank_page(612, 792)
+        body = "BT /F1 10 Tf 13 TL 50 750 Td " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        stream = DecodedStreamObject()
+        stream.set_data(body.encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        page[NameObject("/Resources")] = DictionaryObject({
+            NameObject("/Font"): DictionaryObject({NameObject("/F1"): font}),
+        })
+
+    buf = BytesIO()
+    writer.write(buf)
+    return buf.getvalue(), page_texts
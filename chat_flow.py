@@ -1,11 +1,14 @@
 from utils.input_builder import build_user_input
-from application_chain import run_application_turn
+from application_chain import stream_application_turn
 from ui_design.ui_render import render_one
 
 import streamlit as st
 import time
 
 
+# 串流時 placeholder 重畫的最短間隔（秒），避免每個 token 都送一次畫面更新
+STREAM_RENDER_INTERVAL = 0.05
+
 # 處理對話流程
 def process_user_turn(
     username: str,
@@ -21,13 +24,13 @@ def process_user_turn(
     包含：
     1. append user message
     2. render user
-    3. 呼叫 LLM
-    4. append AI message
-    5. fake streaming render
+    3. 呼叫 LLM（串流）
+    4. 逐 token render AI 回覆（Latex 串流後製：已確定的部分先換成後製結果）
+    5. append AI message
 
     設計重點：
-    - UI / 邏輯 解耦
-    - 可插拔（未來可加 retry / logging / 真 streaming）
+    - UI / 邏輯 解耦（UI 只消費 stream_application_turn 的事件）
+    - 存 DB 在 application 層串流結束時進行
     """
     # 存使用者輸入到 session_state
     user_msg = {"role": "user", "content": user_input}
@@ -37,38 +40,59 @@ def process_user_turn(
     with chat_container:
         render_one(user_msg)
 
-    # 顯示 loading 呼叫 llm
-    with st.spinner("Foxie 正在思考... 🍀"):
-        try:
-            full_input = build_user_input(user_input, pdf)
-            result = run_application_turn(username, full_input, mode=mode)
-            reply = result["answer"]
-        except Exception as e:
-            # 保底錯誤（防止整個 UI 爆掉）
-            reply = f"⚠ 系統錯誤：{str(e)}"
-
-    # 存 AI 回覆到 session_state
-    ai_msg = {"role": "assistant", "content": reply}
-    msg_list.append(ai_msg)
-
-    # 只 render AI 回覆
+    # 串流 render AI 回覆（token 一到就更新 placeholder）
+    reply = ""
     with chat_container:
         left, center, right = st.columns([1, 7, 1])
         with center:
             st.markdown("🦊 **Foxie**")
 
-            # 建立 placeholder
+            # 建立 placeholder（第一個 token 到達前顯示思考中）
             stream_placeholder = st.empty()
-            streamed_text = ""
+            stream_placeholder.markdown("Foxie 正在思考... 🍀")
+            streamed_text = pending = ""
+            last_render = 0.0
 
-            # fake streaming(逐字輸出)
-            for ch in reply:
-                streamed_text += ch
-                stream_placeholder.markdown(streamed_text)
-                time.sleep(0.01)  # 可調整速度
+            # PDF 第一次解析時顯示進度（頁面完成就更新）
+            def on_pdf_page(result, done, total):
+                nonlocal last_render
+                now = time.monotonic()
+                if done == total or now - last_render >= STREAM_RENDER_INTERVAL:
+                    stream_placeholder.markdown(f"Foxie 正在讀 PDF... {done}/{total} 頁 📄")
+                    last_render = now
 
+            try:
+                full_input = build_user_input(user_input, pdf, on_page=on_pdf_page)
+                if pdf is not None:
+                    stream_placeholder.markdown("Foxie 正在思考... 🍀")
+                for event in stream_application_turn(username, full_input, mode=mode):
+                    if event["type"] == "token":
+                        streamed_text += event["text"]
+                        pending = event["pending"]
+                    elif event["type"] == "reset":
+                        streamed_text = pending = ""
+                    elif event["type"] == "done":
+                        reply = event["result"]["answer"]
+                        continue
+
+                    # 節流：每 STREAM_RENDER_INTERVAL 秒最多重畫一次
+                    # 已後製的部分 + 尚未後製的最後一段原文
+                    now = time.monotonic()
+                    if now - last_render >= STREAM_RENDER_INTERVAL:
+                        stream_placeholder.markdown(streamed_text + pending + "▌")
+                        last_render = now
+            except Exception as e:
+                # 保底錯誤（防止整個 UI 爆掉）
+                reply = f"⚠ 系統錯誤：{str(e)}"
+
+            # 串流結束：換成完整的 Latex 後製回答
+            stream_placeholder.markdown(reply)
             st.markdown('---')
 
+    # 存 AI 回覆到 session_state
+    ai_msg = {"role": "assistant", "content": reply}
+    msg_list.append(ai_msg)
+
     # return(為未來擴展預留)
     return {
         "user_msg": user_msg,
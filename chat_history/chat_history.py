@@ -1,28 +1,62 @@
-from langchain_core.messages import HumanMessage, AIMessage
 from summary.summary import maybe_run_summary
+from chat_history.epoch_layout import epoch_layout
+from db.backend import get_backend
+from task_classifier.context_policy import classifier_context_policy, context_tokens
 from db.safe_crud import load_recent_messages
+from db.journal import message_journal
+from utils.attachments import expand_turn_input, history_messages, tokens_saved
 
-def build_chat_history(username):
+RECENT_N = 20   # 平常候選的最近訊息數
+MAX_TAIL = 40   # 摘要延遲時最多候選的訊息數
+
+
+def build_chat_history(username, mode="guided"):
     """
     對外提供唯一接口：
-    回傳 LLM 可用的 chat_history(含摘要 + 最近 N 則訊息)
+    回傳 (LLM 可用的 chat_history(含摘要 + 最近訊息), token 使用報告)
+    - 實際帶入幾則由 mode 對應的 token 預算決定（config/context_budget.py）
+    - 排版為 append-only epoch（chat_history/epoch_layout.py）→ 連續回合前綴相同，利於 prompt cache
     """
 
-    # 每次請求都建立新的空 list 組合成 chat_history
-    input_chat_history = []
+    # 上一回合的訊息可能還在 write-behind queue → 先等它落盤再讀
+    message_journal.wait_for_user(username)
+
+    # ---- 1. 摘要（若有） ----
+    # 摘要在背景執行：這裡拿到的是最後一次 commit 的摘要
+    summary_text, unsummarized = maybe_run_summary(username)
 
-    # ---- 1. 加入摘要（若有） ----
-    summary_text = maybe_run_summary(username)
-    if summary_text:
-        input_chat_history.append(AIMessage(content=f"[過往摘要]\n{summary_text}"))
+    # ---- 2. 在 token 預算內組合 chat_history ----
+    # rebase 時的候選訊息數：新摘要尚未完成時，未摘要的尾端可能超過 RECENT_N → 一併考慮（有上限）
+    n = min(max(RECENT_N, unsummarized), MAX_TAIL)
+    input_chat_history, report = epoch_layout.build(username, mode, summary_text, get_backend(), n)
+    print(f"📦 [CONTEXT] {report}")
 
-    # 從 SQLite 載入最近 n 則對話
-    recent_msgs = load_recent_messages(username)
+    return input_chat_history, report
 
-    for m in recent_msgs:
-        if m["role"] == "user":
-            input_chat_history.append(HumanMessage(content=m["content"]))
-        else:
-            input_chat_history.append(AIMessage(content=m["content"]))
 
-    return input_chat_history
+def build_classifier_history(username, policy=classifier_context_policy):
+    """
+    任務分類用的精簡 chat_history（規則見 task_classifier/context_policy.py）
+    - 不含摘要、不觸發摘要檢查 → 可與 build_chat_history 並行
+    """
+    message_journal.wait_for_user(username)
+
+    msgs = history_messages(load_recent_messages(username, n=policy.fetch_n))
+    history = policy.apply(msgs)
+    print(f"🏷️ [CLASSIFIER CONTEXT] {len(history)} msgs, ~{context_tokens(history)} tokens, attachment saved ~{tokens_saved(msgs)}")
+    return history
+
+
+def build_turn_input(username, user_input):
+    """
+    本回合送模型的使用者輸入（附件展開，見 utils/attachments.expand_turn_input）
+    - 沒有附件但提到先前上傳的附件時，才讀最近訊息找出該附件
+    """
+    def load_recent():
+        message_journal.wait_for_user(username)
+        return load_recent_messages(username, n=RECENT_N)
+
+    prompt_input, recalled = expand_turn_input(user_input, load_recent)
+    if recalled:
+        print(f"📎 [ATTACHMENT] 沿用先前上傳的附件 {recalled[:12]}")
+    return prompt_input
\ No newline at end of file
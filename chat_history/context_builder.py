@@ -0,0 +1,89 @@
+# ===== Token 預算驅動的 context 組裝 =====
+from langchain_core.messages import HumanMessage, AIMessage
+
+from config.context_budget import CONTEXT_BUDGETS
+from utils.token_estimator import estimate_message_tokens, truncate_to_tokens, MESSAGE_OVERHEAD
+
+
+def get_budget(mode):
+    if mode not in CONTEXT_BUDGETS:
+        raise ValueError(f"未定義模式的 context 預算: {mode}")
+    return CONTEXT_BUDGETS[mode]
+
+
+def to_message(role, content):
+    return HumanMessage(content=content) if role == "user" else AIMessage(content=content)
+
+
+def summary_message(summary_text, budget):
+    """摘要 → (AIMessage or None, token 數)，超過 summary_tokens 則截斷"""
+    if not summary_text:
+        return None, 0
+    content = f"[過往摘要]\n{truncate_to_tokens(summary_text, budget['summary_tokens'])}"
+    return AIMessage(content=content), estimate_message_tokens(content)
+
+
+def fit_message(content, budget):
+    """單則訊息 → (內容, 是否截斷)；截斷結果只取決於內容本身（同一則每次都一樣）"""
+    if estimate_message_tokens(content) > budget["message_tokens"]:
+        return truncate_to_tokens(content, budget["message_tokens"] - MESSAGE_OVERHEAD), True
+    return content, False
+
+
+def pack_newest(recent_msgs, remaining, budget):
+    """
+    由新到舊放入訊息直到 remaining 用完
+    回傳: (放入的 [(原訊息 dict, 內容)] 由舊到新, 使用 token, 截斷則數)
+    """
+    packed = []
+    used = 0
+    truncated = 0
+    for m in reversed(recent_msgs):
+        content, cut = fit_message(m["content"], budget)
+        cost = estimate_message_tokens(content)
+        if cost > remaining:
+            break
+
+        remaining -= cost
+        used += cost
+        truncated += cut
+        packed.append((m, content))
+
+    packed.reverse()  # 由舊到新排序
+    return packed, used, truncated
+
+
+def build_context(summary_text, recent_msgs, mode):
+    """
+    在 token 預算內組裝 chat_history
+
+    規則：
+    1. 摘要優先放入（超過 summary_tokens 則截斷）
+    2. 最近訊息由新到舊放入，單則超過 message_tokens 先截斷
+    3. 放不下就停止（較舊的訊息捨棄），輸出仍維持舊 → 新順序
+
+    回傳: (messages, report)
+    report = {"budget", "summary_tokens", "history_tokens", "total_tokens",
+              "messages_used", "messages_dropped", "messages_truncated"}
+    """
+    budget = get_budget(mode)
+
+    # ---- 1. 摘要 ----
+    summary_msg, summary_tokens = summary_message(summary_text, budget)
+
+    # ---- 2. 最近訊息（新 → 舊） ----
+    packed, history_tokens, truncated = pack_newest(recent_msgs, budget["history_tokens"] - summary_tokens, budget)
+
+    report = {
+        "budget": budget["history_tokens"],
+        "summary_tokens": summary_tokens,
+        "history_tokens": history_tokens,
+        "total_tokens": summary_tokens + history_tokens,
+        "messages_used": len(packed),
+        "messages_dropped": len(recent_msgs) - len(packed),
+        "messages_truncated": truncated,
+    }
+
+    messages = [summary_msg] if summary_msg else []
+    messages += [to_message(m["role"], content) for m, content in packed]
+    return messages, report
@@ -0,0 +1,118 @@
+# ===== Prefix-cache 友善的 history 排版 =====
+# 舊做法：摘要 + 最近 20 則 → 每回合視窗滑動一則，system prompt 之後的內容全變
+#         → 模型供應商的 prompt prefix cache 幾乎不會命中
+# 新做法：以 epoch 為單位
+# - epoch 內：摘要快照固定，訊息從 epoch 起點開始只增不減（append-only）
+#   → 連續回合的 token 前綴逐位元組相同
+# - 超過預算才 rebase：一次丟掉一整段舊訊息，重新取摘要，開始新 epoch
+
+import threading
+from collections import OrderedDict
+
+from chat_history.context_builder import get_budget, summary_message, fit_message, pack_newest, to_message
+from utils.attachments import history_messages
+from utils.token_estimator import estimate_message_tokens
+
+
+class _Epoch:
+    __slots__ = ("number", "start_id", "summary_msg", "summary_tokens")
+
+    def __init__(self, number, start_id, summary_msg, summary_tokens):
+        self.number = number
+        self.start_id = start_id          # epoch 內第一則訊息 id（含）
+        self.summary_msg = summary_msg    # 摘要快照（epoch 內不變）
+        self.summary_tokens = summary_tokens
+
+
+class EpochLayout:
+    """
+    build(...) → (messages, report)
+
+    - fill_ratio：rebase 後只填到預算的這個比例，保留空間讓後續回合 append
+    - max_messages：epoch 內訊息數上限（避免預算很大時無限成長）
+    """
+
+    def __init__(self, fill_ratio=0.6, max_messages=40, max_users=1024):
+        self.fill_ratio = fill_ratio
+        self.max_messages = max_messages
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._epochs = OrderedDict()  # (username, mode) → _Epoch
+
+    def _get(self, key):
+        with self._lock:
+            epoch = self._epochs.get(key)
+            if epoch is not None:
+                self._epochs.move_to_end(key)
+            return epoch
+
+    def _set(self, key, epoch):
+        with self._lock:
+            self._epochs[key] = epoch
+            self._epochs.move_to_end(key)
+            while len(self._epochs) > self.max_users:
+                self._epochs.popitem(last=False)
+
+    def build(self, username, mode, summary_text, backend, candidates_n):
+        budget = get_budget(mode)
+        key = (username, mode)
+        epoch = self._get(key)
+
+        # ---- 1. 延續目前 epoch：起點之後的訊息全部放入 ----
+        if epoch is not None:
+            msgs = history_messages(backend.load_messages_after_id(username, epoch.start_id - 1))
+            fitted = [(m, *fit_message(m["content"], budget)) for m in msgs]
+            tokens = epoch.summary_tokens + sum(estimate_message_tokens(c) for _, c, _ in fitted)
+
+            if tokens <= budget["history_tokens"] and len(fitted) <= self.max_messages:
+                return self._compose(epoch, [(m, c) for m, c, _ in fitted], budget, {
+                    "rebased": False,
+                    "messages_dropped": 0,
+                    "messages_truncated": sum(cut for _, _, cut in fitted),
+                })
+
+        # ---- 2. rebase：取最新摘要，只保留最新一段訊息 ----
+        candidates = history_messages(backend.load_messages_before(username, None, candidates_n))
+        summary_msg, summary_tokens = summary_message(summary_text, budget)
+        room = int((budget["history_tokens"] - summary_tokens) * self.fill_ratio)
+        packed, _, truncated = pack_newest(candidates[-self.max_messages // 2:], room, budget)
+
+        if packed:
+            start_id = packed[0][0]["id"]
+        elif candidates:
+            start_id = candidates[-1]["id"] + 1
+        else:
+            start_id = 0
+
+        epoch = _Epoch((epoch.number + 1) if epoch else 1, start_id, summary_msg, summary_tokens)
+        self._set(key, epoch)
+
+        return self._compose(epoch, packed, budget, {
+            "rebased": True,
+            "messages_dropped": len(candidates) - len(packed),
+            "messages_truncated": truncated,
+        })
+
+    def _compose(self, epoch, packed, budget, extra):
+        history_tokens = sum(estimate_message_tokens(c) for _, c in packed)
+
+        messages = [epoch.summary_msg] if epoch.summary_msg else []
+        messages += [to_message(m["role"], c) for m, c in packed]
+
+        report = {
+            "budget": budget["history_tokens"],
+            "summary_tokens": epoch.summary_tokens,
+            "history_tokens": history_tokens,
+            "total_tokens": epoch.summary_tokens + history_tokens,
+            "messages_used": len(packed),
+            "epoch": epoch.number,
+            "epoch_start_id": epoch.start_id,
+            # 歷史中的附件換成摘要（utils/attachments.py）省下的 token
+            "attachments_stubbed": sum(1 for m, _ in packed if "attachment_tokens_saved" in m),
+            "attachment_tokens_saved": sum(m.get("attachment_tokens_saved", 0) for m, _ in packed),
+            **extra,
+        }
+        return messages, report
+
+
+epoch_layout = EpochLayout()
@@ -0,0 +1,24 @@
+# 對話歷史 token 預算（依教學模式）
+import os
+import json
+
+CONTEXT_BUDGETS_JSON = os.getenv("CONTEXT_BUDGETS_JSON")
+
+# - history_tokens：摘要 + 最近訊息的總預算
+# - summary_tokens：摘要最多佔用的 token
+# - message_tokens：單則訊息上限，超過就截斷
+DEFAULT_CONTEXT_BUDGETS = {
+    # 循序引導：回答很長 → 預算大一點，但單則要截斷
+    "guided": {"history_tokens": 6000, "summary_tokens": 1200, "message_tokens": 1500},
+    # 思考解謎：回合多、每則短 → 保留較多則
+    "socratic": {"history_tokens": 4000, "summary_tokens": 1000, "message_tokens": 800},
+}
+
+if CONTEXT_BUDGETS_JSON:
+    # 只覆寫有給的欄位，例如 {"guided": {"history_tokens": 8000}}
+    CONTEXT_BUDGETS = {
+        mode: {**budget, **json.loads(CONTEXT_BUDGETS_JSON).get(mode, {})}
+        for mode, budget in DEFAULT_CONTEXT_BUDGETS.items()
+    }
+else:
+    CONTEXT_BUDGETS = DEFAULT_CONTEXT_BUDGETS
@@ -0,0 +1,204 @@
+# ===== Storage backend 介面 =====
+# 所有模組（safe_crud / summary / chat_history / journal）都透過這裡存取資料
+# 將來換成 MySQL 或 Postgres → 新增一個 StorageBackend 實作即可，不動主程式
+
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+
+from utils.latex_postprocess import FORMAT_VERSION, format_latex
+
+
+class StorageBackend(ABC):
+    """
+    訊息、摘要、摘要進度 pointer 的統一存取介面
+
+    訊息格式：
+    - 讀取回傳 list of dict，由舊到新排序
+    - 寫入為 list of (username, role, content[, raw_content, format_version])，需在同一個 transaction 內完成
+      raw_content：模型原文（assistant），format_version：content 由哪一版後製產生
+
+    讀取時 format_version 過期的訊息會用 raw_content 重新後製並寫回（_refresh_formatted）
+    """
+
+    def init_schema(self):
+        """建立 / 升級 schema（沒有 schema 的 backend 可不實作）"""
+        return []
+
+    def sync(self):
+        """確保已 commit 的資料落盤（關閉前呼叫）"""
+        pass
+
+    def close(self):
+        pass
+
+    # -------- 訊息 -------- #
+    @abstractmethod
+    def load_messages(self, username):
+        """全部訊息 → [{"role", "content"}]"""
+
+    @abstractmethod
+    def load_messages_before(self, username, before_id, limit):
+        """id < before_id 的最新 limit 則 → [{"id", "role", "content"}]"""
+
+    @abstractmethod
+    def load_recent_messages(self, username, n):
+        """最新 n 則 → [{"role", "content"}]"""
+
+    @abstractmethod
+    def load_messages_after_id(self, username, last_id):
+        """id > last_id 的全部訊息 → [{"id", "role", "content"}]"""
+
+    @abstractmethod
+    def save_messages(self, rows):
+        """
+        rows: list of (username, role, content[, raw_content, format_version])，全部成功或全部失敗
+        回傳: 每一筆的 id（與 rows 同順序）
+        """
+
+    # -------- 後製版本 -------- #
+    def load_stale_formatted(self, version, after_id, limit):
+        """有原文且 format_version < version 的訊息 → [(id, content, raw_content)]（id 遞增，批次重新後製用）"""
+        return []
+
+    def update_formatted(self, rows):
+        """
+        rows: list of (id, content, format_version)
+        只升級不降級（format_version 較新的列不會被覆蓋）
+        """
+        pass
+
+    def _refresh_formatted(self, rows):
+        """
+        rows: [(id, role, content, stale_raw)]，stale_raw 只在版本過期時有值
+        → 以目前的 format_latex 重新後製並寫回（每則訊息每個版本只做一次）
+        回傳: [(id, role, content)]
+        """
+        updates = [(r[0], format_latex(r[3]), FORMAT_VERSION) for r in rows if r[3] is not None]
+        if not updates:
+            return [r[:3] for r in rows]
+
+        try:
+            self.update_formatted(updates)
+        except Exception:
+            # 寫回失敗不影響這次讀取，下次讀取會再試
+            logging.exception("update_formatted failed")
+
+        refreshed = {msg_id: content for msg_id, content, _ in updates}
+        return [(r[0], r[1], refreshed.get(r[0], r[2])) for r in rows]
+
+    # -------- 附件 -------- #
+    @abstractmethod
+    def save_attachment(self, key, name, pages, content):
+        """
+        以內容雜湊存放附件（key 已存在則不動）
+        content：每頁文字以 \f 分隔（見 utils/attachments.py）
+        """
+
+    @abstractmethod
+    def load_attachment(self, key):
+        """→ {"name", "pages", "content"}，沒有則 None"""
+
+    # -------- 摘要 -------- #
+    @abstractmethod
+    def load_summary(self, username):
+        """摘要文字，沒有則 None"""
+
+    @abstractmethod
+    def save_summary(self, username, text):
+        pass
+
+    def save_summary_state(self, username, text, last_id):
+        """摘要 + pointer 一起更新（支援 transaction 的 backend 應覆寫成原子操作）"""
+        self.save_summary(username, text)
+        self.save_summary_pointer(username, last_id)
+
+    @abstractmethod
+    def load_summary_pointer(self, username):
+        """最後一則已摘要的訊息 id，沒有則 0"""
+
+    @abstractmethod
+    def save_summary_pointer(self, username, last_id):
+        pass
+
+    def load_summary_status(self, username):
+        """
+        (摘要文字 or None, pointer, 尚未摘要的訊息數)
+        - 判斷是否需要摘要用，不讀訊息內容
+        """
+        pointer = self.load_summary_pointer(username)
+        pending = len(self.load_messages_after_id(username, pointer))
+        return self.load_summary(username), pointer, pending
+
+    def load_user_version(self, username):
+        """
+        使用者資料的版本號（整數）
+        - 每寫入一筆訊息 +1，每次更新摘要 / pointer 各 +1
+        - 快取用來判斷是否被其他 process 改過
+        - 回傳 None 代表不支援 → 快取每次都重新讀取
+        """
+        return None
+
+    # -------- 任務分類紀錄 -------- #
+    def log_task_type(self, username, input_text, task_type, source):
+        """記錄一次分類結果（source: 'llm' / 'local' / 'rule'）"""
+
+    def load_task_type_log(self, source=None, limit=5000):
+        """最近的分類紀錄 → [{"input_text", "task_type", "source"}]，由舊到新"""
+        return []
+
+    # -------- 任務分類快取 -------- #
+    def load_cached_task_type(self, cache_key, prompt_version, min_created_at):
+        """符合版本且未過期的分類結果，沒有則 None"""
+        return None
+
+    def save_cached_task_type(self, cache_key, task_type, prompt_version, created_at):
+        pass
+
+    def purge_task_type_cache(self, prompt_version, min_created_at):
+        """刪除其他版本或已過期的快取，回傳刪除筆數"""
+        return 0
+
+
+# ===== 目前使用中的 backend =====
+# STORAGE_BACKEND 環境變數：sqlite（預設）/ memory
+_backend = None
+_backend_lock = threading.Lock()
+
+
+# HISTORY_CACHE 環境變數：1（預設）在 backend 外包一層 per-user 快取 / 0 關閉
+def _create_default_backend():
+    name = os.getenv("STORAGE_BACKEND", "sqlite").lower()
+
+    if name == "sqlite":
+        from db.sqlite_backend import SQLiteBackend
+        backend = SQLiteBackend()
+    elif name == "memory":
+        from db.memory_backend import InMemoryBackend
+        backend = InMemoryBackend()
+    else:
+        raise ValueError(f"未知的 STORAGE_BACKEND: {name}")
+
+    if os.getenv("HISTORY_CACHE", "1") != "0":
+        from db.cached_backend import CachedBackend
+        backend = CachedBackend(backend)
+
+    return backend
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _create_default_backend()
+    return _backend
+
+
+def set_backend(backend):
+    """替換 backend（測試 / benchmark 用），回傳舊的 backend"""
+    global _backend
+    with _backend_lock:
+        old, _backend = _backend, backend
+    return old
@@ -0,0 +1,304 @@
+# ===== Per-user 歷史快取 =====
+# 每回合都要讀「摘要 + pointer + 最近訊息」，而這些大多是本 process 剛寫入的
+# → 在 backend 外包一層 LRU 快取，寫入時同步更新（write-through）
+
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from db.backend import StorageBackend
+
+
+class _Entry:
+    __slots__ = ("version", "messages", "complete", "summary_text", "pointer", "pending", "nbytes", "last_access")
+
+    def __init__(self, version, messages, complete, summary_text, pointer, pending):
+        self.version = version
+        self.messages = messages      # [(id, role, content)]，由舊到新，最多 window 則
+        self.complete = complete      # True → 使用者全部訊息都在 messages 內
+        self.summary_text = summary_text
+        self.pointer = pointer
+        self.pending = pending
+        self.nbytes = 0
+        self.last_access = time.monotonic()
+
+    def resize(self):
+        self.nbytes = sum(sys.getsizeof(m[2]) for m in self.messages) + sys.getsizeof(self.summary_text or "")
+
+    def recount_pending(self):
+        """pointer 之後的訊息是否都在快取內 → 能的話直接算，否則回傳 False"""
+        if not self.complete and (not self.messages or self.messages[0][0] > self.pointer + 1):
+            return False
+        self.pending = sum(1 for m in self.messages if m[0] > self.pointer)
+        return True
+
+
+class CachedBackend(StorageBackend):
+    """
+    包裝任一 StorageBackend，快取每位使用者的：
+    - 最近 window 則訊息
+    - 摘要文字、pointer、尚未摘要的訊息數
+
+    一致性：
+    - 本 process 寫入 → write-through 更新快取
+    - 其他 process 寫入 → 讀取前比對 load_user_version()，不一致就重新載入
+    - write-through 後版本號不等於「舊版本 + 本次寫入數」→ 代表中間有別人寫入 → 丟棄快取
+
+    淘汰：LRU（max_users / max_bytes）+ 閒置超過 idle_ttl 秒
+    """
+
+    def __init__(self, inner, window=40, max_users=256, max_bytes=64 * 1024 * 1024, idle_ttl=1800):
+        self.inner = inner
+        self.window = window
+        self.max_users = max_users
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()  # username → _Entry，最近使用的在最後
+        self._bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._evictions = 0
+        self._idle_evictions = 0
+
+    # -------- 快取管理 -------- #
+    def _drop(self, username):
+        entry = self._entries.pop(username, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def _evict(self):
+        now = time.monotonic()
+        while self._entries:
+            username, entry = next(iter(self._entries.items()))
+            if now - entry.last_access > self.idle_ttl:
+                self._idle_evictions += 1
+            elif len(self._entries) > self.max_users or self._bytes > self.max_bytes:
+                self._evictions += 1
+            else:
+                break
+            self._drop(username)
+
+    def _store(self, username, entry):
+        entry.resize()
+        with self._lock:
+            self._drop(username)
+            self._entries[username] = entry
+            self._bytes += entry.nbytes
+            self._evict()
+
+    def _load(self, username):
+        # 先取版本號再讀資料：中間若有寫入，下次比對版本時會重新載入
+        version = self.inner.load_user_version(username)
+        rows = self.inner.load_messages_before(username, None, self.window)
+        summary_text, pointer, pending = self.inner.load_summary_status(username)
+
+        messages = [(r["id"], r["role"], r["content"]) for r in rows]
+        return _Entry(version, messages, len(messages) < self.window, summary_text, pointer, pending)
+
+    def _get(self, username):
+        """取得有效的快取；版本不一致或不存在就重新載入"""
+        version = self.inner.load_user_version(username)
+
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and version is not None and entry.version == version:
+                entry.last_access = time.monotonic()
+                self._entries.move_to_end(username)
+                self._hits += 1
+                return entry
+            if entry is not None:
+                self._stale += 1
+                self._drop(username)
+            self._misses += 1
+
+        entry = self._load(username)
+        if entry.version is not None:
+            self._store(username, entry)
+        return entry
+
+    def _write_through(self, username, writes, update):
+        """
+        writes: 本次寫入讓版本號增加的數量
+        update(entry) → False 代表快取無法正確更新，直接丟棄
+        """
+        with self._lock:
+            if username not in self._entries:
+                return
+
+        version = self.inner.load_user_version(username)
+
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return
+            if version is None or entry.version + writes != version or update(entry) is False:
+                self._drop(username)
+                return
+
+            entry.version = version
+            self._bytes -= entry.nbytes
+            entry.resize()
+            self._bytes += entry.nbytes
+            self._evict()
+
+    def invalidate(self, username=None):
+        with self._lock:
+            if username is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._drop(username)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "users": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "stale": self._stale,
+                "evictions": self._evictions,
+                "idle_evictions": self._idle_evictions,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
+
+    # -------- 直接轉交 -------- #
+    def init_schema(self):
+        return self.inner.init_schema()
+
+    def sync(self):
+        self.inner.sync()
+
+    def close(self):
+        self.invalidate()
+        self.inner.close()
+
+    def load_messages(self, username):
+        return self.inner.load_messages(username)
+
+    def load_messages_before(self, username, before_id, limit):
+        # 只有「從最新一則開始」的那一頁可能在快取內
+        if before_id is None:
+            entry = self._get(username)
+            with self._lock:
+                if limit <= len(entry.messages) or entry.complete:
+                    rows = entry.messages[-limit:] if limit else []
+                    return [{"id": m[0], "role": m[1], "content": m[2]} for m in rows]
+
+        return self.inner.load_messages_before(username, before_id, limit)
+
+    def load_messages_after_id(self, username, last_id):
+        # 快取內已涵蓋 last_id 之後的全部訊息 → 直接回傳
+        entry = self._get(username)
+        with self._lock:
+            if entry.complete or (entry.messages and entry.messages[0][0] <= last_id + 1):
+                return [{"id": m[0], "role": m[1], "content": m[2]} for m in entry.messages if m[0] > last_id]
+
+        return self.inner.load_messages_after_id(username, last_id)
+
+    def load_user_version(self, username):
+        return self.inner.load_user_version(username)
+
+    # 重新後製會讓 user_versions 增加 → 受影響使用者的快取下次讀取時自動重新載入
+    def load_stale_formatted(self, version, after_id, limit):
+        return self.inner.load_stale_formatted(version, after_id, limit)
+
+    def update_formatted(self, rows):
+        self.inner.update_formatted(rows)
+
+    def save_attachment(self, key, name, pages, content):
+        self.inner.save_attachment(key, name, pages, content)
+
+    def load_attachment(self, key):
+        return self.inner.load_attachment(key)
+
+    def log_task_type(self, username, input_text, task_type, source):
+        self.inner.log_task_type(username, input_text, task_type, source)
+
+    def load_task_type_log(self, source=None, limit=5000):
+        return self.inner.load_task_type_log(source, limit)
+
+    def load_cached_task_type(self, cache_key, prompt_version, min_created_at):
+        return self.inner.load_cached_task_type(cache_key, prompt_version, min_created_at)
+
+    def save_cached_task_type(self, cache_key, task_type, prompt_version, created_at):
+        self.inner.save_cached_task_type(cache_key, task_type, prompt_version, created_at)
+
+    def purge_task_type_cache(self, prompt_version, min_created_at):
+        return self.inner.purge_task_type_cache(prompt_version, min_created_at)
+
+    # -------- 快取讀取 -------- #
+    def load_recent_messages(self, username, n):
+        entry = self._get(username)
+        with self._lock:
+            if n <= len(entry.messages) or entry.complete:
+                rows = entry.messages[-n:] if n else []
+                return [{"role": m[1], "content": m[2]} for m in rows]
+
+        # 要求的數量超過快取範圍
+        return self.inner.load_recent_messages(username, n)
+
+    def load_summary_status(self, username):
+        entry = self._get(username)
+        with self._lock:
+            return entry.summary_text, entry.pointer, entry.pending
+
+    def load_summary(self, username):
+        return self.load_summary_status(username)[0]
+
+    def load_summary_pointer(self, username):
+        return self.load_summary_status(username)[1]
+
+    # -------- write-through -------- #
+    def save_messages(self, rows):
+        rows = list(rows)
+        ids = self.inner.save_messages(rows)
+
+        by_user = defaultdict(list)
+        for msg_id, (username, role, content, *_) in zip(ids, rows):
+            by_user[username].append((msg_id, role, content))
+
+        for username, new_msgs in by_user.items():
+            def update(entry, new_msgs=new_msgs):
+                entry.messages.extend(new_msgs)
+                if len(entry.messages) > self.window:
+                    del entry.messages[:-self.window]
+                    entry.complete = False
+                entry.pending += len(new_msgs)
+
+            self._write_through(username, len(new_msgs), update)
+
+        return ids
+
+    def save_summary(self, username, text):
+        self.inner.save_summary(username, text)
+
+        def update(entry):
+            entry.summary_text = text
+
+        self._write_through(username, 1, update)
+
+    def save_summary_pointer(self, username, last_id):
+        self.inner.save_summary_pointer(username, last_id)
+
+        def update(entry):
+            entry.pointer = last_id
+            return entry.recount_pending()
+
+        self._write_through(username, 1, update)
+
+    def save_summary_state(self, username, text, last_id):
+        self.inner.save_summary_state(username, text, last_id)
+
+        def update(entry):
+            entry.summary_text = text
+            entry.pointer = last_id
+            return entry.recount_pending()
+
+        self._write_through(username, 2, update)
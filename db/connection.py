@@ -0,0 +1,77 @@
+# ===== SQLite 連線管理 =====
+# 全程序共用：每個 thread 一條長駐連線，開啟時設定一次 pragma
+# 取代「每個函式 connect/close 一次」的寫法 → 減少 writer lock 競爭
+
+import sqlite3
+import threading
+import atexit
+
+DB_PATH = "chat.db"
+
+# 開啟連線時套用一次的 pragma
+# - journal_mode=WAL：讀寫不互擋，多個讀者 + 一個寫者可同時進行
+# - busy_timeout：被鎖住時由 SQLite 自行等待（毫秒），不用 Python 端 sleep
+# - synchronous=NORMAL：WAL 模式下安全且少一次 fsync
+# - cache_size：負值代表 KiB，這裡約 8MB page cache
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "busy_timeout": 5000,
+    "synchronous": "NORMAL",
+    "cache_size": -8000,
+    "foreign_keys": "ON",
+}
+
+
+class ConnectionManager:
+    """
+    程序內唯一的連線管理器
+
+    - get()：取得目前 thread 專屬的連線（第一次呼叫時建立）
+    - close_all()：關閉所有 thread 開過的連線（程序結束時呼叫）
+
+    為什麼每個 thread 一條：
+    - sqlite3.Connection 預設不可跨 thread 使用
+    - Streamlit 每個 session 跑在不同 thread
+    """
+
+    def __init__(self, db_path=DB_PATH, pragmas=None):
+        self.db_path = db_path
+        self.pragmas = dict(PRAGMAS if pragmas is None else pragmas)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        for key, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {key}={value}")
+        return conn
+
+    def get(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._open()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def close_all(self):
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
+
+
+# 全程序共用的 manager
+connection_manager = ConnectionManager()
+atexit.register(connection_manager.close_all)
+
+
+def get_connection():
+    """取得目前 thread 的 chat.db 連線（已套用 pragma）"""
+    return connection_manager.get()
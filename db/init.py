@@ -1,50 +1,20 @@
-import sqlite3
-from pathlib import Path
-
-DB_PATH = "chat.db"
+from db.backend import get_backend
 
 
 # ===== 初始化資料庫 =====
 def init_db():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Users table
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            password TEXT
-        )
-    """)
-
-    # Messages table 存聊天紀錄
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT,
-            role TEXT,   -- 'user' or 'assistant'
-            content TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-
-    # 存摘要紀錄(只存一筆)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS summary (
-            username TEXT PRIMARY KEY,
-            summary_text TEXT,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
+    """
+    建立 / 升級 chat.db schema
 
-    # 存 summary_pointer
-    cursor.execute("""CREATE TABLE IF NOT EXISTS summary_pointer (
-        username TEXT PRIMARY KEY,
-        last_summarized_id INTEGER
-    );""")    
+    - 只在程式啟動時呼叫一次（main.py）
+    - 不再於 import 時執行
+    - 實際動作由 backend 決定（SQLite → 執行 migrations）
+    """
+    applied = get_backend().init_schema()
+    if applied:
+        print(f"DB migrated (applied: {applied})")
+    return applied
 
-    conn.commit()
-    conn.close()
 
-init_db()
\ No newline at end of file
+if __name__ == "__main__":
+    init_db()
@@ -0,0 +1,201 @@
+# ===== Write-behind 訊息日誌 =====
+# 對話回合只把訊息丟進記憶體 queue 就返回，由背景 thread 批次寫入 SQLite
+# → 回答送回 UI 前不用等磁碟
+
+import atexit
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import defaultdict, deque
+
+from db.backend import get_backend
+from db.safe_crud import save_messages
+
+
+class MessageJournal:
+    """
+    背景寫入器
+
+    - submit()：加入一組訊息（同一組在同一個 transaction 內寫入）
+    - wait_for_user()：等待某使用者尚未落盤的訊息寫完（讀取歷史前呼叫）
+    - flush()：等待 queue 全部寫完
+    - close()：flush + checkpoint，程序結束時自動呼叫
+    - stats()：queue 深度、批次數、寫入延遲
+    - failed()：重試後仍寫不進去的訊息組（dead letter，保留最近 max_failed 組）
+    """
+
+    def __init__(self, maxsize=1000, batch_size=200, retry_delay=0.5, max_retries=5, max_failed=100):
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.max_retries = max_retries
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._cond = threading.Condition()
+        self._pending = defaultdict(int)  # username → 尚未寫入的組數
+        self._failed = deque(maxlen=max_failed)  # (username, messages)
+        self._thread = None
+        self._closed = False
+
+        self._batches = 0
+        self._messages_written = 0
+        self._errors = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    # -------- 對外接口 -------- #
+    def submit(self, username, messages):
+        """
+        messages: list of (role, content[, raw_content, format_version])
+        queue 滿時會阻塞（backpressure），避免記憶體無限成長
+        """
+        if self._closed:
+            raise RuntimeError("MessageJournal is closed")
+
+        self._ensure_started()
+        with self._cond:
+            self._pending[username] += 1
+        self._queue.put((username, list(messages)))
+
+    def wait_for_user(self, username, timeout=5.0):
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending.get(username, 0) == 0, timeout)
+
+    def flush(self, timeout=None):
+        with self._cond:
+            return self._cond.wait_for(lambda: not any(self._pending.values()), timeout)
+
+    def close(self, timeout=10.0):
+        if self._closed:
+            return
+        self._closed = True
+
+        if self._thread is not None:
+            self._queue.put(None)  # 結束訊號
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "pending_users": sum(1 for v in self._pending.values() if v),
+                "batches": self._batches,
+                "messages_written": self._messages_written,
+                "errors": self._errors,
+                "failed": len(self._failed),
+                "last_flush_ms": round(self._last_flush_ms, 2),
+                "max_flush_ms": round(self._max_flush_ms, 2),
+                "avg_flush_ms": round(self._total_flush_ms / self._batches, 2) if self._batches else 0.0,
+            }
+
+    def failed(self):
+        with self._cond:
+            return list(self._failed)
+
+    # -------- 背景 thread -------- #
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="message-journal", daemon=True)
+                self._thread.start()
+
+    def _drain(self, first):
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(entry)
+        return batch
+
+    def _save(self, rows):
+        """
+        寫入一批 rows → 是否成功
+        - locked / busy（暫時性）：等一下重試，最多 max_retries 次
+        - 其他錯誤（IntegrityError、schema 不符、格式錯誤的 row…）重試也不會成功 → 直接回報失敗
+        """
+        for attempt in range(self.max_retries):
+            try:
+                save_messages(rows)
+                return True
+            except sqlite3.OperationalError as e:
+                message = str(e).lower()
+                if "locked" not in message and "busy" not in message:
+                    logging.exception("MessageJournal write failed")
+                    break
+                logging.warning("MessageJournal write locked, retrying (%d/%d)", attempt + 1, self.max_retries)
+            except Exception:
+                logging.exception("MessageJournal write failed")
+                break
+            with self._cond:
+                self._errors += 1
+            time.sleep(self.retry_delay)
+
+        with self._cond:
+            self._errors += 1
+        return False
+
+    def _write(self, batch):
+        start = time.perf_counter()
+        written = 0
+        try:
+            rows = [
+                (username, *message)
+                for username, messages in batch
+                for message in messages
+            ]
+            if self._save(rows):
+                written = len(rows)
+            else:
+                # 整批失敗 → 每組各自一個 transaction，壞掉的一組不拖累其他使用者
+                for username, messages in batch:
+                    group = [(username, *message) for message in messages]
+                    if self._save(group):
+                        written += len(group)
+                    else:
+                        print(f"⚠️ [JOURNAL] 寫入失敗，已移出 queue：{username} {len(group)} 則")
+                        with self._cond:
+                            self._failed.append((username, messages))
+        finally:
+            # 不論成敗都要釋放 pending，否則 wait_for_user 會一直等到逾時
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._cond:
+                self._batches += 1
+                self._messages_written += written
+                self._last_flush_ms = elapsed_ms
+                self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+                self._total_flush_ms += elapsed_ms
+                for username, _ in batch:
+                    self._pending[username] -= 1
+                    if not self._pending[username]:
+                        del self._pending[username]
+                self._cond.notify_all()
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            entry = self._queue.get()
+            if entry is None:
+                break
+
+            batch = self._drain(entry)
+            if None in batch:
+                batch = [e for e in batch if e is not None]
+                stopping = True
+            self._write(batch)
+
+        # 關閉前確保資料落盤（SQLite：WAL checkpoint + fsync）
+        try:
+            get_backend().sync()
+        except Exception:
+            logging.exception("MessageJournal checkpoint failed")
+
+
+# 全程序共用
+message_journal = MessageJournal()
+atexit.register(message_journal.close)
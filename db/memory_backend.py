@@ -0,0 +1,159 @@
+# ===== In-memory backend =====
+# 測試 / benchmark 用：不碰磁碟，行為與 SQLiteBackend 相同
+
+import threading
+from collections import defaultdict
+
+from db.backend import StorageBackend
+from utils.latex_postprocess import FORMAT_VERSION
+
+
+def _with_stale_raw(r):
+    """(id, role, content, raw, version) → (id, role, content, 版本過期時的原文)（同 SQLite 的 MESSAGE_COLUMNS）"""
+    stale = r[4] is not None and r[4] < FORMAT_VERSION
+    return r[0], r[1], r[2], r[3] if stale else None
+
+
+class InMemoryBackend(StorageBackend):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._messages = defaultdict(list)  # username → [(id, role, content, raw_content, format_version)]，id 遞增
+        self._summary = {}
+        self._summary_pointer = {}
+        self._task_type_log = []
+        self._task_type_cache = {}  # cache_key → (task_type, prompt_version, created_at)
+        self._attachments = {}      # hash → {"name", "pages", "content"}
+        self._versions = defaultdict(int)  # username → 寫入次數（與 SQLite trigger 規則相同）
+
+    # -------- 訊息 -------- #
+    def load_messages(self, username):
+        with self._lock:
+            rows = [_with_stale_raw(r) for r in self._messages.get(username, ())]
+        return [{"role": r[1], "content": r[2]} for r in self._refresh_formatted(rows)]
+
+    def load_messages_before(self, username, before_id, limit):
+        with self._lock:
+            rows = self._messages.get(username, [])
+            if before_id is not None:
+                rows = [r for r in rows if r[0] < before_id]
+            rows = [_with_stale_raw(r) for r in rows[-limit:]] if limit else []
+        return [{"id": r[0], "role": r[1], "content": r[2]} for r in self._refresh_formatted(rows)]
+
+    def load_recent_messages(self, username, n):
+        with self._lock:
+            rows = [_with_stale_raw(r) for r in self._messages.get(username, [])[-n:]] if n else []
+        return [{"role": r[1], "content": r[2]} for r in self._refresh_formatted(rows)]
+
+    def load_messages_after_id(self, username, last_id):
+        with self._lock:
+            rows = [_with_stale_raw(r) for r in self._messages.get(username, ()) if r[0] > last_id]
+        return [{"id": r[0], "role": r[1], "content": r[2]} for r in self._refresh_formatted(rows)]
+
+    def save_messages(self, rows):
+        ids = []
+        with self._lock:
+            for row in rows:
+                username, role, content, raw_content, format_version = tuple(row) + (None, None) if len(row) == 3 else row
+                self._messages[username].append((self._next_id, role, content, raw_content, format_version))
+                self._versions[username] += 1
+                ids.append(self._next_id)
+                self._next_id += 1
+        return ids
+
+    def load_stale_formatted(self, version, after_id, limit):
+        with self._lock:
+            rows = sorted(
+                (r[0], r[2], r[3])
+                for msgs in self._messages.values() for r in msgs
+                if r[3] is not None and r[4] is not None and r[4] < version and r[0] > after_id
+            )
+        return rows[:limit]
+
+    def update_formatted(self, rows):
+        updates = {msg_id: (content, version) for msg_id, content, version in rows}
+        with self._lock:
+            for username, msgs in self._messages.items():
+                for i, r in enumerate(msgs):
+                    if r[0] not in updates:
+                        continue
+                    content, version = updates[r[0]]
+                    if r[4] is None or r[4] < version:
+                        msgs[i] = (r[0], r[1], content, r[3], version)
+                        self._versions[username] += 1
+
+    def load_user_version(self, username):
+        with self._lock:
+            return self._versions[username]
+
+    # -------- 附件 -------- #
+    def save_attachment(self, key, name, pages, content):
+        with self._lock:
+            self._attachments.setdefault(key, {"name": name, "pages": pages, "content": content})
+
+    def load_attachment(self, key):
+        with self._lock:
+            row = self._attachments.get(key)
+        return dict(row) if row else None
+
+    # -------- 任務分類紀錄 -------- #
+    def log_task_type(self, username, input_text, task_type, source):
+        with self._lock:
+            self._task_type_log.append({"input_text": input_text, "task_type": task_type, "source": source})
+
+    def load_task_type_log(self, source=None, limit=5000):
+        with self._lock:
+            rows = [r for r in self._task_type_log if source is None or r["source"] == source]
+        return [dict(r) for r in rows[-limit:]] if limit else []
+
+    # -------- 任務分類快取 -------- #
+    def load_cached_task_type(self, cache_key, prompt_version, min_created_at):
+        with self._lock:
+            row = self._task_type_cache.get(cache_key)
+        if row and row[1] == prompt_version and row[2] >= min_created_at:
+            return row[0]
+        return None
+
+    def save_cached_task_type(self, cache_key, task_type, prompt_version, created_at):
+        with self._lock:
+            self._task_type_cache[cache_key] = (task_type, prompt_version, created_at)
+
+    def purge_task_type_cache(self, prompt_version, min_created_at):
+        with self._lock:
+            stale = [k for k, row in self._task_type_cache.items()
+                     if row[1] != prompt_version or row[2] < min_created_at]
+            for k in stale:
+                del self._task_type_cache[k]
+        return len(stale)
+
+    # -------- 摘要 -------- #
+    def load_summary(self, username):
+        with self._lock:
+            return self._summary.get(username)
+
+    def save_summary(self, username, text):
+        with self._lock:
+            self._summary[username] = text
+            self._versions[username] += 1
+
+    def save_summary_state(self, username, text, last_id):
+        with self._lock:
+            self._summary[username] = text
+            self._summary_pointer[username] = last_id
+            self._versions[username] += 2
+
+    def load_summary_status(self, username):
+        with self._lock:
+            pointer = self._summary_pointer.get(username, 0)
+            pending = sum(1 for r in self._messages.get(username, ()) if r[0] > pointer)
+            return self._summary.get(username), pointer, pending
+
+    def load_summary_pointer(self, username):
+        with self._lock:
+            return self._summary_pointer.get(username, 0)
+
+    def save_summary_pointer(self, username, last_id):
+        with self._lock:
+            self._summary_pointer[username] = last_id
+            self._versions[username] += 1
@@ -0,0 +1,240 @@
+# ===== Schema migrations =====
+# 每個 migration 只跑一次，記錄在 schema_version 表
+# 新增 schema 變更 → 在 MIGRATIONS 最後面加一筆，不要改舊的
+
+import hashlib
+import re
+import sqlite3
+
+from db.connection import get_connection
+
+
+def _create_base_tables(cursor):
+    # Users table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            password TEXT
+        )
+    """)
+
+    # Messages table 存聊天紀錄
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            role TEXT,   -- 'user' or 'assistant'
+            content TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 存摘要紀錄(只存一筆)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS summary (
+            username TEXT PRIMARY KEY,
+            summary_text TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 存 summary_pointer
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS summary_pointer (
+            username TEXT PRIMARY KEY,
+            last_summarized_id INTEGER
+        )
+    """)
+
+
+def _add_messages_username_id_index(cursor):
+    # 熱門查詢都是 WHERE username=? ORDER BY id → 複合索引避免全表掃描
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_username_id
+        ON messages (username, id)
+    """)
+
+
+def _make_users_username_unique(cursor):
+    # 先移除重複帳號（保留最早建立的一筆），才能建立 UNIQUE 索引
+    cursor.execute("""
+        DELETE FROM users
+        WHERE id NOT IN (SELECT MIN(id) FROM users GROUP BY username)
+    """)
+    cursor.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username
+        ON users (username)
+    """)
+
+
+def _add_user_versions(cursor):
+    # 每位使用者一個版本號：messages / summary / summary_pointer 有任何寫入就 +1
+    # 由 trigger 維護 → 其他 process 的寫入也會反映，快取靠它判斷是否過期
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_versions (
+            username TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+
+    bump = """
+        INSERT INTO user_versions (username, version) VALUES ({row}.username, 1)
+        ON CONFLICT(username) DO UPDATE SET version = version + 1;
+    """
+    triggers = [
+        ("trg_messages_insert_version", "AFTER INSERT ON messages", "NEW"),
+        ("trg_messages_update_version", "AFTER UPDATE ON messages", "NEW"),
+        ("trg_messages_delete_version", "AFTER DELETE ON messages", "OLD"),
+        ("trg_summary_insert_version", "AFTER INSERT ON summary", "NEW"),
+        ("trg_summary_update_version", "AFTER UPDATE ON summary", "NEW"),
+        ("trg_summary_pointer_insert_version", "AFTER INSERT ON summary_pointer", "NEW"),
+        ("trg_summary_pointer_update_version", "AFTER UPDATE ON summary_pointer", "NEW"),
+    ]
+    for name, event, row in triggers:
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {bump.format(row=row)} END")
+
+
+def _add_task_type_log(cursor):
+    # 任務分類紀錄：本地分類器的訓練資料 + 離線評估
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS task_type_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            input_text TEXT,
+            task_type TEXT,
+            source TEXT,   -- 'llm' / 'local' / 'rule'
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_task_type_log_source_id
+        ON task_type_log (source, id)
+    """)
+
+
+def _add_task_type_cache(cursor):
+    # 任務分類快取：key = 正規化輸入 + 送出的 context 雜湊
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS task_type_cache (
+            cache_key TEXT PRIMARY KEY,
+            task_type TEXT,
+            prompt_version TEXT,
+            created_at REAL   -- unix time
+        )
+    """)
+
+
+def _add_message_raw_content(cursor):
+    # assistant 回答同時保存模型原文與後製版本 → 後製修正後可以重新產生 content
+    # 舊資料 raw_content 為 NULL（原文沒有保存，維持原樣）
+    cursor.execute("ALTER TABLE messages ADD COLUMN raw_content TEXT")
+    cursor.execute("ALTER TABLE messages ADD COLUMN format_version INTEGER")
+    # 批次重新後製時找出過期的訊息（只索引有原文的列）
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_format_version
+        ON messages (format_version, id)
+        WHERE raw_content IS NOT NULL
+    """)
+
+
+# 舊版 build_user_input 的格式：附件全文 + 提問（提問在最後一個分隔標題之後）
+LEGACY_ATTACHMENT_RE = re.compile(r'\A【題目／參考資料（學生上傳）】\n(.*)\n\n【學生的提問／說明】(?:\n(.*))?\Z', re.DOTALL)
+
+
+def _add_attachments(cursor):
+    # 附件以內容 sha256 存一次，訊息只存參照行（格式見 utils/attachments.py）
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS attachments (
+            hash TEXT PRIMARY KEY,
+            name TEXT,
+            pages INTEGER,
+            content TEXT,   -- 每頁文字以 \f 分隔
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # 既有訊息去重：內嵌的附件全文搬進 attachments，訊息改成參照行 + 提問
+    # 舊資料沒有分頁資訊 → 整份當成一頁
+    rows = cursor.execute("""
+        SELECT id, content FROM messages
+        WHERE role = 'user' AND content LIKE '【題目／參考資料（學生上傳）】%'
+    """).fetchall()
+
+    updates = []
+    for msg_id, content in rows:
+        m = LEGACY_ATTACHMENT_RE.match(content)
+        if m is None:
+            continue
+        text, question = m.group(1), m.group(2) or ""
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        cursor.execute(
+            "INSERT INTO attachments (hash, name, pages, content) VALUES (?, NULL, 1, ?) ON CONFLICT(hash) DO NOTHING",
+            (key, text)
+        )
+        updates.append((f"[[attachment:{key}]]\n{question}", msg_id))
+
+    cursor.executemany("UPDATE messages SET content = ? WHERE id = ?", updates)
+    print(f"attachments: {len(updates)} messages → {cursor.execute('SELECT COUNT(*) FROM attachments').fetchone()[0]} attachments")
+
+
+# (版本號, 名稱, 函式) → 依版本號遞增執行
+MIGRATIONS = [
+    (1, "create_base_tables", _create_base_tables),
+    (2, "add_messages_username_id_index", _add_messages_username_id_index),
+    (3, "make_users_username_unique", _make_users_username_unique),
+    (4, "add_user_versions", _add_user_versions),
+    (5, "add_task_type_log", _add_task_type_log),
+    (6, "add_task_type_cache", _add_task_type_cache),
+    (7, "add_message_raw_content", _add_message_raw_content),
+    (8, "add_attachments", _add_attachments),
+]
+
+
+def current_version(conn):
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def run_migrations(conn=None):
+    """
+    將資料庫升級到最新版本
+
+    - 每個 migration 在自己的 transaction 內執行，失敗會 rollback
+    - BEGIN IMMEDIATE 先拿寫入鎖，多個 process 同時啟動也只會有一個真的執行
+    - 已執行過的版本直接略過 → 可以重複呼叫
+
+    回傳: 本次實際執行的版本號 list
+    """
+    conn = conn or get_connection()
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version <= current_version(conn):
+            continue
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 拿到鎖後再確認一次，可能已被其他 process 執行
+            if version > current_version(conn):
+                migrate(conn.cursor())
+                conn.execute(
+                    "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                    (version, name)
+                )
+                applied.append(version)
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+    return applied
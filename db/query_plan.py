@@ -0,0 +1,75 @@
+# ===== Query plan 檢查 =====
+# 確認熱門查詢有走 idx_messages_username_id，而不是全表掃描
+#
+# 用法：python -m db.query_plan [db_path]
+
+import sys
+
+from db.connection import ConnectionManager, DB_PATH
+from db.migrations import run_migrations
+from db.sqlite_backend import SQLiteBackend
+
+INDEX_NAME = "idx_messages_username_id"
+COLUMNS = SQLiteBackend.MESSAGE_COLUMNS
+
+# 與 safe_crud / summary 內實際使用的 SQL 相同
+HOT_QUERIES = {
+    "load_messages": (
+        f"SELECT {COLUMNS} FROM messages WHERE username=? ORDER BY id",
+        (1, "u"),
+    ),
+    "load_recent_messages": (
+        f"SELECT {COLUMNS} FROM messages WHERE username=? ORDER BY id DESC LIMIT ?",
+        (1, "u", 20),
+    ),
+    "load_messages_before": (
+        f"SELECT {COLUMNS} FROM messages WHERE username=? AND id < ? ORDER BY id DESC LIMIT ?",
+        (1, "u", 100, 30),
+    ),
+    "load_summary_status": (
+        "SELECT COUNT(*) FROM messages WHERE username=? AND id > ?",
+        ("u", 0),
+    ),
+    "load_messages_after_id": (
+        f"SELECT {COLUMNS} FROM messages WHERE username=? AND id > ? ORDER BY id",
+        (1, "u", 0),
+    ),
+}
+
+
+def explain(conn, sql, params):
+    rows = conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall()
+    return [r[-1] for r in rows]
+
+
+def check_hot_queries(conn):
+    """
+    回傳 {查詢名稱: (是否使用索引, plan 描述 list)}
+
+    合格條件：
+    - plan 中出現 INDEX_NAME
+    - 不需要額外排序（沒有 USE TEMP B-TREE FOR ORDER BY）
+    """
+    report = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        plan = explain(conn, sql, params)
+        uses_index = (
+            any(INDEX_NAME in line for line in plan)
+            and not any("TEMP B-TREE" in line for line in plan)
+        )
+        report[name] = (uses_index, plan)
+    return report
+
+
+if __name__ == "__main__":
+    manager = ConnectionManager(sys.argv[1] if len(sys.argv) > 1 else DB_PATH)
+    conn = manager.get()
+    run_migrations(conn)
+
+    ok = True
+    for name, (uses_index, plan) in check_hot_queries(conn).items():
+        print(f"{'OK  ' if uses_index else 'FAIL'} {name}: {' | '.join(plan)}")
+        ok = ok and uses_index
+
+    manager.close_all()
+    sys.exit(0 if ok else 1)
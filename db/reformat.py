@@ -0,0 +1,85 @@
+# ===== 批次重新後製 =====
+# 後製（utils/latex_postprocess.py）修正後 FORMAT_VERSION +1，
+# 讀取時會逐則重新後製（見 StorageBackend._refresh_formatted）；
+# 這支程式一次把整張 messages 表升級完，之後讀取不再付後製成本
+#
+# 用法：python -m db.reformat [--db chat.db] [--workers 4] [--batch 500] [--dry-run]
+# --dry-run：只統計有多少則內容會改變，不寫回
+
+import argparse
+import os
+import time
+from multiprocessing import Pool
+
+from db.connection import ConnectionManager, DB_PATH
+from db.sqlite_backend import SQLiteBackend
+from utils.latex_postprocess import FORMAT_VERSION, format_latex
+
+
+def iter_stale_batches(backend, version, batch):
+    """以 id 當游標分批讀出過期的訊息 → [(id, content, raw_content)]"""
+    after_id = 0
+    while True:
+        rows = backend.load_stale_formatted(version, after_id, batch)
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1][0]
+
+
+def reformat_all(backend, workers=None, batch=500, dry_run=False):
+    """
+    重新後製所有過期訊息
+    - 後製在 process pool 平行執行（CPU bound，不受 GIL 限制）
+    - 每批在同一個 transaction 內寫回；中斷後重跑會從尚未升級的訊息繼續
+
+    回傳: {"messages": 處理數, "changed": 內容實際改變的數量, "batches", "seconds"}
+    """
+    workers = workers or os.cpu_count()
+    start = time.perf_counter()
+    messages = changed = batches = 0
+
+    with Pool(workers) as pool:
+        for rows in iter_stale_batches(backend, FORMAT_VERSION, batch):
+            raws = [raw for _, _, raw in rows]
+            contents = pool.map(format_latex, raws, max(len(raws) // (workers * 4), 1))
+
+            updates = [(msg_id, content, FORMAT_VERSION) for (msg_id, _, _), content in zip(rows, contents)]
+            if not dry_run:
+                backend.update_formatted(updates)
+
+            messages += len(rows)
+            changed += sum(1 for (_, old, _), new in zip(rows, contents) if old != new)
+            batches += 1
+            print(f"batch {batches}: {len(rows)} messages (last id {rows[-1][0]})")
+
+    return {
+        "messages": messages,
+        "changed": changed,
+        "batches": batches,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="處理所有批次，只統計有多少則內容會改變，不寫回")
+    args = parser.parse_args()
+
+    manager = ConnectionManager(args.db)
+    backend = SQLiteBackend(manager)
+    backend.init_schema()
+
+    print(f"format version: {FORMAT_VERSION}  workers: {args.workers}")
+    report = reformat_all(backend, args.workers, args.batch, args.dry_run)
+    print(report)
+
+    backend.sync()
+    manager.close_all()
+
+
+if __name__ == "__main__":
+    main()
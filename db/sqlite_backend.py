@@ -0,0 +1,275 @@
+# ===== SQLite backend =====
+
+import sqlite3
+import time
+
+from db.backend import StorageBackend
+from db.connection import connection_manager
+from utils.latex_postprocess import FORMAT_VERSION
+
+
+# -------- SQLite 安全寫入(自動重試) -------- #
+def safe_sqlite_call(func, retries=3, delay=0.1):
+    """
+    - 專門處理 SQLite locked 問題
+    - locked 時自動等待 & 重試
+    - 其他錯誤一律往外丟（你會看到錯誤訊息）
+    """
+    for attempt in range(retries):
+        try:
+            return func()
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e).lower():
+                # SQLite 被鎖住 → 等一下再試
+                time.sleep(delay)
+                continue
+            else:
+                # 不是 locked 的錯誤 → 直接拋出
+                raise
+
+    raise sqlite3.OperationalError("Database kept locked after retries.")
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    chat.db 實作
+    - 連線由 ConnectionManager 管理（每個 thread 一條，WAL）
+    """
+
+    SAVE_SUMMARY_SQL = """
+        INSERT INTO summary (username, summary_text)
+        VALUES (?, ?)
+        ON CONFLICT(username)
+        DO UPDATE SET summary_text=excluded.summary_text,
+                      updated_at=CURRENT_TIMESTAMP
+    """
+
+    SAVE_SUMMARY_POINTER_SQL = """
+        INSERT INTO summary_pointer (username, last_summarized_id)
+        VALUES (?, ?)
+        ON CONFLICT(username)
+        DO UPDATE SET last_summarized_id=excluded.last_summarized_id
+    """
+
+    # 讀取訊息的欄位：版本過期才帶出原文（其餘情況不讀 raw_content，省 I/O）
+    MESSAGE_COLUMNS = "id, role, content, CASE WHEN format_version < ? THEN raw_content END"
+
+    def __init__(self, manager=connection_manager):
+        self.manager = manager
+
+    def _fetchall(self, sql, params):
+        return safe_sqlite_call(lambda: self.manager.get().execute(sql, params).fetchall())
+
+    def _fetchone(self, sql, params):
+        return safe_sqlite_call(lambda: self.manager.get().execute(sql, params).fetchone())
+
+    def _write(self, sql, params):
+        def _run():
+            conn = self.manager.get()
+            with conn:  # 成功 commit，失敗 rollback
+                conn.execute(sql, params)
+
+        safe_sqlite_call(_run)
+
+    def init_schema(self):
+        from db.migrations import run_migrations
+        return run_migrations(self.manager.get())
+
+    def sync(self):
+        # 把 WAL 寫回主檔並 fsync
+        safe_sqlite_call(lambda: self.manager.get().execute("PRAGMA wal_checkpoint(FULL)"))
+
+    def close(self):
+        self.manager.close_all()
+
+    # -------- 訊息 -------- #
+    def load_messages(self, username):
+        rows = self._fetchall(
+            f"SELECT {self.MESSAGE_COLUMNS} FROM messages WHERE username=? ORDER BY id",
+            (FORMAT_VERSION, username)
+        )
+        return [{"role": r[1], "content": r[2]} for r in self._refresh_formatted(rows)]
+
+    def load_messages_before(self, username, before_id, limit):
+        # 用 id 當游標，不用 OFFSET → 走 (username, id) 索引，翻到多舊都一樣快
+        if before_id is None:
+            rows = self._fetchall(
+                f"SELECT {self.MESSAGE_COLUMNS} FROM messages WHERE username=? ORDER BY id DESC LIMIT ?",
+                (FORMAT_VERSION, username, limit)
+            )
+        else:
+            rows = self._fetchall(
+                f"SELECT {self.MESSAGE_COLUMNS} FROM messages WHERE username=? AND id < ? ORDER BY id DESC LIMIT ?",
+                (FORMAT_VERSION, username, before_id, limit)
+            )
+
+        rows.reverse()  # 由舊到新排序
+        return [{"id": r[0], "role": r[1], "content": r[2]} for r in self._refresh_formatted(rows)]
+
+    def load_recent_messages(self, username, n):
+        rows = self._fetchall(
+            f"""
+            SELECT {self.MESSAGE_COLUMNS} FROM messages
+            WHERE username=?
+            ORDER BY id DESC
+            LIMIT ?
+            """,
+            (FORMAT_VERSION, username, n)
+        )
+
+        rows.reverse()  # 由舊到新排序
+        return [{"role": r[1], "content": r[2]} for r in self._refresh_formatted(rows)]
+
+    def load_messages_after_id(self, username, last_id):
+        rows = self._fetchall(
+            f"""
+            SELECT {self.MESSAGE_COLUMNS} FROM messages
+            WHERE username=? AND id > ?
+            ORDER BY id
+            """,
+            (FORMAT_VERSION, username, last_id)
+        )
+        return [{"id": r[0], "role": r[1], "content": r[2]} for r in self._refresh_formatted(rows)]
+
+    def save_messages(self, rows):
+        def _run():
+            conn = self.manager.get()
+            with conn:  # 同一個 transaction，逐筆取得 id
+                return [
+                    conn.execute(
+                        "INSERT INTO messages (username, role, content, raw_content, format_version) VALUES (?, ?, ?, ?, ?)",
+                        tuple(row) + (None, None) if len(row) == 3 else row
+                    ).lastrowid
+                    for row in rows
+                ]
+
+        return safe_sqlite_call(_run)
+
+    def load_stale_formatted(self, version, after_id, limit):
+        rows = self._fetchall(
+            """
+            SELECT id, content, raw_content FROM messages
+            WHERE raw_content IS NOT NULL AND format_version < ? AND id > ?
+            ORDER BY id
+            LIMIT ?
+            """,
+            (version, after_id, limit)
+        )
+        return [(r[0], r[1], r[2]) for r in rows]
+
+    def update_formatted(self, rows):
+        def _run():
+            conn = self.manager.get()
+            with conn:  # 同一個 transaction
+                conn.executemany(
+                    """
+                    UPDATE messages SET content=?, format_version=?
+                    WHERE id=? AND (format_version IS NULL OR format_version < ?)
+                    """,
+                    [(content, version, msg_id, version) for msg_id, content, version in rows]
+                )
+
+        safe_sqlite_call(_run)
+
+    # -------- 附件 -------- #
+    def save_attachment(self, key, name, pages, content):
+        self._write(
+            "INSERT INTO attachments (hash, name, pages, content) VALUES (?, ?, ?, ?) ON CONFLICT(hash) DO NOTHING",
+            (key, name, pages, content)
+        )
+
+    def load_attachment(self, key):
+        row = self._fetchone("SELECT name, pages, content FROM attachments WHERE hash=?", (key,))
+        return {"name": row[0], "pages": row[1], "content": row[2]} if row else None
+
+    def load_user_version(self, username):
+        # 由 trigger 維護（見 migrations._add_user_versions）
+        row = self._fetchone("SELECT version FROM user_versions WHERE username=?", (username,))
+        return row[0] if row else 0
+
+    # -------- 摘要 -------- #
+    def load_summary(self, username):
+        row = self._fetchone("SELECT summary_text FROM summary WHERE username=?", (username,))
+        return row[0] if row else None
+
+    def save_summary(self, username, text):
+        self._write(self.SAVE_SUMMARY_SQL, (username, text))
+
+    def save_summary_state(self, username, text, last_id):
+        def _run():
+            conn = self.manager.get()
+            with conn:  # 同一個 transaction
+                conn.execute(self.SAVE_SUMMARY_SQL, (username, text))
+                conn.execute(self.SAVE_SUMMARY_POINTER_SQL, (username, last_id))
+
+        safe_sqlite_call(_run)
+
+    def log_task_type(self, username, input_text, task_type, source):
+        self._write(
+            "INSERT INTO task_type_log (username, input_text, task_type, source) VALUES (?, ?, ?, ?)",
+            (username, input_text, task_type, source)
+        )
+
+    def load_task_type_log(self, source=None, limit=5000):
+        if source is None:
+            rows = self._fetchall(
+                "SELECT input_text, task_type, source FROM task_type_log ORDER BY id DESC LIMIT ?",
+                (limit,)
+            )
+        else:
+            rows = self._fetchall(
+                "SELECT input_text, task_type, source FROM task_type_log WHERE source=? ORDER BY id DESC LIMIT ?",
+                (source, limit)
+            )
+
+        rows.reverse()  # 由舊到新排序
+        return [{"input_text": r[0], "task_type": r[1], "source": r[2]} for r in rows]
+
+    def load_cached_task_type(self, cache_key, prompt_version, min_created_at):
+        row = self._fetchone(
+            "SELECT task_type FROM task_type_cache WHERE cache_key=? AND prompt_version=? AND created_at >= ?",
+            (cache_key, prompt_version, min_created_at)
+        )
+        return row[0] if row else None
+
+    def save_cached_task_type(self, cache_key, task_type, prompt_version, created_at):
+        self._write("""
+            INSERT INTO task_type_cache (cache_key, task_type, prompt_version, created_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(cache_key)
+            DO UPDATE SET task_type=excluded.task_type,
+                          prompt_version=excluded.prompt_version,
+                          created_at=excluded.created_at
+        """, (cache_key, task_type, prompt_version, created_at))
+
+    def purge_task_type_cache(self, prompt_version, min_created_at):
+        def _run():
+            conn = self.manager.get()
+            with conn:
+                return conn.execute(
+                    "DELETE FROM task_type_cache WHERE prompt_version != ? OR created_at < ?",
+                    (prompt_version, min_created_at)
+                ).rowcount
+
+        return safe_sqlite_call(_run)
+
+    def load_summary_status(self, username):
+        # 一次查詢：摘要 + pointer + COUNT（只走索引，不讀 content）
+        row = self._fetchone("""
+            SELECT s.summary_text,
+                   COALESCE(p.last_summarized_id, 0),
+                   (SELECT COUNT(*) FROM messages m
+                    WHERE m.username = u.username
+                      AND m.id > COALESCE(p.last_summarized_id, 0))
+            FROM (SELECT ? AS username) u
+            LEFT JOIN summary s ON s.username = u.username
+            LEFT JOIN summary_pointer p ON p.username = u.username
+        """, (username,))
+        return row[0], row[1], row[2]
+
+    def load_summary_pointer(self, username):
+        row = self._fetchone("SELECT last_summarized_id FROM summary_pointer WHERE username=?", (username,))
+        return row[0] if row else 0  # 如果沒有資料，代表從頭開始摘要
+
+    def save_summary_pointer(self, username, last_id):
+        self._write(self.SAVE_SUMMARY_POINTER_SQL, (username, last_id))
@@ -1,19 +1,31 @@
 # 匯入自製函式
 from config.users_account import TEST_USERS
-from db.safe_crud import load_messages
+from db.init import init_db
+from db.safe_crud import load_messages_before
+from db.journal import message_journal
 from chat_flow import process_user_turn
 from ui_design.ui_style import apply_global_style, apply_main_page_style
 from ui_design.ui_script import inject_scroll_control
-from ui_design.ui_render import render_all, render_one
+from ui_design.ui_render import render_window, render_one
 from ui_design.ui_login import login_page
 
 import streamlit as st
 import time
 
 
+# 聊天紀錄每頁筆數（初次載入 + 每次「載入更早」）
+HISTORY_PAGE_SIZE = 30
+
 # 設置頁面標題, icon
 st.set_page_config(page_title="AI MathTA", layout="wide", initial_sidebar_state="expanded")
 
+# 資料庫 schema 升級：同一個 Streamlit process 只執行一次
+@st.cache_resource
+def st_cache_init_db():
+    return init_db()
+
+st_cache_init_db()
+
 # 應用全局 css
 apply_global_style()
 
@@ -62,15 +74,33 @@ def main_page():
     # 為不同 user 建立不同的聊天 key
     username = st.session_state["user"]
     msg_key = f"messages_{username}"
+    window_key = f"history_window_{username}"
+    has_older_key = f"history_has_older_{username}"
 
-    # 初始化該使用者的聊天紀錄
+    # 初始化該使用者的聊天紀錄（只載入最新一頁）
     if msg_key not in st.session_state:
-        st.session_state[msg_key] = load_messages(username)   # 每則結構：{"role": "user/assistant", "content": "..."}
+        message_journal.wait_for_user(username)
+        page = load_messages_before(username, None, HISTORY_PAGE_SIZE)   # 每則結構：{"id": ..., "role": "user/assistant", "content": "..."}
+        st.session_state[msg_key] = page
+        st.session_state[window_key] = HISTORY_PAGE_SIZE
+        st.session_state[has_older_key] = len(page) == HISTORY_PAGE_SIZE
+
+    msgs = st.session_state[msg_key]
 
     # render 聊天紀錄
     chat_container = st.container()
     with chat_container:
-        render_all(st.session_state[msg_key])
+        # 載入更早的對話：先顯示記憶體中已有的，不夠再往 DB 取一頁
+        if len(msgs) > st.session_state[window_key] or st.session_state[has_older_key]:
+            if st.button("⬆️ 載入更早的對話", key=f"load_older_{username}", use_container_width=True):
+                hidden = len(msgs) - st.session_state[window_key]
+                if hidden < HISTORY_PAGE_SIZE and st.session_state[has_older_key]:
+                    older = load_messages_before(username, msgs[0]["id"], HISTORY_PAGE_SIZE)
+                    msgs[:0] = older
+                    st.session_state[has_older_key] = len(older) == HISTORY_PAGE_SIZE
+                st.session_state[window_key] += HISTORY_PAGE_SIZE
+
+        render_window(msgs, st.session_state[window_key])
 
     # 使用內建 chat_input
     prompt = st.chat_input("在這裡寫下你的疑問... ✍️", key=f"chat_input_{username}")
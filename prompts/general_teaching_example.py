@@ -1,5 +1,3 @@
-from langchain_core.messages import (AIMessage, HumanMessage, SystemMessage)
-
 def get_general_teaching_example(mode: str, context_type: str) -> str:
     """
     根據教學模式與情境類別獲得一般教學範例
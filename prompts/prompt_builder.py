@@ -1,13 +1,9 @@
-from prompts.base_system import get_base_system_prompt
-from prompts.task_rules import build_task_rules
-from prompts.output_rules import get_output_rules_prompt
-from prompts.general_teaching_example import get_general_teaching_example
+from prompts.prompt_table import get_prompt_variant
 
 def build_full_prompt(mode, task_type):
-
-    base_system_prompt = get_base_system_prompt(mode)
-    task_rules = build_task_rules(mode, task_type)
-    output_rules = get_output_rules_prompt()
-    general_teaching_example = get_general_teaching_example(mode, task_type)
-
-    return base_system_prompt+ "\n" + task_rules+ "\n" + output_rules+ "\n" + general_teaching_example     # + teaching_example
\ No newline at end of file
+    """
+    回傳 (mode, task_type) 對應的完整 System Prompt
+    - 啟動時已預先組好（prompts/prompt_table.py），這裡只查表
+    - 未定義的組合會丟出 KeyError
+    """
+    return get_prompt_variant(mode, task_type).text
@@ -0,0 +1,59 @@
+# ===== 預先編譯的 System Prompt 表 =====
+# 只有 2 種模式 × 5 種任務類型 → 啟動時全部組好，之後每回合只查表
+# 表格唯讀；查不到的組合直接丟錯（不再默默產生「不支援」的提示詞）
+
+import hashlib
+from types import MappingProxyType
+from typing import NamedTuple
+
+from prompts.base_system import get_base_system_prompt
+from prompts.task_rules import build_task_rules
+from prompts.output_rules import get_output_rules_prompt
+from prompts.general_teaching_example import get_general_teaching_example
+from utils.token_estimator import estimate_tokens
+
+MODES = ("guided", "socratic")
+TASK_TYPES = ("1", "2", "3", "4", "5")
+
+
+class PromptVariant(NamedTuple):
+    mode: str
+    task_type: str
+    text: str
+    tokens: int     # 離線估算的 token 數
+    sha256: str     # 內容雜湊（追蹤提示詞版本 / 快取命中）
+
+
+def assemble_prompt(mode, task_type):
+    """舊的逐次組裝流程（只在建表時使用）"""
+    base_system_prompt = get_base_system_prompt(mode)
+    task_rules = build_task_rules(mode, task_type)
+    output_rules = get_output_rules_prompt()
+    general_teaching_example = get_general_teaching_example(mode, task_type)
+
+    return base_system_prompt+ "\n" + task_rules+ "\n" + output_rules+ "\n" + general_teaching_example     # + teaching_example
+
+
+def compile_prompt_table():
+    table = {}
+    for mode in MODES:
+        for task_type in TASK_TYPES:
+            text = assemble_prompt(mode, task_type)
+            table[(mode, task_type)] = PromptVariant(
+                mode=mode,
+                task_type=task_type,
+                text=text,
+                tokens=estimate_tokens(text),
+                sha256=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+            )
+    return MappingProxyType(table)
+
+
+PROMPT_TABLE = compile_prompt_table()
+
+
+def get_prompt_variant(mode, task_type) -> PromptVariant:
+    key = (mode, str(task_type).strip())
+    if key not in PROMPT_TABLE:
+        raise KeyError(f"未定義的提示詞組合: mode={mode!r}, task_type={task_type!r}")
+    return PROMPT_TABLE[key]
@@ -1,5 +1,3 @@
-from langchain_core.messages import (AIMessage, HumanMessage, SystemMessage)
-
 # 獲得任務規則提示詞
 def build_task_rules(mode: str, task_type: str) -> str:
     """
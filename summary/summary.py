@@ -1,5 +1,6 @@
-import sqlite3
-import streamlit as st
+from db.backend import get_backend
+from summary.summary_worker import SummaryWorker
+from utils.attachments import history_messages
 
 from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.output_parsers import StrOutputParser
@@ -53,112 +54,78 @@ def summary_function(messages):    # messages: list[BaseMessage]
 
 # ====== 摘要載入與儲存 ======
 def load_summary(username):
-    conn = sqlite3.connect("chat.db")
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT summary_text FROM summary WHERE username=?", (username,))
-    row = cursor.fetchone()
-    conn.close()
-
-    return row[0] if row else None
+    return get_backend().load_summary(username)
 
 def save_summary(username, text):
-    conn = sqlite3.connect("chat.db")
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        INSERT INTO summary (username, summary_text)
-        VALUES (?, ?)
-        ON CONFLICT(username)
-        DO UPDATE SET summary_text=excluded.summary_text,
-                      updated_at=CURRENT_TIMESTAMP
-    """, (username, text))
-
-    conn.commit()
-    conn.close()
+    get_backend().save_summary(username, text)
 
 
 # ====== 摘要進度管理 ======
 def load_summary_pointer(username):
-    conn = sqlite3.connect("chat.db")
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT last_summarized_id FROM summary_pointer WHERE username=?", (username,))
-    row = cursor.fetchone()
-    conn.close()
-
-    return row[0] if row else 0  # 如果沒有資料，代表從頭開始摘要
+    return get_backend().load_summary_pointer(username)  # 如果沒有資料回傳 0，代表從頭開始摘要
 
 def save_summary_pointer(username, last_id):
-    conn = sqlite3.connect("chat.db")
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        INSERT INTO summary_pointer (username, last_summarized_id)
-        VALUES (?, ?)
-        ON CONFLICT(username)
-        DO UPDATE SET last_summarized_id=excluded.last_summarized_id
-    """, (username, last_id))
-
-    conn.commit()
-    conn.close()
+    get_backend().save_summary_pointer(username, last_id)
 
 
 # ====== 讀取尚未摘要的舊訊息 ======
 def load_messages_after_id(username, last_id):
-    conn = sqlite3.connect("chat.db")
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT id, role, content FROM messages
-        WHERE username=? AND id > ?
-        ORDER BY id
-    """, (username, last_id))
+    return get_backend().load_messages_after_id(username, last_id)
 
-    rows = cursor.fetchall()
-    conn.close()
 
-    return [{"id": r[0], "role": r[1], "content": r[2]} for r in rows]
 
+# ====== 背景摘要 ======
+SUMMARY_TRIGGER = 20  # 尚未摘要的訊息達到此數量 → 排程摘要
 
 
-def maybe_run_summary(username):
+def run_summary_job(username):
     """
-    檢查是否達到20筆舊訊息 → 若是，產生摘要，回傳最新摘要內容
-    若沒有需要摘要 → 回傳 None 或舊摘要
+    實際執行摘要（在背景 worker thread 內）
+    - 重新讀取最新狀態，未達門檻則不做事（可能已被其他 job 摘要過）
+    - 新摘要與 pointer 一起寫入，讀取端不會看到只更新一半的狀態
     """
-
-    # 載入摘要(如果有)
     summary_text = load_summary(username)
-
-    # 讀取 summary_pointer
     last_ptr = load_summary_pointer(username)
-
-    # 讀取尚未摘要的舊訊息
     older_msgs = load_messages_after_id(username, last_ptr)
 
-    if len(older_msgs) < 20:
-        return summary_text  # 不需要重摘要
-    
-    
-    with st.spinner("✨ 執行摘要 ✨"):
-        # 整理成 LangChain message 格式
-        older_lc = [
-            HumanMessage(content=m["content"]) if m["role"] == "user"
-            else AIMessage(content=m["content"])
-            for m in older_msgs
-        ]
+    if len(older_msgs) < SUMMARY_TRIGGER:
+        return summary_text
 
-        # 舊摘要(如果有)
-        base = [AIMessage(content=summary_text)] if summary_text else []
+    # 整理成 LangChain message 格式（附件只留摘要，見 utils/attachments.py）
+    older_lc = [
+        HumanMessage(content=m["content"]) if m["role"] == "user"
+        else AIMessage(content=m["content"])
+        for m in history_messages(older_msgs)
+    ]
 
-        # 建立新的摘要
-        new_summary = summary_function(base + older_lc)
+    # 舊摘要(如果有)
+    base = [AIMessage(content=summary_text)] if summary_text else []
 
-        # 儲存摘要
-        save_summary(username, new_summary)
+    # 建立新的摘要
+    new_summary = summary_function(base + older_lc)
 
-        # 更新摘要進度 pointer
-        save_summary_pointer(username, older_msgs[-1]["id"])
+    # 儲存摘要 + 更新摘要進度 pointer
+    get_backend().save_summary_state(username, new_summary, older_msgs[-1]["id"])
 
     return new_summary
+
+
+summary_worker = SummaryWorker(run_summary_job)
+
+
+def maybe_run_summary(username):
+    """
+    檢查是否達到20筆舊訊息 → 若是，排程背景摘要（不等待）
+    回傳 (目前已 commit 的摘要 or None, 尚未摘要的訊息數)
+
+    新摘要完成後，下一回合自然會讀到
+    """
+
+    # 一次查詢取得：摘要(如果有)、summary_pointer、尚未摘要的訊息數
+    # 訊息內容只在真的要摘要時（背景 job 內）才讀取
+    summary_text, last_ptr, pending = get_backend().load_summary_status(username)
+
+    if pending >= SUMMARY_TRIGGER:
+        summary_worker.request(username)  # 同一使用者已在摘要中會自動略過
+
+    return summary_text, pending
@@ -0,0 +1,82 @@
+# ===== 背景摘要 worker =====
+# 摘要需要一次完整的 LLM 呼叫 → 不放在對話回合的 critical path
+# 回合只負責「排程」，由背景 thread 執行並寫回新摘要
+
+import logging
+import queue
+import threading
+
+
+class SummaryWorker:
+    """
+    摘要 job queue
+
+    - request(username)：排入一個摘要 job；同一使用者已在排隊/執行中則略過（去重）
+    - 同一使用者的 job 不會同時執行 → 不會重複摘要同一段訊息
+    - stats()：排隊數、執行數、略過數、失敗數
+    """
+
+    def __init__(self, run_job, maxsize=100):
+        self.run_job = run_job
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._inflight = set()  # 排隊中或執行中的 username
+        self._thread = None
+
+        self._jobs_run = 0
+        self._duplicates = 0
+        self._failures = 0
+
+    def request(self, username):
+        """回傳 True 代表已排入，False 代表已有同一使用者的 job（或 queue 已滿）"""
+        with self._lock:
+            if username in self._inflight:
+                self._duplicates += 1
+                return False
+            self._inflight.add(username)
+            self._ensure_started()
+
+        try:
+            self._queue.put_nowait(username)
+        except queue.Full:
+            # queue 滿了就下個回合再排，不阻塞對話
+            with self._lock:
+                self._inflight.discard(username)
+            return False
+        return True
+
+    def is_pending(self, username):
+        with self._lock:
+            return username in self._inflight
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "inflight": len(self._inflight),
+                "jobs_run": self._jobs_run,
+                "duplicates_skipped": self._duplicates,
+                "failures": self._failures,
+            }
+
+    def _ensure_started(self):
+        # 呼叫端已持有 self._lock
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="summary-worker", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            username = self._queue.get()
+            try:
+                self.run_job(username)
+                with self._lock:
+                    self._jobs_run += 1
+            except Exception:
+                logging.exception(f"Summary job failed: {username}")
+                with self._lock:
+                    self._failures += 1
+            finally:
+                with self._lock:
+                    self._inflight.discard(username)
@@ -0,0 +1,142 @@
+# ===== 任務分類快取 =====
+# 學生常重複問一樣的話（「請解這題」「可以給我例題嗎」）→ 同樣輸入 + 同樣 context 不再呼叫 LLM
+# - 記憶體 LRU（最快）→ SQLite（跨重啟）→ 都沒有才呼叫 LLM
+# - 版本 = 分類提示詞 + 模型名稱的雜湊：改提示詞後舊快取自動失效
+
+import hashlib
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from prompts.task_select_prompt import TASK_TYPE_SELECT_SYSTEM_PROMPT, TASK_TYPE_SELECT_MODEL
+
+PROMPT_VERSION = hashlib.sha256(
+    f"{TASK_TYPE_SELECT_MODEL}\n{TASK_TYPE_SELECT_SYSTEM_PROMPT}".encode("utf-8")
+).hexdigest()[:16]
+
+# 快取有效秒數（預設 7 天）
+CACHE_TTL = float(os.getenv("TASK_TYPE_CACHE_TTL", str(7 * 24 * 3600)))
+
+TRAILING_PUNCT = " ?？!！。.~～"
+
+
+def normalize_input(text: str) -> str:
+    """全形 → 半形、小寫、合併空白、去掉句尾標點"""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    return " ".join(text.split()).rstrip(TRAILING_PUNCT)
+
+
+def context_hash(chat_history) -> str:
+    """實際送給分類器的 context（角色 + 內容）雜湊"""
+    h = hashlib.sha256()
+    for m in chat_history or ():
+        h.update(getattr(m, "type", "").encode("utf-8"))
+        h.update(b"\x00")
+        h.update(str(getattr(m, "content", m)).encode("utf-8"))
+        h.update(b"\x01")
+    return h.hexdigest()[:16]
+
+
+def make_key(user_input, chat_history) -> str:
+    raw = f"{normalize_input(user_input)}\x00{context_hash(chat_history)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """
+    get(user_input, chat_history) → task_type or None
+    put(user_input, chat_history, task_type)
+    stats() → 命中 / 未命中次數
+    """
+
+    def __init__(self, max_entries=2048, ttl=CACHE_TTL, version=PROMPT_VERSION, persist=True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = version
+        self.persist = persist
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key → (task_type, created_at)
+        self._purged = False
+
+        self._memory_hits = 0
+        self._db_hits = 0
+        self._misses = 0
+
+    def _backend(self):
+        from db.backend import get_backend
+        backend = get_backend()
+
+        # 第一次使用時清掉舊版本 / 過期的資料
+        if not self._purged:
+            self._purged = True
+            try:
+                backend.purge_task_type_cache(self.version, time.time() - self.ttl)
+            except Exception:
+                logging.exception("purge_task_type_cache failed")
+        return backend
+
+    def _remember(self, key, task_type, created_at):
+        with self._lock:
+            self._entries[key] = (task_type, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, user_input, chat_history):
+        key = make_key(user_input, chat_history)
+        now = time.time()
+
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit and now - hit[1] <= self.ttl:
+                self._entries.move_to_end(key)
+                self._memory_hits += 1
+                return hit[0]
+
+        task_type = None
+        if self.persist:
+            try:
+                task_type = self._backend().load_cached_task_type(key, self.version, now - self.ttl)
+            except Exception:
+                logging.exception("load_cached_task_type failed")
+
+        if task_type is None:
+            with self._lock:
+                self._misses += 1
+            return None
+
+        self._remember(key, task_type, now)
+        with self._lock:
+            self._db_hits += 1
+        return task_type
+
+    def put(self, user_input, chat_history, task_type):
+        key = make_key(user_input, chat_history)
+        now = time.time()
+        self._remember(key, task_type, now)
+
+        if self.persist:
+            try:
+                self._backend().save_cached_task_type(key, task_type, self.version, now)
+            except Exception:
+                logging.exception("save_cached_task_type failed")
+
+    def stats(self):
+        with self._lock:
+            hits = self._memory_hits + self._db_hits
+            lookups = hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "memory_hits": self._memory_hits,
+                "db_hits": self._db_hits,
+                "misses": self._misses,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "prompt_version": self.version,
+            }
+
+
+classification_cache = ClassificationCache()
@@ -0,0 +1,78 @@
+# ===== 任務分類入口（LLM / 本地 / 混合） =====
+# TASK_CLASSIFIER_MODE 環境變數：
+# - llm（預設）：每次都呼叫 task_type_select_chain（舊行為）
+# - local：只用本地分類器，不呼叫 LLM（模型背景訓練完成前，規則沒命中的輸入仍交給 LLM）
+# - hybrid：本地信心足夠就直接回答，否則交給 LLM
+#
+# 預設維持 llm：改成 hybrid 之前，先以 python -m task_classifier.evaluate 在足夠的
+# LLM 標註紀錄上確認 TASK_CLASSIFIER_CONFIDENCE 門檻下的本地覆蓋率 / 準確率，並記錄在 commit 中
+
+import logging
+import os
+import re
+
+from task_classifier.local_classifier import get_local_classifier, LABELS
+from task_classifier.cache import classification_cache
+
+CLASSIFIER_MODE = os.getenv("TASK_CLASSIFIER_MODE", "llm").lower()
+
+# 本地模型信心門檻（規則命中固定為 0.95）
+LOCAL_CONFIDENCE = float(os.getenv("TASK_CLASSIFIER_CONFIDENCE", "0.8"))
+
+CLASSIFIER_MODES = ("llm", "local", "hybrid")
+
+
+def parse_task_type(raw: str) -> str:
+    """LLM 輸出 → '1'~'5'（找不到數字就原樣回傳，維持舊行為）"""
+    match = re.search(r'[1-5]', raw or "")
+    return match.group(0) if match else raw
+
+
+def classify_with_llm(user_input, chat_history):
+    # 延遲 import：local 模式不需要 OPENAI_API_KEY
+    from task_type_select import task_type_select_chain
+    return parse_task_type(task_type_select_chain.invoke(
+        {"input": user_input, "chat_history": chat_history}
+    ))
+
+
+def log_classification(username, user_input, task_type, source):
+    # 紀錄失敗不影響回合
+    try:
+        from db.backend import get_backend
+        get_backend().log_task_type(username, user_input, task_type, source)
+    except Exception:
+        logging.exception("log_task_type failed")
+
+
+def classify_task_type(username, user_input, load_history, mode=None, llm_input=None):
+    """
+    user_input: 學生本回合的提問（不含附件內容）→ 規則 / 本地模型 / 紀錄都只看這段
+    load_history: 無參數函式，回傳給 LLM 的 chat_history（只有需要呼叫 LLM 時才執行）
+    llm_input: 給 LLM 的輸入（附件段落 + 提問），預設同 user_input
+      附件只當 LLM 的參考：題目卷裡的「Solve …」「判別式」不該決定學生想要的是提示還是解答
+
+    回傳 (task_type, source)，source 為 'rule' / 'local' / 'cache' / 'llm'
+    """
+    mode = mode or CLASSIFIER_MODE
+    if mode not in CLASSIFIER_MODES:
+        raise ValueError(f"未知的 TASK_CLASSIFIER_MODE: {mode}")
+
+    if mode != "llm":
+        task_type, confidence, source = get_local_classifier().predict(user_input)
+        if (mode == "local" and task_type is not None) or confidence >= LOCAL_CONFIDENCE:
+            log_classification(username, user_input, task_type, source)
+            return task_type, source
+
+    # 同樣輸入 + 同樣 context 分類過 → 直接用快取
+    llm_input = llm_input or user_input
+    chat_history = load_history()
+    task_type = classification_cache.get(llm_input, chat_history)
+    if task_type is not None:
+        return task_type, "cache"
+
+    task_type = classify_with_llm(llm_input, chat_history)
+    if task_type in LABELS:
+        classification_cache.put(llm_input, chat_history, task_type)
+        log_classification(username, user_input, task_type, "llm")
+    return task_type, "llm"
@@ -0,0 +1,61 @@
+# ===== 任務分類器的 context 政策 =====
+# 分類器只需要輸出一個數字 → 不需要摘要與完整 20 則歷史
+# 預設：最近 2 回合（學生 + AI 回覆，共 4 則）、不截斷、不含摘要 = 原本分類器拿到的 context
+# 更精簡的設定（例如 CLASSIFIER_CONTEXT_ASSISTANT=0 CLASSIFIER_CONTEXT_CHARS=200）
+# 要先用 python -m task_classifier.eval_context_policy --llm 確認分類結果不變，再改成預設
+#
+# CLASSIFIER_CONTEXT_TURNS / CLASSIFIER_CONTEXT_CHARS（0 = 不截斷）/ CLASSIFIER_CONTEXT_ASSISTANT 環境變數可調整
+
+import os
+
+from langchain_core.messages import HumanMessage, AIMessage
+
+from utils.token_estimator import estimate_message_tokens
+
+
+class ClassifierContextPolicy:
+
+    def __init__(self, turns=2, max_chars=0, include_assistant=True):
+        self.turns = turns
+        self.max_chars = max_chars
+        self.include_assistant = include_assistant
+
+    @property
+    def fetch_n(self):
+        """需要從 DB 取幾則最近訊息（user / assistant 交錯）"""
+        return self.turns * 2
+
+    def _clip(self, text):
+        if not self.max_chars or len(text) <= self.max_chars:
+            return text
+        return text[:self.max_chars] + "…"
+
+    def apply(self, recent_msgs):
+        """
+        recent_msgs: [{"role", "content"}]，由舊到新
+        回傳: 給分類器的 LangChain messages（由舊到新）
+        """
+        picked = []
+        user_turns = 0
+        for m in reversed(recent_msgs):
+            if m["role"] == "user":
+                if user_turns >= self.turns:
+                    break
+                user_turns += 1
+                picked.append(HumanMessage(content=self._clip(m["content"])))
+            elif self.include_assistant and user_turns < self.turns:
+                picked.append(AIMessage(content=self._clip(m["content"])))
+
+        picked.reverse()
+        return picked
+
+
+def context_tokens(messages):
+    return sum(estimate_message_tokens(m.content) for m in messages)
+
+
+classifier_context_policy = ClassifierContextPolicy(
+    turns=int(os.getenv("CLASSIFIER_CONTEXT_TURNS", "2")),
+    max_chars=int(os.getenv("CLASSIFIER_CONTEXT_CHARS", "0")),
+    include_assistant=os.getenv("CLASSIFIER_CONTEXT_ASSISTANT", "1") == "1",
+)
@@ -0,0 +1,198 @@
+# ===== 分類器 context 政策評估 =====
+# 重播對話：對每一則學生訊息，分別用
+# - full：前 --window 則訊息原文（預設 4 則 = 調整政策前分類器拿到的 context）
+# - trimmed：classifier_context_policy
+# 組出分類器 context，比較 token 數；加上 --llm 時實際呼叫分類 LLM，
+# 檢查兩種 context 的分類結果是否一致，有標註（--synthetic）時另外列出各自的準確率
+#
+# 兩種 context 都不含摘要：DB 只留每位使用者「目前」的摘要，拿來重播舊訊息會讓 context 看到之後的對話
+#
+# 資料來源：
+# - chat.db（預設）：線上對話，沒有標註 → 只看一致率
+# - --synthetic：下方 SYNTHETIC_CONVERSATIONS，每則學生訊息都有標註，包含要靠前文才能判斷的追問
+#
+# 改變 classifier_context_policy 的預設值之前，先用 --llm 跑出一致率 / 準確率並記錄在 commit 中
+#
+# 用法：python -m task_classifier.eval_context_policy [--db chat.db | --synthetic] [--limit 200] [--window 4] [--llm]
+
+import argparse
+import time
+
+from langchain_core.messages import HumanMessage, AIMessage
+
+from db.connection import ConnectionManager, DB_PATH
+from db.sqlite_backend import SQLiteBackend
+from task_classifier.context_policy import classifier_context_policy, context_tokens
+from utils.attachments import AttachmentStore, expand_content, history_messages
+
+FULL_WINDOW = 4
+
+# 合成對話：(role, content, 標註)，標註依 prompts/task_select_prompt.py 的判斷原則
+ANSWER = "好的，我們一步一步來。首先整理題目給的條件，接著代入公式計算，最後檢查答案是否合理。" * 3
+SYNTHETIC_CONVERSATIONS = [
+    [
+        ("user", "請解這題：2x + 3 = 7", "2"),
+        ("assistant", ANSWER, None),
+        ("user", "那 3x - 5 = 10 呢？", "2"),
+        ("assistant", ANSWER, None),
+        ("user", "我算出來是 x = 4，對嗎？", "4"),
+        ("assistant", ANSWER, None),
+        ("user", "可以再出一題類似的讓我練習嗎？", "3"),
+    ],
+    [
+        ("user", "可以解釋一下什麼是矩陣的秩嗎？", "1"),
+        ("assistant", ANSWER, None),
+        ("user", "為什麼列運算不會改變它？", "1"),
+        ("assistant", ANSWER, None),
+        ("user", "求 [[1,2],[2,4]] 的秩", "2"),
+        ("assistant", ANSWER, None),
+        ("user", "我說是 2，哪裡錯了？", "4"),
+    ],
+    [
+        ("user", "這題積分怎麼算：∫x² dx", "2"),
+        ("assistant", ANSWER, None),
+        ("user", "那 ∫x³ dx 呢", "2"),
+        ("assistant", ANSWER, None),
+        ("user", "我不懂為什麼最後要加 C", "1"),
+        ("assistant", ANSWER, None),
+        ("user", "今天好累喔，先聊點別的", "5"),
+    ],
+    [
+        ("user", "我不太懂微分的意義，可以講一下嗎？", "1"),
+        ("assistant", ANSWER, None),
+        ("user", "可以給我一個例子嗎？", "3"),
+        ("assistant", ANSWER, None),
+        ("user", "那 f(x) = x² 在 x = 3 的導數是多少", "2"),
+        ("assistant", ANSWER, None),
+        ("user", "我這步驟算對了嗎？ f'(x) = 2x，所以是 6", "4"),
+    ],
+    [
+        ("user", "求矩陣 A 的特徵值：[[1,2],[2,1]]", "2"),
+        ("assistant", ANSWER, None),
+        ("user", "特徵向量又是什麼意思？", "1"),
+        ("assistant", ANSWER, None),
+        ("user", "有沒有簡單一點的例題可以練習？", "3"),
+        ("assistant", ANSWER, None),
+        ("user", "你覺得我該不該轉系？", "5"),
+    ],
+    [
+        ("user", "向量空間是什麼意思？", "1"),
+        ("assistant", ANSWER, None),
+        ("user", "我寫的證明有哪裡不對？ 因為 0 向量在裡面所以它是子空間", "4"),
+        ("assistant", ANSWER, None),
+        ("user", "可以示範一題類似的題目嗎？", "3"),
+        ("assistant", ANSWER, None),
+        ("user", "那這題呢：證明 {(x, y) | x + y = 0} 是子空間", "2"),
+    ],
+]
+
+
+def synthetic_samples(window, limit):
+    """回傳 [(學生輸入, full context, trimmed context, 標註)]"""
+    samples = []
+    for conversation in SYNTHETIC_CONVERSATIONS:
+        msgs = [{"role": role, "content": content} for role, content, _ in conversation]
+        for i, (role, content, label) in enumerate(conversation):
+            if role != "user":
+                continue
+            before = msgs[max(0, i - window):i]
+            samples.append((content, to_messages(before), classifier_context_policy.apply(before), label))
+            if len(samples) >= limit:
+                return samples
+    return samples
+
+
+def to_messages(msgs):
+    return [
+        HumanMessage(content=m["content"]) if m["role"] == "user" else AIMessage(content=m["content"])
+        for m in msgs
+    ]
+
+
+def replay_samples(backend, limit, window=FULL_WINDOW):
+    """回傳 [(學生輸入, full context, trimmed context, None)]（線上對話沒有標註）"""
+    rows = backend.manager.get().execute(
+        "SELECT DISTINCT username FROM messages ORDER BY username"
+    ).fetchall()
+
+    # 附件參照以同一個 DB 展開（與線上回合相同：本回合展開段落，歷史只留摘要）
+    store = AttachmentStore(backend=backend)
+
+    samples = []
+    for (username,) in rows:
+        raw = backend.load_messages(username)
+        msgs = history_messages(raw, store)
+
+        for i, m in enumerate(msgs):
+            if m["role"] != "user":
+                continue
+            before = msgs[max(0, i - window):i]
+            trimmed = classifier_context_policy.apply(before)
+
+            samples.append((expand_content(raw[i]["content"], store), to_messages(before), trimmed, None))
+            if len(samples) >= limit:
+                return samples
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--synthetic", action="store_true", help="改用內建的合成標註對話")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--window", type=int, default=FULL_WINDOW, help="full context 的訊息數")
+    parser.add_argument("--llm", action="store_true", help="實際呼叫分類 LLM 比較結果（需要 OPENAI_API_KEY）")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        samples = synthetic_samples(args.window, args.limit)
+    else:
+        manager = ConnectionManager(args.db)
+        samples = replay_samples(SQLiteBackend(manager), args.limit, args.window)
+        manager.close_all()
+
+    policy = classifier_context_policy
+    print(f"source: {'synthetic' if args.synthetic else args.db}  full window: {args.window}")
+    print(f"policy: turns={policy.turns} max_chars={policy.max_chars} include_assistant={policy.include_assistant}")
+    print(f"samples: {len(samples)}")
+    if not samples:
+        return
+
+    full_tokens = sum(context_tokens(s[1]) for s in samples) / len(samples)
+    trimmed_tokens = sum(context_tokens(s[2]) for s in samples) / len(samples)
+    print(f"avg context tokens: full {full_tokens:.0f} → trimmed {trimmed_tokens:.0f} "
+          f"(-{(1 - trimmed_tokens / full_tokens) if full_tokens else 0:.0%})")
+
+    if not args.llm:
+        return
+
+    from task_classifier.classifier import classify_with_llm
+
+    agree = 0
+    correct = {"full": 0, "trimmed": 0}
+    latency = {"full": 0.0, "trimmed": 0.0}
+    labelled = [s for s in samples if s[3] is not None]
+    for text, full, trimmed, label in samples:
+        start = time.perf_counter()
+        a = classify_with_llm(text, full)
+        latency["full"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        b = classify_with_llm(text, trimmed)
+        latency["trimmed"] += time.perf_counter() - start
+
+        agree += a == b
+        correct["full"] += a == label
+        correct["trimmed"] += b == label
+
+    n = len(samples)
+    print(f"agreement: {agree}/{n} ({agree / n:.1%})")
+    if labelled:
+        m = len(labelled)
+        print(f"accuracy: full {correct['full']}/{m} ({correct['full'] / m:.1%}), "
+              f"trimmed {correct['trimmed']}/{m} ({correct['trimmed'] / m:.1%})")
+    print(f"avg llm latency: full {latency['full'] / n * 1000:.0f} ms, trimmed {latency['trimmed'] / n * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
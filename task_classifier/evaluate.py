@@ -0,0 +1,103 @@
+# ===== 任務分類器離線評估 =====
+# 資料 = 提示詞範例 + task_type_log 中 LLM 標註的紀錄（+ 選填 jsonl）
+# 以 k-fold 交叉驗證評估本地分類器（規則 + n-gram），並列出各信心門檻下的
+# 本地覆蓋率 / 準確率，以及每次預測的延遲
+#
+# 用法：
+#   python -m task_classifier.evaluate [--folds 4] [--data extra.jsonl] [--llm]
+#   jsonl 每行：{"input_text": "...", "task_type": "1"}
+#   --llm：另外實際呼叫 LLM 分類器量測延遲（需要 OPENAI_API_KEY）
+
+import argparse
+import json
+import random
+import time
+
+from db.init import init_db
+from prompts.task_select_prompt import get_few_shot_examples
+from task_classifier.local_classifier import LocalTaskClassifier, NgramClassifier, load_training_log
+
+THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.9]
+
+
+def load_dataset(extra_path=None):
+    data = list(get_few_shot_examples()) + load_training_log(limit=100000)
+    if extra_path:
+        with open(extra_path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    data.append((row["input_text"], str(row["task_type"])))
+    return data
+
+
+def cross_validate(data, folds, seed=0):
+    """回傳 [(預測, 信心, 來源, 正解, 延遲ms)]，每筆資料都只被「沒看過它」的模型預測"""
+    data = list(data)
+    random.Random(seed).shuffle(data)
+    folds = max(2, min(folds, len(data)))
+
+    results = []
+    for k in range(folds):
+        test = data[k::folds]
+        train = [d for i, d in enumerate(data) if i % folds != k]
+        classifier = LocalTaskClassifier(NgramClassifier().fit(train))
+
+        for text, label in test:
+            start = time.perf_counter()
+            pred, confidence, source = classifier.predict(text)
+            results.append((pred, confidence, source, label, (time.perf_counter() - start) * 1000))
+    return results
+
+
+def report(results):
+    n = len(results)
+    print(f"samples: {n}")
+    if not n:
+        return
+
+    correct = sum(1 for r in results if r[0] == r[3])
+    print(f"local-only accuracy: {correct / n:.3f}")
+
+    rules = [r for r in results if r[2] == "rule"]
+    if rules:
+        print(f"rule hits: {len(rules)} ({len(rules) / n:.1%}), accuracy {sum(r[0] == r[3] for r in rules) / len(rules):.3f}")
+
+    print("threshold | local coverage | local accuracy")
+    for t in THRESHOLDS:
+        answered = [r for r in results if r[1] >= t]
+        acc = sum(r[0] == r[3] for r in answered) / len(answered) if answered else 0.0
+        print(f"   {t:.1f}    |     {len(answered) / n:6.1%}     |     {acc:.3f}")
+
+    latencies = sorted(r[4] for r in results)
+    print(f"local latency: p50 {latencies[n // 2]:.3f} ms, p95 {latencies[int(n * 0.95) - 1 if n > 1 else 0]:.3f} ms")
+
+
+def measure_llm(data, limit=20):
+    from task_classifier.classifier import classify_with_llm
+
+    latencies, agree = [], 0
+    for text, label in data[:limit]:
+        start = time.perf_counter()
+        pred = classify_with_llm(text, [])
+        latencies.append((time.perf_counter() - start) * 1000)
+        agree += pred == label
+
+    latencies.sort()
+    print(f"llm: {len(latencies)} calls, agreement {agree / len(latencies):.3f}, p50 {latencies[len(latencies) // 2]:.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folds", type=int, default=4)
+    parser.add_argument("--data", default=None)
+    parser.add_argument("--llm", action="store_true")
+    args = parser.parse_args()
+
+    # 單獨執行時 main.py 的 init_db 沒有跑過 → 先升級 schema（task_type_log）
+    init_db()
+    dataset = load_dataset(args.data)
+    report(cross_validate(dataset, args.folds))
+
+    if args.llm:
+        measure_llm(dataset)
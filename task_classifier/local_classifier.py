@@ -0,0 +1,232 @@
+# ===== 本地任務分類器 =====
+# 兩層：
+# 1. 關鍵字 / regex 規則（高精確度，命中單一類型才採用）
+# 2. 字元 n-gram 線性模型（softmax regression，純 Python）
+# 訓練資料 = 提示詞內的範例 + LLM 分類過的紀錄（task_type_log, source='llm'）
+#
+# 模型權重：
+# - 離線訓練後存成 JSON，程式啟動時直接載入（不在回合內訓練）：
+#     python -m task_classifier.local_classifier [--rows 5000] [--epochs 40]
+#   新的 LLM 標註紀錄要重新執行一次才會納入
+# - 沒有權重檔時在背景 thread 訓練（限制筆數 / epoch 數），完成前只用規則，沒命中就交給 LLM
+#
+# TASK_CLASSIFIER_MODEL 環境變數：權重檔路徑（含學生輸入的 n-gram，不進版控）
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+from prompts.task_select_prompt import get_few_shot_examples
+
+LABELS = ["1", "2", "3", "4", "5"]
+
+# (類型, regex)：同一輸入命中多個不同類型 → 視為模稜兩可，不採用規則
+RULES = [
+    ("3", re.compile(r'例題|例子|範例|練習題|出一題|示範一題|類似的題目|給我.{0,4}題')),
+    ("4", re.compile(r'檢查|哪裡錯|哪裡不對|算對了嗎|對不對|對嗎|我的答案|我算出|我寫的|我解這題')),
+    ("2", re.compile(r'請解|求解|怎麼算|計算|求.{0,10}(值|解|根|導數|積分)|[0-9a-zA-Z)]\s*[=<>≤≥]\s*[-0-9a-zA-Z(]|∫')),
+    ("1", re.compile(r'什麼是|是什麼|什麼意思|的意義|的定義|為什麼會|解釋一下|講一下|差別|差異')),
+]
+
+RULE_CONFIDENCE = 0.95
+
+MODEL_PATH = os.getenv("TASK_CLASSIFIER_MODEL", os.path.join("task_classifier", "local_model.json"))
+
+# 沒有權重檔時的背景訓練上限
+BACKGROUND_ROWS = 1000
+BACKGROUND_EPOCHS = 15
+
+# 存檔時略過太小的權重（幾乎不影響預測，檔案小很多）
+MIN_SAVED_WEIGHT = 1e-4
+
+
+def normalize(text: str) -> str:
+    """小寫、合併空白（分類用，不影響送給 LLM 的原文）"""
+    return re.sub(r'\s+', ' ', text.strip().lower())
+
+
+def char_ngrams(text: str, n_min=1, n_max=3):
+    text = f"^{normalize(text)}$"
+    grams = defaultdict(float)
+    for n in range(n_min, n_max + 1):
+        for i in range(len(text) - n + 1):
+            grams[text[i:i + n]] += 1.0
+
+    # L2 正規化，長短句子尺度一致
+    norm = math.sqrt(sum(v * v for v in grams.values())) or 1.0
+    return {g: v / norm for g, v in grams.items()}
+
+
+def match_rules(text: str):
+    """回傳唯一命中的類型，沒有命中或命中多個類型則 None"""
+    hits = {label for label, pattern in RULES if pattern.search(text)}
+    return hits.pop() if len(hits) == 1 else None
+
+
+class NgramClassifier:
+    """
+    多類別 softmax regression（SGD + L2）
+    - 權重以 dict 儲存：只記錄出現過的 n-gram
+    """
+
+    def __init__(self, epochs=40, lr=0.5, l2=1e-4, seed=0):
+        self.epochs = epochs
+        self.lr = lr
+        self.l2 = l2
+        self.seed = seed
+        self.weights = {label: defaultdict(float) for label in LABELS}
+        self.bias = {label: 0.0 for label in LABELS}
+
+    def _scores(self, feats):
+        return {
+            label: self.bias[label] + sum(w[g] * v for g, v in feats.items() if g in w)
+            for label, w in self.weights.items()
+        }
+
+    def _softmax(self, scores):
+        top = max(scores.values())
+        exps = {k: math.exp(s - top) for k, s in scores.items()}
+        total = sum(exps.values())
+        return {k: e / total for k, e in exps.items()}
+
+    def fit(self, examples):
+        """examples: [(text, label)]"""
+        data = [(char_ngrams(text), label) for text, label in examples if label in LABELS]
+        rng = random.Random(self.seed)
+
+        for _ in range(self.epochs):
+            rng.shuffle(data)
+            for feats, label in data:
+                probs = self._softmax(self._scores(feats))
+                for k in LABELS:
+                    grad = probs[k] - (1.0 if k == label else 0.0)
+                    w = self.weights[k]
+                    for g, v in feats.items():
+                        w[g] -= self.lr * (grad * v + self.l2 * w[g])
+                    self.bias[k] -= self.lr * grad
+        return self
+
+    def predict_proba(self, text):
+        return self._softmax(self._scores(char_ngrams(text)))
+
+    def save(self, path):
+        data = {
+            "labels": LABELS,
+            "bias": self.bias,
+            "weights": {
+                label: {g: round(v, 6) for g, v in w.items() if abs(v) >= MIN_SAVED_WEIGHT}
+                for label, w in self.weights.items()
+            },
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("labels") != LABELS:
+            raise ValueError(f"{path}: labels 不符")
+        model = cls()
+        model.bias = {label: float(data["bias"][label]) for label in LABELS}
+        for label in LABELS:
+            model.weights[label].update(data["weights"][label])
+        return model
+
+
+class LocalTaskClassifier:
+    """
+    predict(text) → (類型, 信心, 來源 'rule' / 'local')
+    model 尚未就緒（背景訓練中）時只有規則，沒命中回傳 (None, 0.0, 'local')
+    """
+
+    def __init__(self, model=None):
+        self.model = model
+
+    @classmethod
+    def train(cls, extra_examples=(), epochs=40):
+        examples = list(get_few_shot_examples()) + list(extra_examples)
+        return cls(NgramClassifier(epochs=epochs).fit(examples))
+
+    def predict(self, text):
+        label = match_rules(text)
+        if label is not None:
+            return label, RULE_CONFIDENCE, "rule"
+
+        model = self.model
+        if model is None:
+            return None, 0.0, "local"
+        probs = model.predict_proba(text)
+        label = max(probs, key=probs.get)
+        return label, probs[label], "local"
+
+
+# ===== 全程序共用（載入權重檔，沒有則背景訓練） =====
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def load_training_log(limit=5000):
+    """LLM 分類過的紀錄（只用 LLM 標註，避免本地模型自我強化）"""
+    from db.backend import get_backend
+    rows = get_backend().load_task_type_log(source="llm", limit=limit)
+    return [(r["input_text"], r["task_type"]) for r in rows]
+
+
+def _train_in_background(classifier):
+    try:
+        start = time.perf_counter()
+        trained = LocalTaskClassifier.train(load_training_log(BACKGROUND_ROWS), BACKGROUND_EPOCHS)
+        classifier.model = trained.model
+        print(f"🏷️ [LOCAL CLASSIFIER] 背景訓練完成 {time.perf_counter() - start:.1f}s")
+    except Exception:
+        logging.exception("local classifier training failed")
+
+
+def get_local_classifier():
+    """不會阻塞：有權重檔就載入；沒有就先回傳只有規則的分類器，背景訓練完成後補上模型"""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                classifier = LocalTaskClassifier()
+                try:
+                    classifier.model = NgramClassifier.load(MODEL_PATH)
+                except Exception as e:
+                    if not isinstance(e, FileNotFoundError):
+                        logging.exception("load %s failed", MODEL_PATH)
+                    threading.Thread(
+                        target=_train_in_background, args=(classifier,),
+                        name="local-classifier-train", daemon=True,
+                    ).start()
+                _classifier = classifier
+    return _classifier
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000, help="最多使用幾筆 LLM 標註紀錄")
+    parser.add_argument("--epochs", type=int, default=40)
+    parser.add_argument("--out", default=MODEL_PATH)
+    args = parser.parse_args()
+
+    from db.init import init_db
+    init_db()
+
+    rows = load_training_log(args.rows)
+    start = time.perf_counter()
+    model = LocalTaskClassifier.train(rows, args.epochs).model
+    seconds = time.perf_counter() - start
+    model.save(args.out)
+    print(f"trained on {len(rows)} log rows + few-shot examples in {seconds:.1f}s → {args.out} "
+          f"({os.path.getsize(args.out) / 1024:.0f} KB)")
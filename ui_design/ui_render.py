@@ -1,16 +1,28 @@
+import html
+
 import streamlit as st
 
+from utils.attachments import describe, split_reference
+
 # 只用於第一次載入頁面
 def render_all(messages):
     for msg in messages:
         render_one(msg)
 
+# 只 render 最新 window 則訊息（rerun 成本不隨歷史長度成長）
+def render_window(messages, window):
+    render_all(messages[-window:] if window else [])
+
 # 只 render 一則訊息
 def render_one(msg):
     if msg["role"] == "user":
+        # 附件只顯示檔名（內容用到時才從 attachments 表讀取，見 utils/attachments.py）
+        key, content = split_reference(msg["content"])
+        if key is not None:
+            content += f'<br><small>📎 {html.escape(describe(key))}</small>'
         # 使用者：保留氣泡(HTML沒問題)
         st.markdown(
-            f'<div class="chat-row user-row"><div class="bubble user-bubble">🐣 {msg["content"]}</div></div>',
+            f'<div class="chat-row user-row"><div class="bubble user-bubble">🐣 {content}</div></div>',
             unsafe_allow_html=True
         )
     else:
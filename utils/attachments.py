@@ -0,0 +1,278 @@
+# ===== 上傳附件（以內容雜湊存放）=====
+# 原本每則附 PDF 的訊息都把整份文字存進 messages.content → 同一份檔案重複存 N 次
+# → 文字只存一次在 attachments 表（key = 內容 sha256），訊息只存一行參照 + 學生的提問：
+#
+#     [[attachment:<sha256>]]
+#     學生的提問
+#
+# 用到時才展開：
+# - 本回合送模型：展開成「附件相關段落 + 提問」（expand_content，段落檢索見 utils/pdf_index.py）
+# - 歷史訊息（history / 分類器 context / 摘要）：附件內容換成一行摘要（檔名 + 當時參考的頁碼 / 題號）
+#   → 附件在提出的那一回合之後就不再重送；摘要只取決於訊息本身，epoch 前綴維持不變
+#   學生之後再提到附件（「第 5 題」「講義」…）時，由 expand_turn_input 把相關段落放進本回合的提問
+# - 畫面顯示：只顯示提問 + 附件名稱（見 ui_design/ui_render.py）
+#
+# ATTACHMENT_HISTORY 環境變數：stub（預設）/ full（歷史訊息也展開相關段落）
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import NamedTuple
+
+from utils.pdf_index import QUESTION_PAGE_RE, QUESTION_PROBLEM_RE, get_index
+from utils.token_estimator import estimate_message_tokens
+
+ATTACHMENT_HISTORY = os.getenv("ATTACHMENT_HISTORY", "stub")
+
+# 每頁文字以 form feed 分隔存成一個欄位
+PAGE_SEP = "\f"
+
+REFERENCE_RE = re.compile(r'\A\[\[attachment:([0-9a-f]{64})\]\](?:\n|\Z)')
+REFERENCE_PREFIX = "[[attachment:"
+
+ATTACHMENT_HEADER = "【題目／參考資料（學生上傳）】"
+QUESTION_HEADER = "【學生的提問／說明】"
+MISSING_TEXT = "（附件已無法讀取）"
+
+# 提問中提到附件（題號 / 頁碼另外以 pdf_index 的規則判斷）
+MENTION_RE = re.compile(r'講義|檔案|附件|pdf|考卷|題目卷|學習單|上傳|剛剛那份|那份', re.IGNORECASE)
+
+# 摘要最多列出幾個段落標籤
+DIGEST_LABELS = 5
+
+
+class Attachment(NamedTuple):
+    key: str
+    name: str
+    pages: list
+
+
+def attachment_key(pages) -> str:
+    return hashlib.sha256(PAGE_SEP.join(pages).encode("utf-8")).hexdigest()
+
+
+def make_reference(key: str, question: str) -> str:
+    return f"[[attachment:{key}]]\n{question}"
+
+
+def escape_reference(text: str) -> str:
+    """
+    學生直接輸入的文字 → 不會被當成附件參照
+    attachments 表不分使用者，打出別人檔案的 key 就能讀到內容 → 開頭加零寬空白，只有上傳才會產生參照
+    """
+    if text.startswith(REFERENCE_PREFIX):
+        return "\u200b" + text
+    return text
+
+
+def split_reference(content: str):
+    """訊息內容 → (附件 key or None, 提問)"""
+    m = REFERENCE_RE.match(content or "")
+    if m is None:
+        return None, content
+    return m.group(1), content[m.end():]
+
+
+def format_user_input(excerpt: str, question: str) -> str:
+    """附件內容 + 提問 → 送給模型的使用者輸入"""
+    return f"{ATTACHMENT_HEADER}\n{excerpt}\n\n{QUESTION_HEADER}\n{question}".strip()
+
+
+class AttachmentStore:
+    """
+    save(pages, name) → key（同一份內容只寫入一次）
+    load(key) → Attachment or None（記憶體 LRU，依文字大小限制總量）
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, backend=None):
+        self.max_bytes = max_bytes
+        self._backend = backend
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key → (Attachment, nbytes)
+        self._bytes = 0
+
+    def backend(self):
+        if self._backend is not None:
+            return self._backend
+        from db.backend import get_backend
+        return get_backend()
+
+    def _remember(self, attachment):
+        nbytes = sum(len(p) for p in attachment.pages)
+        with self._lock:
+            if attachment.key in self._entries or nbytes > self.max_bytes:
+                return
+            self._entries[attachment.key] = (attachment, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, size) = self._entries.popitem(last=False)
+                self._bytes -= size
+
+    def _cached(self, key):
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+                return hit[0]
+        return None
+
+    def save(self, pages, name=None):
+        key = attachment_key(pages)
+        # 本 process 已存過（或讀過）的附件不需要再寫一次
+        if self._cached(key) is None:
+            self.backend().save_attachment(key, name, len(pages), PAGE_SEP.join(pages))
+            self._remember(Attachment(key, name, list(pages)))
+        return key
+
+    def load(self, key):
+        attachment = self._cached(key)
+        if attachment is not None:
+            return attachment
+        try:
+            row = self.backend().load_attachment(key)
+        except Exception:
+            logging.exception("load_attachment failed")
+            return None
+        if row is None:
+            return None
+        attachment = Attachment(key, row["name"], row["content"].split(PAGE_SEP))
+        self._remember(attachment)
+        return attachment
+
+
+attachment_store = AttachmentStore()
+
+
+def _describe(attachment) -> str:
+    if attachment is None:
+        return "附件已無法讀取"
+    if attachment.name is None:
+        # 舊資料搬移過來的附件沒有檔名與分頁資訊
+        return "上傳的檔案"
+    return f"{attachment.name}（{len(attachment.pages)} 頁）"
+
+
+def describe(key: str, store=attachment_store) -> str:
+    """畫面顯示用：檔名（頁數）"""
+    return _describe(store.load(key))
+
+
+def _select(key, question, store, fallback=True):
+    """→ (attachment, index, 選出的段落)，附件讀不到時 (None, None, [])"""
+    attachment = store.load(key)
+    if attachment is None:
+        return None, None, []
+    index = get_index(key, attachment.pages)
+    return attachment, index, index.select(question, fallback=fallback)
+
+
+def _expand(attachment, index, chunks, question):
+    """選出的段落 + 提問 → 送給模型的使用者輸入"""
+    if attachment is None:
+        return format_user_input(MISSING_TEXT, question)
+    return format_user_input(index.format(chunks).strip(), question)
+
+
+def _stub(attachment, index, chunks, question):
+    """選出的段落 → 一行摘要 + 提問"""
+    if attachment is None:
+        return f"〔附件已無法讀取〕\n{question}".strip()
+
+    if len(chunks) == len(index.chunks):
+        refs = "全文"
+    else:
+        labels = list(dict.fromkeys(c.label() for c in chunks))
+        refs = "、".join(labels[:DIGEST_LABELS]) + (" 等" if len(labels) > DIGEST_LABELS else "")
+    return f"〔附件 {_describe(attachment)}｜{refs}｜內容已省略〕\n{question}".strip()
+
+
+def expand_content(content: str, store=attachment_store) -> str:
+    """
+    訊息內容 → 送給模型的形式
+    - 沒有附件參照：原樣
+    - 有：附件中與提問相關的段落 + 提問（附件讀不到時註明）
+    """
+    key, question = split_reference(content)
+    if key is None:
+        return content
+    return _expand(*_select(key, question, store), question)
+
+
+def stub_content(content: str, store=attachment_store) -> str:
+    """
+    歷史訊息的附件 → 一行摘要 + 提問（不加段落標題，越短越好）
+    摘要：檔名與當時放入的段落標籤（頁碼 / 題號），讓模型知道先前討論的是哪幾題
+    """
+    key, question = split_reference(content)
+    if key is None:
+        return content
+    return _stub(*_select(key, question, store), question)
+
+
+def history_messages(msgs, store=attachment_store, mode=None):
+    """
+    歷史訊息 [{"role", "content", ...}] → 送模型的形式（沒有附件的訊息原物件沿用）
+    - stub：附件換成摘要，並在訊息上記錄省下的 token 數（"attachment_tokens_saved"）
+    - full：附件展開成相關段落（同 expand_content）
+    每則訊息只讀一次附件、檢索一次，摘要與省下的 token 數都用同一組段落
+    """
+    mode = mode or ATTACHMENT_HISTORY
+    out = []
+    for m in msgs:
+        key, question = split_reference(m["content"])
+        if key is None:
+            out.append(m)
+            continue
+
+        selected = _select(key, question, store)
+        full = _expand(*selected, question)
+        if mode == "full":
+            out.append({**m, "content": full})
+            continue
+
+        stub = _stub(*selected, question)
+        saved = estimate_message_tokens(full) - estimate_message_tokens(stub)
+        out.append({**m, "content": stub, "attachment_tokens_saved": max(saved, 0)})
+    return out
+
+
+def tokens_saved(msgs):
+    """history_messages 結果中，附件換成摘要省下的 token 數"""
+    return sum(m.get("attachment_tokens_saved", 0) for m in msgs)
+
+
+def mentions_attachment(question: str) -> bool:
+    return bool(
+        MENTION_RE.search(question)
+        or QUESTION_PROBLEM_RE.search(question)
+        or QUESTION_PAGE_RE.search(question)
+    )
+
+
+def expand_turn_input(user_input: str, load_recent, store=attachment_store):
+    """
+    本回合的使用者輸入 → (送模型的內容, 沿用的先前附件 key or None)
+    - 本回合有附件：展開相關段落
+    - 沒有附件但提到附件 / 題號 / 頁碼：沿用最近一次上傳的附件，放入與本回合提問相關的段落
+      只有提問真的命中附件內容（指定的題號 / 頁碼存在，或 BM25 有分數）才沿用；
+      「我上傳錯了」這類沒命中的提問不放文件開頭
+    load_recent()：最近訊息（由舊到新），只在需要沿用時才呼叫
+    """
+    if split_reference(user_input)[0] is not None:
+        return expand_content(user_input, store), None
+    if not mentions_attachment(user_input):
+        return user_input, None
+
+    for m in reversed(load_recent()):
+        key, _ = split_reference(m["content"]) if m["role"] == "user" else (None, None)
+        if key is None:
+            continue
+        attachment, index, chunks = _select(key, user_input, store, fallback=False)
+        if not chunks:
+            return user_input, None
+        return _expand(attachment, index, chunks, user_input), key
+    return user_input, None
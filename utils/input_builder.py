@@ -1,38 +1,71 @@
 # 文檔上傳
-from pypdf import PdfReader
+from utils.attachments import attachment_store, escape_reference, make_reference
+from utils.pdf_cache import content_hash, pdf_text_cache, read_bytes
+from utils.pdf_extract import extract_pdf
 
 
-def extract_text_from_pdf(uploaded_file) -> str:
-    reader = PdfReader(uploaded_file)
-    text = ""
-    for page in reader.pages:
-        page_text = page.extract_text()
-        if page_text:
-            text += page_text + "\n"
-    return text.strip()
+def _print_report(report):
+    slowest = sorted(report["per_page"], key=lambda p: p["ms"], reverse=True)[:3]
+    print(
+        f"📄 [PDF] {report['extracted']}/{report['pages']} 頁 "
+        f"{report['chars']} 字 {report['seconds']}s {report['status_counts']} "
+        f"最慢: {[(p['page'], p['ms']) for p in slowest]}"
+    )
 
 
-def build_user_input(text_input: str, uploaded_file) -> str:
+def _missing_note(report):
+    """時間 / 字數預算用完時，註明哪些頁面沒有讀到"""
+    if report["complete"]:
+        return ""
+    missing = [p["page"] for p in report["per_page"] if p["status"] != "ok"]
+    return f"\n（檔案過大，第 {', '.join(map(str, missing[:10]))}{' 等' if len(missing) > 10 else ''} 頁未完整讀取）"
+
+
+def load_pdf(uploaded_file, on_page=None):
     """
-    統一使用者輸入：
-    - 純文字
-    - 或 文字 + Word / PDF
+    PDF → (content hash, PdfExtraction)（同一份檔案只解析一次，見 utils/pdf_cache.py）
+    - on_page(result, done, total)：實際解析時每頁完成就呼叫（快取命中時不會呼叫）
     """
+    def extract(data):
+        extraction = extract_pdf(data, on_page)
+        _print_report(extraction.report)
+        return extraction
 
-    if uploaded_file is None:
-        return text_input.strip()
+    data = read_bytes(uploaded_file)
+    key = content_hash(data)
+    return key, pdf_text_cache.get(data, extract, key)
+
+
+def extract_text_from_pdf(uploaded_file, on_page=None) -> str:
+    """整份 PDF 的文字"""
+    _, extraction = load_pdf(uploaded_file, on_page)
+    text = "\n".join(p for p in extraction.pages if p).strip()
+    return text + _missing_note(extraction.report)
+
+
+def save_pdf_attachment(uploaded_file, on_page=None) -> str:
+    """PDF → 存進 attachments 表，回傳附件 key（內容 sha256）"""
+    _, extraction = load_pdf(uploaded_file, on_page)
+    pages = list(extraction.pages)
+    if pages:
+        pages[-1] += _missing_note(extraction.report)
+    return attachment_store.save(pages, getattr(uploaded_file, "name", None))
 
-    file_text = ""
+
+def build_user_input(text_input: str, uploaded_file, on_page=None) -> str:
+    """
+    統一使用者輸入（存進 DB 的形式）：
+    - 純文字（開頭像附件參照的文字會被跳脫，見 utils.attachments.escape_reference）
+    - 或 文字 + Word / PDF：附件存一次在 attachments 表，這裡只回傳「參照行 + 提問」
+      送模型前由 utils.attachments.expand_content 展開成相關段落 + 提問
+    """
+
+    if uploaded_file is None:
+        return escape_reference(text_input.strip())
 
     if uploaded_file.type == "application/pdf":
-        file_text = extract_text_from_pdf(uploaded_file)
+        key = save_pdf_attachment(uploaded_file, on_page)
     else:
         raise ValueError("不支援的檔案格式")
 
-    return f"""
-【題目／參考資料（學生上傳）】
-{file_text}
-
-【學生的提問／說明】
-{text_input.strip()}
-""".strip()
\ No newline at end of file
+    return make_reference(key, text_input.strip())
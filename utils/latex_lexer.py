@@ -0,0 +1,167 @@
+# ===== LaTeX 後製（lexer 版）=====
+# 與 latex_postprocess.format_latex_legacy 輸出完全相同，但減少整段掃描次數：
+# - Unicode 符號：str.translate 一次完成（原本 13 次 replace）
+# - 數學函數 + 簡單分數：同一個 regex 掃描（原本 14 + 1 次 re.sub）
+# - 自動包裝：一次 regex 掃描找出「既有數學區塊 / 指令片段」（原本 re.split + 逐字元 Python 迴圈）
+# 所有 regex / 對照表在 import 時預先編譯
+#
+# 對照組與 golden 比對：python -m benchmarks.check_latex_lexer
+
+import re
+
+# ========================
+# 預先編譯的對照表
+# ========================
+
+# \[ ... \] → $$ ... $$、\( ... \) → $ ... $（兩者可能交錯，順序同舊版分兩次）
+DISPLAY_RE = re.compile(r'\\\[(.*?)\\\]', re.DOTALL)
+INLINE_RE = re.compile(r'\\\(([^\n]*?)\\\)')
+
+# Unicode → LaTeX（取代結果與舊版 str.replace 相同，含 \\sum 等雙反斜線）
+UNICODE_TABLE = str.maketrans({
+    '∑': '\\\\sum',
+    '∞': '\\\\infty',
+    '∫': '\\\\int',
+    'Δ': '\\\\Delta',
+    'π': '\\\\pi',
+    '·': '\\\\cdot',
+    '×': '\\times',
+    '÷': '\\div',
+    '≤': '\\le',
+    '≥': '\\ge',
+    '≠': '\\neq',
+    '≈': '\\approx',
+    '→': '\\to',
+})
+
+FUNCS = (
+    'arcsin', 'arccos', 'arctan',
+    'cot', 'sec', 'csc',
+    'sqrt',
+    'ln', 'log', 'exp',
+    'sin', 'cos', 'tan',
+    'min', 'max',
+)
+FUNC_SET = frozenset(FUNCS)
+
+# 單字開頭（前面不是 \）：
+# - 分數候選 a/b（前面也不是 \frac{）
+# - 數學函數
+WORD_RE = re.compile(
+    r'(?<!\\)\b(?:'
+    r'(?<!\\frac\{)([a-zA-Z0-9]+)\s*/\s*([a-zA-Z0-9]+)\b'
+    r'|(' + '|'.join(FUNCS) + r')\b'
+    r')'
+)
+
+# 既有數學區塊（$$...$$ / $...$）或 LaTeX 指令開頭的數學片段
+MATH_CHARS = r'[\\A-Za-z0-9=^_{}()\[\]+\-*/., ]'
+WRAP_RE = re.compile(
+    r'(\$\$.*?\$\$|\$.*?\$)'
+    r'|\\[A-Za-z]' + MATH_CHARS + '*',
+    re.DOTALL
+)
+
+BLOCK_RE = re.compile(r'\$\$(.*?)\$\$', re.DOTALL)
+
+
+# ========================
+# 各階段
+# ========================
+
+def convert_math_delimiters(text: str) -> str:
+    """\\[ \\] → $$、\\( \\) → $"""
+    text = DISPLAY_RE.sub(r'$$\1$$', text)
+    return INLINE_RE.sub(r'$\1$', text)
+
+
+def rewrite_symbols(text: str) -> str:
+    """
+    Unicode 符號、數學函數、簡單分數（對應舊版 2~4）
+
+    舊版先做函數再做分數，所以分數的分子 / 分母若是函數名稱（會被加上 \\）就不成立：
+    - sin/x → \\sin/x
+    - x/sin → x/\\sin
+    """
+    text = text.translate(UNICODE_TABLE)
+
+    out = []
+    pos = 0
+    while True:
+        m = WORD_RE.search(text, pos)
+        if m is None:
+            break
+        out.append(text[pos:m.start()])
+
+        num, den, func = m.group(1, 2, 3)
+        if func is not None:
+            out.append('\\' + func)
+            pos = m.end()
+        elif num in FUNC_SET:
+            # 分子是函數：只加 \，分母之後繼續掃描（可能是下一個分數的分子）
+            out.append('\\' + num)
+            pos = m.start() + len(num)
+        elif den in FUNC_SET:
+            out.append(num)
+            pos = m.start() + len(num)
+        else:
+            out.append(f'\\frac{{{num}}}{{{den}}}')
+            pos = m.end()
+
+    out.append(text[pos:])
+    return ''.join(out)
+
+
+def wrap_math(text: str) -> str:
+    """
+    自動包裝 LaTeX（對應舊版 wrap_latex_math）
+    - 既有 $...$ / $$...$$ 不動
+    - 指令開頭的片段整段包成 $...$（片段前後空白去掉）
+
+    舊版以 re.split 切塊，「$ 開頭」的塊一律視為數學：
+    最後一塊若以落單的 $ 開頭，整塊保持原樣
+    """
+    out = []
+    pos = 0
+    last_math_end = 0
+    kept = 0  # last_math_end 之前的輸出段數
+
+    for m in WRAP_RE.finditer(text):
+        out.append(text[pos:m.start()])
+        if m.group(1) is not None:
+            out.append(m.group(1))
+            last_math_end = m.end()
+            kept = len(out)
+        else:
+            segment = m.group().strip()
+            out.append(f'${segment}$')
+        pos = m.end()
+    out.append(text[pos:])
+
+    if text.startswith('$', last_math_end):
+        return ''.join(out[:kept]) + text[last_math_end:]
+    return ''.join(out)
+
+
+def _block_repl(match):
+    return f"\n\n$$\n{match.group(1).strip()}\n$$\n\n"
+
+
+def normalize_blocks(text: str) -> str:
+    """$$ 區塊前後加空行（對應舊版 normalize_block_math）"""
+    return BLOCK_RE.sub(_block_repl, text)
+
+
+def finalize_dollars(text: str) -> str:
+    """$ 不平衡時補一個 + 區塊公式排版（對應舊版 8、7）"""
+    if text.count('$') % 2:
+        text += '$'
+    return normalize_blocks(text)
+
+
+def format_latex_lexer(text: str) -> str:
+    text = convert_math_delimiters(text)
+    text = rewrite_symbols(text)
+    text = wrap_math(text)
+    text = finalize_dollars(text)
+    return text.strip()
@@ -1,8 +1,19 @@
 #此版本沒有重大bug，存在一些隨機影響較小的bug
 
 # 模型輸出後製
+import os
 import re
 
+from utils.latex_lexer import format_latex_lexer
+
+# 後製實作：lexer（預設，見 utils/latex_lexer.py）/ legacy（本檔逐步 regex 版）
+# 兩者輸出相同：python -m benchmarks.check_latex_lexer
+LATEX_POSTPROCESS = os.getenv("LATEX_POSTPROCESS", "lexer")
+
+# 後製輸出的版本：修正任何會改變輸出的 bug 時 +1
+# DB 同時保存模型原文（raw_content），舊版本的回答會在讀取時重新後製（見 db/backend.py）
+FORMAT_VERSION = 1
+
 # ========================
 # 1. 轉換 LaTeX 標記
 # ========================
@@ -353,6 +364,13 @@ def fix_unbalanced_dollars(text: str) -> str:
 # ========================
 
 def format_latex(text: str) -> str:
+    """LaTeX 後處理（依 LATEX_POSTPROCESS 選擇實作）"""
+    if LATEX_POSTPROCESS == "legacy":
+        return format_latex_legacy(text)
+    return format_latex_lexer(text)
+
+
+def format_latex_legacy(text: str) -> str:
     """
     LaTeX 後處理總流程(Pipeline)
 
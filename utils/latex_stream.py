@@ -0,0 +1,218 @@
+# ===== 串流版 LaTeX 後製 =====
+# format_latex 只能處理完整字串（$ 不平衡時會在最後補 $）
+# → 串流時把已「安全」的前綴先格式化輸出，只保留尚未結束的數學區塊
+#
+# 安全切點：換行後的下一個非空白字元之前，且
+# - 切點兩側不是 '/'（fix_simple_fractions 的 \s* 會跨行）
+# - 切點後不是 '$'（wrap_latex_math 把「$ 開頭」的區塊都當成數學，落單的 $ 會讓後段不被包裝）
+# - 前綴內沒有未關閉的 \[（convert_display_math 會跨行）
+# - 前綴內的 $ / $$ 都在前綴內配對（wrap_latex_math、normalize_block_math 會跨行）
+# 滿足時：format_latex(前綴 + 後續) == 前綴的格式化結果 + 後續的格式化結果（strip 另外處理）
+#
+# 前綴不安全（有落單的 $、未關閉的 \[ / $$）時，之後的切點在新的分隔符號出現前都不可能變安全
+# → 記住上次失敗的位置，新文字沒有 $ / \[ \] \( \) 就不重跑 format_prefix
+#   （「價格是 $5 元」這種落單的 $ 不會讓之後每個換行都重新格式化整段 buffer）
+# buffer 很長時再加上退避：距離上次失敗至少再多 1/4 才重試，總成本維持線性
+# 少試幾個切點只會讓輸出晚一點，不影響結果（所有輸出串起來仍 == format_latex(全部輸入)）
+
+import re
+
+from utils import latex_lexer
+from utils.latex_postprocess import (
+    LATEX_POSTPROCESS,
+    convert_display_math,
+    convert_inline_math,
+    replace_unicode_symbols,
+    fix_math_functions,
+    fix_simple_fractions,
+    wrap_latex_math,
+    fix_unbalanced_dollars,
+    normalize_block_math,
+)
+
+# 各階段依 LATEX_POSTPROCESS 使用同一套實作（兩者輸出相同）
+if LATEX_POSTPROCESS == "legacy":
+    def _rewrite(text):
+        """對應 format_latex 步驟 1~4"""
+        text = convert_display_math(text)
+        text = convert_inline_math(text)
+        text = replace_unicode_symbols(text)
+        text = fix_math_functions(text)
+        return fix_simple_fractions(text)
+
+    _wrap = wrap_latex_math
+    _normalize = normalize_block_math
+else:
+    def _rewrite(text):
+        return latex_lexer.rewrite_symbols(latex_lexer.convert_math_delimiters(text))
+
+    _wrap = latex_lexer.wrap_math
+    _normalize = latex_lexer.normalize_blocks
+
+# 候選切點：換行 + 空白之後，下一個字元不是空白、'/'、'$'
+CUT_RE = re.compile(r'\n\s*(?=[^\s/$])')
+
+# 可能改變配對的分隔符號（convert_math_delimiters 會把 \[ \] \( \) 換成 $）
+DELIMITER_RE = re.compile(r'\$|\\[\[\]()]')
+
+# buffer 超過此長度時，失敗後的重試採退避
+BACKOFF_CHARS = 2000
+
+# 與 latex_postprocess 內的 regex 相同（用來檢查配對是否完整）
+DISPLAY_RE = re.compile(r'\\\[(.*?)\\\]', re.DOTALL)
+MATH_SPLIT_RE = re.compile(r'(\$\$.*?\$\$)|(\$.*?\$)', re.DOTALL)
+BLOCK_RE = re.compile(r'\$\$(.*?)\$\$', re.DOTALL)
+
+
+def _tail_after_matches(pattern, text):
+    """最後一個 match 之後的剩餘文字"""
+    end = 0
+    for m in pattern.finditer(text):
+        end = m.end()
+    return text[end:]
+
+
+def _math_spans_closed(text):
+    """
+    模擬 wrap_latex_math 的 re.split 切法：
+    - $$ 找不到結尾 $$ 而退回單一 $ 配對 → 後續文字可能改變配對
+    - 最後有落單的 $ → 後續文字可能改變配對
+    """
+    end = 0
+    for m in MATH_SPLIT_RE.finditer(text):
+        if m.group(2) == '$$':
+            return False
+        end = m.end()
+    return '$' not in text[end:]
+
+
+def format_prefix(text):
+    """
+    格式化「安全前綴」（不 strip）；前綴不安全時回傳 None
+    步驟與 format_latex 相同，只在會跨切點的步驟前後檢查
+    """
+    if '\\[' in _tail_after_matches(DISPLAY_RE, text):
+        return None
+    text = _rewrite(text)
+
+    if not _math_spans_closed(text):
+        return None
+    text = _wrap(text)
+
+    # 前綴的 $ 必須是偶數，fix_unbalanced_dollars 才只會作用在最後一段
+    if text.count('$') % 2:
+        return None
+    if '$$' in _tail_after_matches(BLOCK_RE, text):
+        return None
+    return _normalize(text)
+
+
+def format_tail(text):
+    """最後一段：完整流程（不 strip）"""
+    text = _wrap(_rewrite(text))
+    text = fix_unbalanced_dollars(text)
+    return _normalize(text)
+
+
+class StreamingLatexFormatter:
+    """
+    有狀態的串流格式化器
+
+    - feed(chunk) → 新確定的格式化文字（可能是空字串）
+    - finish() → 剩餘文字；所有輸出串起來 == format_latex(全部輸入)
+    - pending：尚未輸出的原始文字（未結束的數學區塊 / 最後一行）
+
+    每個候選切點只檢查一次，成本只和「上次輸出後」的文字長度有關
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._scan_pos = 0     # 下次找切點的起點（之前的位置都檢查過）
+        self._started = False  # 已輸出非空白內容（處理開頭 strip）
+        self._held_ws = ""     # 暫緩輸出的結尾空白（處理結尾 strip）
+        self._failed_at = None  # 上次 format_prefix 失敗的切點（buffer 內位置）
+
+    @property
+    def pending(self):
+        return self._buffer
+
+    def _emit(self, text):
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self._started = True
+
+        text = self._held_ws + text
+        body = text.rstrip()
+        self._held_ws = text[len(body):]
+        return body
+
+    def _skip_space_back(self, pos):
+        """pos 往前跳過空白後的位置"""
+        while pos > 0 and self._buffer[pos - 1].isspace():
+            pos -= 1
+        return pos
+
+    def _should_try(self, cut):
+        """上次失敗之後有沒有機會變安全（沒有就不重跑 format_prefix）"""
+        failed = self._failed_at
+        if failed is None:
+            return True
+        if not DELIMITER_RE.search(self._buffer, failed, cut):
+            return False
+        return cut < BACKOFF_CHARS or cut - failed >= failed // 4
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        out = []
+
+        pos = self._scan_pos
+        while True:
+            m = CUT_RE.search(self._buffer, pos)
+            if m is None:
+                break
+            cut = pos = m.end()
+
+            prev = self._skip_space_back(m.start())
+            if prev > 0 and self._buffer[prev - 1] == '/':
+                continue
+
+            if not self._should_try(cut):
+                continue
+            formatted = format_prefix(self._buffer[:cut])
+            if formatted is None:
+                self._failed_at = cut
+                continue
+
+            out.append(self._emit(formatted))
+            self._buffer = self._buffer[cut:]
+            self._failed_at = None
+            pos = 0
+
+        # 結尾的空白後面可能還會接上字元 → 下次從空白開頭重新找
+        self._scan_pos = self._skip_space_back(len(self._buffer))
+        return "".join(out)
+
+    def finish(self):
+        text = format_tail(self._buffer)
+        self._buffer = ""
+        self._scan_pos = 0
+        self._failed_at = None
+
+        if not self._started:
+            text = text.lstrip()
+        text = text.rstrip()
+        if not text:
+            self._held_ws = ""
+            return ""
+        text, self._held_ws = self._held_ws + text, ""
+        return text
+
+
+def format_latex_chunks(chunks):
+    """便利函式：分塊餵入，回傳完整結果（用於比對）"""
+    formatter = StreamingLatexFormatter()
+    parts = [formatter.feed(c) for c in chunks]
+    parts.append(formatter.finish())
+    return "".join(parts)
@@ -0,0 +1,179 @@
+# ===== PDF 抽字快取 =====
+# 上傳的 PDF 會一直掛在側邊欄，每則訊息都會再送一次
+# → 以檔案內容的 sha256 當 key，同一份 PDF 每個 process 只解析一次
+# - 記憶體 LRU（依抽出文字的大小限制總量）→ 磁碟（PDF_CACHE_DIR，選用，跨重啟）→ 都沒有才解析
+# - 版本 = 抽字器版本：升級 pypdf 後舊的磁碟快取自動失效
+# - 只有完整抽出的結果寫入磁碟；因預算用完而不完整的結果只留在記憶體（重啟後會重試）
+
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pypdf
+
+from utils.pdf_extract import PdfExtraction
+
+EXTRACTOR_VERSION = f"pypdf-{pypdf.__version__}"
+
+# 磁碟快取目錄（空字串 → 只用記憶體）
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "")
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+def read_bytes(uploaded_file) -> bytes:
+    """Streamlit UploadedFile / 一般檔案物件 → bytes（不改變讀取位置）"""
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+    pos = uploaded_file.tell()
+    uploaded_file.seek(0)
+    try:
+        return uploaded_file.read()
+    finally:
+        uploaded_file.seek(pos)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class PdfTextCache:
+    """
+    get(data, extract, key=None) → PdfExtraction（每頁文字 + 抽字報告）
+    - key：已算好的 content_hash(data)（省掉重算）
+    - extract(data) 只在記憶體與磁碟都沒有時呼叫
+    - 同一份 PDF 同時被多個 session 要求時，只有一個執行緒解析，其他等待結果
+    stats() → 命中 / 未命中次數
+    """
+
+    def __init__(self, max_bytes=PDF_CACHE_MAX_BYTES, cache_dir=PDF_CACHE_DIR, version=EXTRACTOR_VERSION):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.version = version
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # sha256 → (PdfExtraction, nbytes)，最近使用的在最後
+        self._bytes = 0
+        self._inflight = {}            # sha256 → Lock（正在解析中）
+
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    # -------- 記憶體 -------- #
+    def _lookup(self, key):
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+                self._memory_hits += 1
+                return hit[0]
+        return None
+
+    def _remember(self, key, extraction):
+        nbytes = sum(sys.getsizeof(p) for p in extraction.pages)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            # 單一檔案超過上限就不放記憶體（磁碟快取仍然有效）
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (extraction, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, size) = self._entries.popitem(last=False)
+                self._bytes -= size
+                self._evictions += 1
+
+    # -------- 磁碟 -------- #
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_disk(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                row = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logging.exception("pdf cache read failed")
+            return None
+        if row.get("version") != self.version:
+            return None
+        return PdfExtraction(row["pages"], row["report"])
+
+    def _save_disk(self, key, extraction):
+        if not self.cache_dir or not extraction.report.get("complete"):
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": self.version, "pages": extraction.pages, "report": extraction.report}, f, ensure_ascii=False)
+            # 先寫暫存檔再 rename：其他 process 不會讀到寫一半的檔案
+            os.replace(tmp, path)
+        except OSError:
+            logging.exception("pdf cache write failed")
+
+    # -------- 對外介面 -------- #
+    def get(self, data: bytes, extract, key=None):
+        key = key or content_hash(data)
+        extraction = self._lookup(key)
+        if extraction is not None:
+            return extraction
+
+        with self._lock:
+            lock = self._inflight.setdefault(key, threading.Lock())
+
+        with lock:
+            # 等待期間可能已由其他執行緒解析完成
+            extraction = self._lookup(key)
+            if extraction is not None:
+                return extraction
+
+            try:
+                extraction = self._load_disk(key)
+                if extraction is not None:
+                    with self._lock:
+                        self._disk_hits += 1
+                else:
+                    extraction = extract(data)
+                    with self._lock:
+                        self._misses += 1
+                    self._save_disk(key, extraction)
+                self._remember(key, extraction)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+        return extraction
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            hits = self._memory_hits + self._disk_hits
+            lookups = hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "disk": self.cache_dir or None,
+            }
+
+
+pdf_text_cache = PdfTextCache()
@@ -0,0 +1,321 @@
+# ===== PDF 分頁平行抽字 =====
+# 大型掃描檔 / 課本 PDF 逐頁抽字可能要好幾秒，在 Streamlit script thread 內執行會卡住整個畫面
+# → 每頁一個 task 丟到 process pool（抽字是 CPU bound，不受 GIL 限制），頁面完成就先回傳
+#
+# process pool：
+# - 整個程序共用一個，第一次用到時建立（不是每次上傳開一個）
+# - 以 forkserver（沒有時 spawn）啟動 worker：Streamlit 程序裡有多個 thread（journal、摘要、
+#   turn_stage_pool、tornado），直接 fork 可能複製到其他 thread 持有中的鎖（logging / import）而卡死
+# - 檔案內容寫到暫存檔，task 只傳路徑 + 頁碼；worker 依路徑快取 PdfReader（每份檔案只解析一次）
+# - 預算用完時，佇列中尚未開始的頁面看到暫存檔已刪除就直接跳過；
+#   仍卡在某一頁的 worker 無法中斷 → 等沒有其他抽字在進行時整個 pool 重建
+#
+# 預算（任一用完就停止，回傳已完成的部分）：
+# - 每頁時間：連續 page_timeout 秒沒有任何頁面完成 → 剩下的頁面視為卡住（逾時）
+# - 總時間：total_timeout
+# - 每頁字數：max_page_chars（超過截斷）
+# - 總字數：max_total_chars（依頁碼順序累計：從第 1 頁起連續完成的頁面達到預算才停止，後面的頁面略過）
+# - 頁數：max_pages
+#
+# 頁數少於 PARALLEL_MIN_PAGES 時直接在本 thread 逐頁處理（送進 pool 的成本比抽字還高）
+#
+# 效能比較：python -m benchmarks.bench_pdf_extract
+
+import atexit
+import multiprocessing
+import os
+import queue
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from io import BytesIO
+from typing import NamedTuple
+
+from pypdf import PdfReader
+
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_PAGE_TIMEOUT = float(os.getenv("PDF_PAGE_TIMEOUT", "5"))
+PDF_TOTAL_TIMEOUT = float(os.getenv("PDF_TOTAL_TIMEOUT", "20"))
+PDF_MAX_PAGE_CHARS = int(os.getenv("PDF_MAX_PAGE_CHARS", "20000"))
+PDF_MAX_TOTAL_CHARS = int(os.getenv("PDF_MAX_TOTAL_CHARS", "200000"))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "200"))
+
+PARALLEL_MIN_PAGES = 8
+
+# 頁面狀態
+OK = "ok"
+TRUNCATED = "truncated"   # 超過字數預算，只保留前段
+TIMEOUT = "timeout"       # 時間預算用完時尚未完成
+SKIPPED = "skipped"       # 超過頁數 / 總字數預算，沒有處理
+ERROR = "error"           # 抽字失敗
+
+
+class PageResult(NamedTuple):
+    index: int      # 0 起算
+    text: str
+    ms: float       # 抽字耗時（worker 內測量）
+    status: str
+
+
+class PdfExtraction(NamedTuple):
+    pages: list     # 每頁文字（未完成 / 略過的頁面為空字串）
+    report: dict
+
+
+# -------- worker -------- #
+WORKER_READERS = 2
+
+_readers = OrderedDict()  # 暫存檔路徑 → (file, PdfReader)
+
+
+def _get_reader(path):
+    """每個 worker 每份檔案只解析一次；檔案已刪除（該次抽字已結束）→ None"""
+    hit = _readers.get(path)
+    if hit is not None:
+        _readers.move_to_end(path)
+        return hit[1]
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    _readers[path] = (f, PdfReader(f))
+    while len(_readers) > WORKER_READERS:
+        _, (old, _) = _readers.popitem(last=False)
+        old.close()
+    return _readers[path][1]
+
+
+def _extract_page(index, reader, max_chars):
+    start = time.perf_counter()
+    try:
+        text = reader.pages[index].extract_text() or ""
+        status = OK
+    except Exception:
+        text, status = "", ERROR
+    if len(text) > max_chars:
+        text, status = text[:max_chars], TRUNCATED
+    return PageResult(index, text, (time.perf_counter() - start) * 1000, status)
+
+
+def _worker_page(args):
+    path, index, max_chars = args
+    if not os.path.exists(path):
+        return None  # 該次抽字已結束（預算用完），不需要再做
+    reader = _get_reader(path)
+    if reader is None:
+        return None
+    return _extract_page(index, reader, max_chars)
+
+
+class PagePool:
+    """
+    程序共用的抽字 process pool
+    - acquire()：取得 pool（需要時建立），release(stuck) 時歸還
+    - 有頁面卡住（逾時仍在執行）→ 標記淘汰，等沒有人在用時 terminate，下次 acquire 重建
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pool = None
+        self._active = 0
+        self._retire = False
+
+    @staticmethod
+    def _context():
+        methods = multiprocessing.get_all_start_methods()
+        return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+    def acquire(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._context().Pool(self.workers)
+            self._active += 1
+            return self._pool
+
+    def release(self, stuck=False):
+        with self._lock:
+            self._active -= 1
+            self._retire |= stuck
+            if not self._retire or self._active:
+                return
+            pool, self._pool, self._retire = self._pool, None, False
+        pool.terminate()
+        pool.join()
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+
+_pools = {}  # worker 數 → PagePool（平常只有 PDF_WORKERS 一個；benchmark 會用到其他數量）
+_pools_lock = threading.Lock()
+
+
+def get_page_pool(workers=PDF_WORKERS):
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = PagePool(workers)
+        return pool
+
+
+def _close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+    for pool in pools:
+        pool.close()
+
+
+atexit.register(_close_pools)
+
+
+# -------- 排程 -------- #
+def _iter_serial(reader, count, deadline, max_chars):
+    """本 thread 逐頁處理：只能在頁與頁之間檢查時間預算"""
+    for index in range(count):
+        if time.monotonic() >= deadline:
+            return
+        yield _extract_page(index, reader, max_chars)
+
+
+def _iter_parallel(data, count, shared, deadline, page_timeout, max_chars):
+    """shared: PagePool"""
+    done = queue.SimpleQueue()
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+
+    pool = shared.acquire()
+    timed_out = False
+    try:
+        for index in range(count):
+            pool.apply_async(
+                _worker_page, ((path, index, max_chars),),
+                callback=done.put, error_callback=lambda e, i=index: done.put(PageResult(i, "", 0.0, ERROR)),
+            )
+
+        remaining = count
+        last_progress = time.monotonic()
+        while remaining:
+            wait = min(last_progress + page_timeout, deadline) - time.monotonic()
+            if wait <= 0:
+                timed_out = True
+                return
+            try:
+                result = done.get(timeout=wait)
+            except queue.Empty:
+                continue
+            last_progress = time.monotonic()
+            remaining -= 1
+            yield result
+    finally:
+        # 刪除暫存檔 → 佇列中尚未開始的頁面直接跳過
+        os.unlink(path)
+        # 逾時 → 可能有頁面卡在 worker 內 → 淘汰這個 pool
+        shared.release(stuck=timed_out)
+
+
+def iter_pdf_pages(
+    data: bytes,
+    workers=PDF_WORKERS,
+    page_timeout=PDF_PAGE_TIMEOUT,
+    total_timeout=PDF_TOTAL_TIMEOUT,
+    max_page_chars=PDF_MAX_PAGE_CHARS,
+    max_pages=PDF_MAX_PAGES,
+):
+    """
+    逐頁抽字，頁面完成就 yield PageResult（平行時不保證頁碼順序）
+    第一個 yield 之前先回傳總頁數：
+        pages = iter_pdf_pages(data); total = next(pages)
+    """
+    start = time.monotonic()
+    reader = PdfReader(BytesIO(data))
+    count = min(len(reader.pages), max_pages)
+    yield len(reader.pages)
+
+    deadline = start + total_timeout
+    if workers <= 1 or count < PARALLEL_MIN_PAGES:
+        yield from _iter_serial(reader, count, deadline, max_page_chars)
+    else:
+        yield from _iter_parallel(data, count, get_page_pool(workers), deadline, page_timeout, max_page_chars)
+
+
+def extract_pdf(
+    data: bytes,
+    on_page=None,
+    workers=PDF_WORKERS,
+    page_timeout=PDF_PAGE_TIMEOUT,
+    total_timeout=PDF_TOTAL_TIMEOUT,
+    max_page_chars=PDF_MAX_PAGE_CHARS,
+    max_total_chars=PDF_MAX_TOTAL_CHARS,
+    max_pages=PDF_MAX_PAGES,
+) -> PdfExtraction:
+    """
+    抽出整份 PDF（預算內）
+    - on_page(result, done, total)：每頁完成時呼叫（進度顯示用）
+    - 總字數預算依頁碼順序套用：前面的頁面優先保留
+      平行時頁面完成順序不固定 → 從第 1 頁起「連續」完成的頁面達到預算才提早停止
+
+    report:
+    - complete: 所有頁面都完整抽出（可以放進磁碟快取）
+    - per_page: [{"page": 頁碼（1 起算）, "ms", "chars", "status"}]
+    """
+    start = time.perf_counter()
+    pages = iter_pdf_pages(data, workers, page_timeout, total_timeout, max_page_chars, max_pages)
+    total = next(pages)
+
+    results = {}
+    prefix = prefix_chars = 0  # 從第 1 頁起連續完成的頁數 / 字數
+    size_stop = False
+    for result in pages:
+        results[result.index] = result
+        if on_page is not None:
+            on_page(result, len(results), total)
+        while prefix in results:
+            prefix_chars += len(results[prefix].text)
+            prefix += 1
+        # 前面的頁面就超過總字數預算 → 後面的頁面不需要了
+        if prefix_chars >= max_total_chars:
+            size_stop = True
+            pages.close()
+            break
+
+    texts = []
+    per_page = []
+    budget = max_total_chars
+    for index in range(total):
+        result = results.get(index)
+        if result is None:
+            # 超過頁數 / 字數預算的頁面不需要處理；其餘沒完成的是逾時
+            status = SKIPPED if index >= max_pages or size_stop else TIMEOUT
+            result = PageResult(index, "", 0.0, status)
+        elif budget <= 0:
+            result = result._replace(text="", status=SKIPPED)
+        elif len(result.text) > budget:
+            result = result._replace(text=result.text[:budget], status=TRUNCATED)
+        budget -= len(result.text)
+
+        texts.append(result.text)
+        per_page.append({
+            "page": index + 1,
+            "ms": round(result.ms, 1),
+            "chars": len(result.text),
+            "status": result.status,
+        })
+
+    statuses = [p["status"] for p in per_page]
+    report = {
+        "pages": total,
+        "extracted": sum(1 for s in statuses if s in (OK, TRUNCATED)),
+        "complete": all(s == OK for s in statuses),
+        "seconds": round(time.perf_counter() - start, 3),
+        "chars": sum(p["chars"] for p in per_page),
+        "status_counts": {s: statuses.count(s) for s in dict.fromkeys(statuses)},
+        "per_page": per_page,
+    }
+    return PdfExtraction(texts, report)
@@ -0,0 +1,274 @@
+# ===== 上傳 PDF 的段落檢索（BM25）=====
+# 原本每回合把整份 PDF 文字貼進提問 → 學生只問一題，模型也要讀完整份講義
+# → 每份上傳檔案建一個記憶體內的 BM25 索引（依頁 / 題號切段），只放最相關的幾段 + 頁碼
+#
+# - 切段：每頁依題號（第 3 題 / 3. / (3) / 例題 3 …）切開；跨頁的題目延續上一頁的題號
+# - 斷詞：英數字以單字為單位，中文用單字 + 相鄰兩字（不需要斷詞字典）
+# - 提問明確指定題號 / 頁碼（「第 5 題」「p.3」）時，該段一定放入
+# - 全文不超過 PDF_CONTEXT_TOKENS 時直接放全文（小檔案不需要檢索）
+#
+# 效能比較：python -m benchmarks.bench_pdf_retrieval
+
+import math
+import os
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import NamedTuple
+
+from utils.token_estimator import estimate_tokens
+
+PDF_TOP_K = int(os.getenv("PDF_TOP_K", "4"))
+PDF_CONTEXT_TOKENS = int(os.getenv("PDF_CONTEXT_TOKENS", "1500"))
+
+# 單段上限：超過就在換行處再切開（避免一段就吃掉整個預算）
+MAX_CHUNK_CHARS = 1200
+
+# BM25 參數
+K1 = 1.5
+B = 0.75
+
+CN_DIGITS = {"零": 0, "一": 1, "二": 2, "兩": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+CN_NUM = r'[0-9０-９零一二兩三四五六七八九十百]+'
+
+# 行首題號：第 3 題、例題 3、例 3、Q3、Problem 3、3.、3、、(3)、（3）
+PROBLEM_RE = re.compile(
+    r'^\s*(?:'
+    r'第\s*(' + CN_NUM + r')\s*題'
+    r'|(?:例題|例|習題|練習|Q|q|Problem|problem|Exercise|exercise)\s*(\d{1,3})'
+    r'|[(（](\d{1,3})[)）]'
+    r'|(\d{1,3})\s*(?:[.．、)）](?!\d))'
+    r')',
+    re.MULTILINE,
+)
+
+# 提問中的題號 / 頁碼
+QUESTION_PROBLEM_RE = re.compile(
+    r'第\s*(' + CN_NUM + r')\s*題'
+    r'|(?:例題|例|習題|練習|(?<![a-z])(?:q|problem|exercise|question|no\.?)|#)\s*(\d{1,3})',
+    re.IGNORECASE,
+)
+QUESTION_PAGE_RE = re.compile(
+    r'第\s*(' + CN_NUM + r')\s*頁'
+    r'|(?<![a-z])(?:page|p\.)\s*(\d{1,4})',
+    re.IGNORECASE,
+)
+
+WORD_RE = re.compile(r'[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff]+')
+
+
+def parse_number(text):
+    """阿拉伯 / 全形 / 中文數字（到百位）→ int"""
+    text = unicodedata.normalize("NFKC", text)
+    if text.isdigit():
+        return int(text)
+    total = current = 0
+    for ch in text:
+        if ch in CN_DIGITS:
+            current = CN_DIGITS[ch]
+        elif ch == "十":
+            total += (current or 1) * 10
+            current = 0
+        elif ch == "百":
+            total += (current or 1) * 100
+            current = 0
+    return total + current
+
+
+def tokenize(text):
+    """英數字單字 + 中文單字與相鄰兩字"""
+    tokens = []
+    for word in WORD_RE.findall(unicodedata.normalize("NFKC", text).lower()):
+        if word[0].isascii():
+            tokens.append(word)
+        else:
+            tokens.extend(word)
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+# ========================
+# 切段
+# ========================
+
+class Chunk(NamedTuple):
+    page: int           # 1 起算
+    problem: int        # 題號（頁首 / 無題號的段落為 None）
+    text: str
+
+    def label(self):
+        if self.problem is None:
+            return f"第 {self.page} 頁"
+        return f"第 {self.page} 頁・第 {self.problem} 題"
+
+
+def _split_long(text):
+    """超過 MAX_CHUNK_CHARS 時在換行處切開"""
+    if len(text) <= MAX_CHUNK_CHARS:
+        return [text]
+    parts = []
+    current = ""
+    for line in text.split("\n"):
+        if current and len(current) + len(line) + 1 > MAX_CHUNK_CHARS:
+            parts.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+        while len(current) > MAX_CHUNK_CHARS:
+            parts.append(current[:MAX_CHUNK_CHARS])
+            current = current[MAX_CHUNK_CHARS:]
+    if current:
+        parts.append(current)
+    return parts
+
+
+def chunk_pages(pages):
+    """每頁文字 → [Chunk]（依文件順序）"""
+    chunks = []
+    problem = None  # 跨頁延續
+    for page_no, text in enumerate(pages, 1):
+        if not text or not text.strip():
+            continue
+        starts = []
+        for m in PROBLEM_RE.finditer(text):
+            number = next(g for g in m.groups() if g is not None)
+            starts.append((m.start(), parse_number(number)))
+
+        pieces = []
+        head_end = starts[0][0] if starts else len(text)
+        pieces.append((problem, text[:head_end]))
+        for i, (start, number) in enumerate(starts):
+            end = starts[i + 1][0] if i + 1 < len(starts) else len(text)
+            pieces.append((number, text[start:end]))
+            problem = number
+
+        for number, piece in pieces:
+            piece = piece.strip()
+            if piece:
+                chunks.extend(Chunk(page_no, number, part) for part in _split_long(piece))
+    return chunks
+
+
+# ========================
+# 索引
+# ========================
+
+class PdfIndex:
+    """
+    一份上傳檔案的 BM25 索引
+    select(question, top_k, max_tokens) → 選出的段落（依文件順序）
+    """
+
+    def __init__(self, pages):
+        self.pages = len(pages)
+        self.chunks = chunk_pages(pages)
+        self.tokens = sum(estimate_tokens(c.text) for c in self.chunks)
+
+        self._postings = {}  # term → [(chunk 編號, tf)]
+        self._lengths = []
+        for i, chunk in enumerate(self.chunks):
+            counts = Counter(tokenize(chunk.text))
+            self._lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self._postings.setdefault(term, []).append((i, tf))
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+
+        n = len(self.chunks)
+        self._idf = {
+            term: math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def scores(self, question, min_term_len=1):
+        scores = {}
+        for term in set(tokenize(question)):
+            if len(term) < min_term_len:
+                continue
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self._postings[term]:
+                norm = K1 * (1 - B + B * self._lengths[i] / self._avg_length)
+                scores[i] = scores.get(i, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+        return scores
+
+    def referenced(self, question):
+        """提問明確指定的題號 / 頁碼對應的段落編號"""
+        problems = {parse_number(a or b) for a, b in QUESTION_PROBLEM_RE.findall(question)}
+        pages = {parse_number(a or b) for a, b in QUESTION_PAGE_RE.findall(question)}
+        return [
+            i for i, c in enumerate(self.chunks)
+            if c.problem in problems or c.page in pages
+        ]
+
+    def select(self, question, top_k=PDF_TOP_K, max_tokens=PDF_CONTEXT_TOKENS, fallback=True):
+        """
+        選段順序：明確指定的題號 / 頁碼 → BM25 分數高到低 → （都沒有命中時）文件開頭
+        總量不超過 max_tokens（至少放一段），回傳時依文件順序排列
+        fallback=False：都沒有命中時回傳 []（不放文件開頭 / 全文）
+          此時只算兩字以上的詞（「了」「我」這類單字幾乎每段都有，不算命中）
+        """
+        if fallback and self.tokens <= max_tokens:
+            return list(self.chunks)
+
+        scores = self.scores(question, 1 if fallback else 2)
+        ranked = sorted(scores, key=lambda i: (-scores[i], i))[:top_k]
+        candidates = list(dict.fromkeys(self.referenced(question) + ranked))
+        if not candidates:
+            if not fallback:
+                return []
+            candidates = list(range(len(self.chunks)))
+        if self.tokens <= max_tokens:
+            return list(self.chunks)
+
+        chosen = []
+        used = 0
+        for i in candidates:
+            cost = estimate_tokens(self.chunks[i].text)
+            if chosen and used + cost > max_tokens:
+                continue
+            chosen.append(i)
+            used += cost
+        return [self.chunks[i] for i in sorted(chosen)]
+
+    def context(self, question, top_k=PDF_TOP_K, max_tokens=PDF_CONTEXT_TOKENS):
+        return self.format(self.select(question, top_k, max_tokens))
+
+    def format(self, chunks):
+        """
+        選出的段落 → 放進提問的文字：
+        - 全部段落（全文放得下）→ 全文（同原本格式）
+        - 否則 → 每段前標註頁碼 / 題號
+        """
+        if len(chunks) == len(self.chunks):
+            return "\n".join(c.text for c in chunks)
+
+        header = f"（檔案共 {self.pages} 頁，以下只節錄與提問最相關的段落）"
+        body = "\n\n".join(f"〔{c.label()}〕\n{c.text}" for c in chunks)
+        return f"{header}\n\n{body}"
+
+
+# ========================
+# 每份檔案一個索引（LRU）
+# ========================
+
+MAX_INDEXES = 32
+
+_indexes = OrderedDict()  # 檔案 sha256 → PdfIndex
+_lock = threading.Lock()
+
+
+def get_index(key, pages):
+    """同一份檔案只建一次索引"""
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+
+    index = PdfIndex(pages)
+    with _lock:
+        _indexes[key] = index
+        while len(_indexes) > MAX_INDEXES:
+            _indexes.popitem(last=False)
+    return index
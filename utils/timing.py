@@ -0,0 +1,56 @@
+# ===== 分段計時 =====
+# 記錄一回合內每個階段的開始 / 結束時間（可跨 thread）
+# → 比較「各階段加總」與「實際 wall-clock」，看出並行省下多少時間
+
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StageTimer:
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages = {}  # name → (start_ms, end_ms)，相對於 t0
+        self._marks = {}   # name → ms，相對於 t0（例如第一個 token）
+
+    @contextmanager
+    def stage(self, name):
+        """with timer.stage("agent"): ...（generator 內也能用）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self._stages[name] = ((start - self.t0) * 1000, (end - self.t0) * 1000)
+
+    def run(self, name, func, *args, **kwargs):
+        with self.stage(name):
+            return func(*args, **kwargs)
+
+    def mark(self, name):
+        """記錄時間點（只記第一次）"""
+        with self._lock:
+            self._marks.setdefault(name, (time.perf_counter() - self.t0) * 1000)
+
+    def report(self):
+        """
+        wall_ms: 從建立到現在
+        sequential_ms: 各階段時間加總（= 全部串行執行時的時間）
+        saved_ms: 並行省下的時間
+        marks: 時間點（相對於建立時）
+        """
+        wall = (time.perf_counter() - self.t0) * 1000
+        with self._lock:
+            stages = {name: round(end - start, 1) for name, (start, end) in self._stages.items()}
+            marks = {name: round(ms, 1) for name, ms in self._marks.items()}
+        sequential = sum(stages.values())
+        return {
+            "wall_ms": round(wall, 1),
+            "sequential_ms": round(sequential, 1),
+            "saved_ms": round(max(sequential - wall, 0), 1),
+            "stages": stages,
+            "marks": marks,
+        }
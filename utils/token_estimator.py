@@ -0,0 +1,42 @@
+# ===== 離線 token 估算 =====
+# 不呼叫 tokenizer / API，只用字元統計快速估算（誤差約 ±15%，用來控預算足夠）
+
+import re
+
+# 中日韓文字與全形符號：大約 1 字 ≈ 1 token
+CJK_RE = re.compile(r'[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+# 其他字元（英文、數字、LaTeX）：大約 4 字元 ≈ 1 token
+CHARS_PER_TOKEN = 4
+
+# 每則 message 的角色 / 分隔符額外成本
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    cjk = len(CJK_RE.findall(text))
+    other = len(text) - cjk
+    return cjk + (other + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def estimate_message_tokens(text: str) -> int:
+    return estimate_tokens(text) + MESSAGE_OVERHEAD
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = "\n…（以下省略）") -> str:
+    """
+    截斷文字使估算 token 數 ≤ max_tokens（保留開頭）
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    budget = max(max_tokens - estimate_tokens(marker), 0)
+
+    # 依比例先估一個長度，再逐步縮短到符合預算
+    keep = int(len(text) * budget / estimate_tokens(text))
+    while keep > 0 and estimate_tokens(text[:keep]) > budget:
+        keep = int(keep * 0.9)
+
+    return text[:keep] + marker